@@ -1,7 +1,10 @@
 import openai
-from utils import get_agent_config
+from utils import get_agent_config, mentioned_accounts
+from agents.compact_output import expand_compact_trxns, is_compact_trxns
 import json
-from typing import List
+import re
+import pandas as pd
+from typing import Any, Callable, Dict, List, Optional
 import logging
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -29,35 +32,219 @@ def make_router_schema(agents: dict) -> dict:
         }
     }
 
-def route(agents: dict, narrative: dict) -> str:
+def make_batch_router_schema(agents: dict, n_narratives: int) -> dict:
+    """
+    Build the schema of a batch routing call: an `agents` array with one choice per narrative, in order,
+    each restricted to the enum of make_router_schema.
+    """
+    agent = make_router_schema(agents)["parameters"]["properties"]["agent"]
+    return {
+        "name": "choose_agents",
+        "description": "Pick exactly one agent from the provided list for each narrative, in the order given",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "agents": {
+                    "type": "array",
+                    "items": agent,
+                    "minItems": n_narratives,
+                    "maxItems": n_narratives
+                }
+            },
+            "required": ["agents"],
+            "additionalProperties": False
+        }
+    }
+
+def _compact_json(obj: Any) -> str:
+    # Whitespace is prompt tokens the model does not need
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+def _mentions(text: str, name: str) -> bool:
+    name = str(name).strip().rstrip(".")
+    return bool(name) and re.search(rf"(?<!\w){re.escape(name)}(?!\w)", text, flags=re.IGNORECASE) is not None
+
+def build_generation_context(narrative: dict) -> dict:
+    """
+    Prune a sub-narrative to the entities its trxn set needs, so prompts do not grow with the number of accounts
+    in the SAR.
+
+    Kept accounts are the owning account, the accounts the text mentions and the accounts of customers it names.
+    Account_IDs, Acct_to_FI, Acct_to_Cust and FI_to_Acct_to_Cust are narrowed down to those accounts. Entities keep
+    the customers and FIs of those accounts, plus any other entity named in the text.
+
+    :param narrative: A sub-narrative with exactly one (AccountID, Trxn_Set) in 'Narratives'.
+    :return: The pruned sub-narrative. Keys and nesting are unchanged.
+    """
+    (acct_id, trxn_sets), = narrative["Narratives"].items()
+    text = " ".join(str(value) for value in trxn_sets.values())
+    acct_to_fi = narrative.get("Acct_to_FI") or {}
+    acct_to_cust = narrative.get("Acct_to_Cust") or {}
+    fi_to_acct_to_cust = narrative.get("FI_to_Acct_to_Cust") or {}
+
+    all_accounts = dict.fromkeys([*(narrative.get("Account_IDs") or []), *acct_to_fi, *acct_to_cust,
+                                  *(acct for accts in fi_to_acct_to_cust.values() for acct in accts)])
+    accounts = {acct_id} | mentioned_accounts(text, all_accounts)
+    accounts |= {acct for acct, cust in acct_to_cust.items() if _mentions(text, cust)}
+
+    fi_to_acct_to_cust = {fi: {acct: cust for acct, cust in accts.items() if acct in accounts}
+                          for fi, accts in fi_to_acct_to_cust.items()}
+    fi_to_acct_to_cust = {fi: accts for fi, accts in fi_to_acct_to_cust.items() if accts}
+    fis = {fi for acct, fi in acct_to_fi.items() if acct in accounts} | set(fi_to_acct_to_cust)
+    customers = {cust for acct, cust in acct_to_cust.items() if acct in accounts}
+    entities = {category: [entity for entity in values
+                           if entity in fis or entity in customers or _mentions(text, entity)]
+                for category, values in (narrative.get("Entities") or {}).items()}
+
+    return {**narrative,
+            "Entities": entities,
+            "Account_IDs": [acct for acct in narrative.get("Account_IDs") or [] if acct in accounts],
+            "Acct_to_FI": {acct: fi for acct, fi in acct_to_fi.items() if acct in accounts},
+            "Acct_to_Cust": {acct: cust for acct, cust in acct_to_cust.items() if acct in accounts},
+            "FI_to_Acct_to_Cust": fi_to_acct_to_cust}
+
+def _build_router_message(narrative: dict) -> List[Dict[str, str]]:
     narrative_ = narrative["Narratives"]
-    narrative_text = json.dumps(narrative_, indent=2)
-    message = [{"role": "user", "content": narrative_text}]
+    narrative_text = _compact_json(narrative_)
+    return [{"role": "user", "content": narrative_text}]
+
+def _build_generation_message(narrative: dict) -> List[Dict[str, str]]:
+    context = _compact_json(build_generation_context(narrative))
+    return [{"role": "user", "content": context}]
+
+def _parse_trxns(trxns) -> dict:
+    """
+    Parse the reply of a transaction generation agent into a transactions dictionary.
+    DataFrames returned by the generate_transactions tool in columnar mode are passed through unchanged, and
+    replies in the compact output protocol are validated and expanded (see agents/compact_output.py).
+    """
+    if isinstance(trxns, pd.DataFrame):
+        return trxns
+    if not isinstance(trxns, dict):
+        try:
+            trxns = json.loads(trxns)
+        except json.JSONDecodeError:
+            print("Not a valid JSON")
+            return {}
+    if is_compact_trxns(trxns):
+        try:
+            return expand_compact_trxns(trxns)
+        except ValueError as e:
+            logger.error(f"Invalid compact trxns, no trxns generated: {e}")
+            return {}
+    return trxns
+
+def _tool_kwargs(agent, seed: Optional[int], on_function_call: Optional[Callable] = None,
+                 n_realizations: int = 1) -> Dict[str, Any]:
+    # Only agents that call generate_transactions (FunctionCallingAgent) take tool arguments or a function call hook
+    if not hasattr(agent, "function_map"):
+        return {}
+    kwargs = {}
+    tool_kwargs = {"seed": seed} if seed is not None else {}
+    if n_realizations > 1:
+        tool_kwargs["n_realizations"] = n_realizations
+    if tool_kwargs:
+        kwargs["tool_kwargs"] = tool_kwargs
+    if on_function_call is not None:
+        kwargs["on_function_call"] = on_function_call
+    return kwargs
+
+def route(agents: dict, narrative: dict) -> str:
+    message = _build_router_message(narrative)
     router_agent = agents["Router_Agent"]
     chosen_agent_name = router_agent.generate_reply(message)
     logger.info(f"Agent chosen is: {chosen_agent_name}")
     return chosen_agent_name
 
-def route_and_execute(agents:dict,narrative:dict):
+def route_batch(agents: dict, narratives: List[dict]) -> List[Optional[str]]:
+    """
+    Route every sub-narrative with a single Router_Agent call (RouterAgent.choose_agents). Choices are cached per
+    sub-narrative, so only sub-narratives not routed before are sent.
+
+    :return: The chosen agent of each sub-narrative, in order. None for all of them if the router cannot route in
+             batches, its reply is invalid or the request fails, in which case route_and_execute routes each one
+             itself.
+    """
+    router_agent = agents["Router_Agent"]
+    if not narratives or not hasattr(router_agent, "choose_agents"):
+        return [None] * len(narratives)
+    try:
+        chosen_agent_names = router_agent.choose_agents([_build_router_message(n) for n in narratives])
+    except (ValueError, openai.OpenAIError) as e:
+        logger.warning(f"Batch routing failed, routing each sub-narrative separately: {e!r}")
+        return [None] * len(narratives)
+    logger.info(f"Agents chosen for {len(narratives)} sub-narratives: {chosen_agent_names}")
+    return chosen_agent_names
+
+def route_and_execute(agents:dict,narrative:dict, seed: Optional[int] = None,
+                      on_function_call: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                      n_realizations: int = 1, chosen_agent_name: Optional[str] = None):
     """
     Function to take the narrative to be synthesized, pass it to the router agent, get the recommended agent 
-    and execute it to generate transactions
+    and execute it to generate transactions. seed and n_realizations are passed to the generate_transactions tool
+    if the chosen agent calls it, and on_function_call receives the tool's name and arguments.
+    If chosen_agent_name is given (e.g. by route_batch), the router is not called.
     """
 
     # Determine which agent to use
-    chosen_agent_name = route(agents, narrative)
+    if chosen_agent_name is None:
+        chosen_agent_name = route(agents, narrative)
 
-    # Prepare and send full narrative to the chosen agent
-    full_narrative = json.dumps(narrative, indent=2)
-    message = [{"role": "user", "content": full_narrative}]
+    # Send the narrative with the entities it references to the chosen agent
+    message = _build_generation_message(narrative)
     chosen_agent = agents[chosen_agent_name]
-    trxns = chosen_agent.generate_reply(message)
+    trxns = chosen_agent.generate_reply(message, **_tool_kwargs(chosen_agent, seed, on_function_call, n_realizations))
 
     # Parse and return the transactions dictionary
-    if isinstance(trxns, dict):
-        return trxns
+    return _parse_trxns(trxns)
+
+async def _agenerate(agent, message: List[Dict[str, str]], seed: Optional[int] = None,
+                     on_function_call: Optional[Callable] = None, n_realizations: int = 1):
+    """
+    Await a reply from either a FunctionCallingAgent (agenerate_reply) or an autogen ConversableAgent (a_generate_reply)
+    """
+    if hasattr(agent, "agenerate_reply"):
+        return await agent.agenerate_reply(message, **_tool_kwargs(agent, seed, on_function_call, n_realizations))
+    return await agent.a_generate_reply(message)
+
+async def aroute(agents: dict, narrative: dict) -> str:
+    message = _build_router_message(narrative)
+    router_agent = agents["Router_Agent"]
+    chosen_agent_name = await _agenerate(router_agent, message)
+    logger.info(f"Agent chosen is: {chosen_agent_name}")
+    return chosen_agent_name
+
+async def aroute_batch(agents: dict, narratives: List[dict]) -> List[Optional[str]]:
+    """
+    Async counterpart of route_batch
+    """
+    router_agent = agents["Router_Agent"]
+    if not narratives or not hasattr(router_agent, "achoose_agents"):
+        return [None] * len(narratives)
     try:
-        return json.loads(trxns)
-    except json.JSONDecodeError:
-        print("Not a valid JSON")
-        return {}
+        chosen_agent_names = await router_agent.achoose_agents([_build_router_message(n) for n in narratives])
+    except (ValueError, openai.OpenAIError) as e:
+        logger.warning(f"Batch routing failed, routing each sub-narrative separately: {e!r}")
+        return [None] * len(narratives)
+    logger.info(f"Agents chosen for {len(narratives)} sub-narratives: {chosen_agent_names}")
+    return chosen_agent_names
+
+async def aroute_and_execute(agents: dict, narrative: dict, seed: Optional[int] = None,
+                             on_function_call: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                             n_realizations: int = 1, chosen_agent_name: Optional[str] = None) -> dict:
+    """
+    Async counterpart of route_and_execute. Routing and generation are awaited so many
+    sub-narratives can be in flight at once on a single event loop.
+    """
+
+    # Determine which agent to use
+    if chosen_agent_name is None:
+        chosen_agent_name = await aroute(agents, narrative)
+
+    # Send the narrative with the entities it references to the chosen agent
+    message = _build_generation_message(narrative)
+    chosen_agent = agents[chosen_agent_name]
+    trxns = await _agenerate(chosen_agent, message, seed, on_function_call, n_realizations)
+
+    # Parse and return the transactions dictionary
+    return _parse_trxns(trxns)
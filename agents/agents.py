@@ -5,10 +5,17 @@ import logging
 import json
 import ast
 from utils import get_agent_config, get_config_list
-from agents.tools import generate_transactions, generate_transactions_schema
-from agents.agent_utils import   make_router_schema
+from agents.tools import generate_transactions, generate_transactions_schema, call_seed, merge_outputs
+from agents.agent_utils import   make_router_schema, make_batch_router_schema
+from agents.http_client import OpenAIClientFactory, get_openai_client, get_async_openai_client
+from agents.scheduler import RequestScheduler, schedule_conversable_agent
+from agents.cache import LLMResponseCache, make_cache_key, message_from_cache_value, message_to_cache_value
 import openai
-from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -26,16 +33,25 @@ class FunctionCallingAgent:
         human_input_mode: str = "NEVER",
         code_execution_config: Optional[Dict[str, Any]] = None,
         description: Optional[str] = None,
+        cache: Optional[LLMResponseCache] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        client_factory: Optional[OpenAIClientFactory] = None,
     ):
         """
         :param name:              Agent identifier
         :param system_message:    System prompt for the LLM
         :param llm_config:        Dict with keys like "model", "temperature", "max_tokens", "response_format", etc.
+                                  With "parallel_tool_calls": True the functions are offered through the tools API
+                                  and the model may answer with several calls, which are run concurrently.
         :param function_schemas:  List of JSON-schema dicts describing available functions
         :param function_map:      Map from function name to Python callable
         :param human_input_mode:  UNUSED—machine-only agent
         :param code_execution_config: RESERVED for custom runtimes
         :param description:       Optional description
+        :param cache:             Optional LLMResponseCache consulted before every API call
+        :param scheduler:         Optional RequestScheduler that paces API calls against the provider's rate limits
+        :param client_factory:    Factory of the OpenAI clients to call, e.g. get_client_factory(config_file).
+                                  None uses the factory for the default settings.
         """
         self.name = name
         self.system_message = system_message
@@ -45,15 +61,17 @@ class FunctionCallingAgent:
         self.human_input_mode = human_input_mode
         self.code_execution_config = code_execution_config
         self.description = description
+        self.cache = cache
+        self.scheduler = scheduler
+        self.client_factory = client_factory
 
-    def generate_reply(
+    def _build_api_kwargs(
         self,
         user_message: List[Dict[str,str]]
-    ) -> Any:
+    ) -> Dict[str, Any]:
         """
-        1) Sends messages to the OpenAI Chat API, passing llm_config and function_schemas.
-        2) If the response contains a function_call, executes the corresponding Python function.
-        3) Returns the function’s result or the assistant’s content.
+        Assemble the keyword arguments for a ChatCompletion request from llm_config and function_schemas.
+        Shared by the sync and async reply paths so both send identical requests.
         """
         # Build the message list
         full_messages = [{"role": "system", "content": self.system_message}] + user_message #[{"role": "user", "content": user_message}] 
@@ -89,21 +107,153 @@ class FunctionCallingAgent:
                 # Or raise an error:
                 # raise RuntimeError(f"Expected exactly one function in function_map, but got: {func_names}")
 
-            # Force that single function every time
-            api_kwargs["function_call"] = {"name": forced_name}
-
-        # Call the ChatCompletion API
-        resp = openai.chat.completions.create(**api_kwargs)
-        msg = resp.choices[0].message
-
-        # Handle function_call if present
-        if getattr(msg, "function_call", None):
-            logger.info("Function call found")
-            fname = msg.function_call.name
-            args = json.loads(msg.function_call.arguments)
+            if self.llm_config.get("parallel_tool_calls"):
+                # Tools API: a call is required, but the model may make several e.g. one per counterparty
+                del api_kwargs["functions"]
+                api_kwargs["tools"] = [{"type": "function", "function": schema} for schema in self.function_schemas]
+                api_kwargs["tool_choice"] = "required"
+                api_kwargs["parallel_tool_calls"] = True
+            else:
+                # Force that single function every time
+                api_kwargs["function_call"] = {"name": forced_name}
+
+        return api_kwargs
+
+    def _max_retries(self) -> Optional[int]:
+        # With a scheduler, 429s must reach it to back off rather than be retried inside the OpenAI SDK
+        return 0 if self.scheduler is not None else None
+
+    def _create(self, api_kwargs: Dict[str, Any]) -> Any:
+        client = (self.client_factory.openai_client(self._max_retries()) if self.client_factory is not None
+                  else get_openai_client(max_retries=self._max_retries()))
+        if self.scheduler is None:
+            return client.chat.completions.create(**api_kwargs)
+        # Raw responses expose the rate-limit headers the scheduler adapts to
+        return self.scheduler.call(client.chat.completions.with_raw_response.create, api_kwargs)
+
+    async def _acreate(self, api_kwargs: Dict[str, Any]) -> Any:
+        client = (self.client_factory.async_openai_client(self._max_retries()) if self.client_factory is not None
+                  else get_async_openai_client(max_retries=self._max_retries()))
+        if self.scheduler is None:
+            return await client.chat.completions.create(**api_kwargs)
+        return await self.scheduler.acall(client.chat.completions.with_raw_response.create, api_kwargs)
+
+    def _cached_message(self, cache_key: Optional[str]) -> Any:
+        if cache_key is None:
+            return None
+        value = self.cache.get(cache_key)
+        if value is None:
+            return None
+        logger.info(f"LLM response cache hit for agent '{self.name}'")
+        return message_from_cache_value(value)
+
+    def _store_message(self, cache_key: Optional[str], msg: Any) -> None:
+        if cache_key is not None:
+            self.cache.set(cache_key, message_to_cache_value(msg))
+
+    def _get_function_calls(self, msg: Any) -> List[Tuple[str, Callable[..., Any], Dict[str, Any]]]:
+        """
+        Return the name, registered callable and parsed arguments of every tool call (or the legacy function_call)
+        in the message, in order. Empty if there are none.
+        """
+        calls = [(call.function.name, call.function.arguments) for call in getattr(msg, "tool_calls", None) or []]
+        if not calls and getattr(msg, "function_call", None):
+            calls = [(msg.function_call.name, msg.function_call.arguments)]
+        if not calls:
+            return []
+        logger.info(f"{len(calls)} function call(s) found")
+        parsed = []
+        for fname, arguments in calls:
             if fname not in self.function_map:
                 raise RuntimeError(f"Unregistered function: {fname}")
-            return self.function_map[fname](**args)
+            parsed.append((fname, self.function_map[fname], json.loads(arguments)))
+        return parsed
+
+    @staticmethod
+    def _call_kwargs(args: Dict[str, Any], tool_kwargs: Optional[Dict[str, Any]], index: int) -> Dict[str, Any]:
+        # Each of several calls gets its own seed so e.g. two counterparties do not get identical amounts
+        kwargs = {**args, **(tool_kwargs or {})}
+        if kwargs.get("seed") is not None:
+            kwargs["seed"] = call_seed(kwargs["seed"], index)
+        return kwargs
+
+    def generate_reply(
+        self,
+        user_message: List[Dict[str,str]],
+        tool_kwargs: Optional[Dict[str, Any]] = None,
+        on_function_call: Optional[Callable[[str, Dict[str, Any]], None]] = None
+    ) -> Any:
+        """
+        1) Sends messages to the OpenAI Chat API, passing llm_config and function_schemas.
+        2) If the response contains function calls, executes the corresponding Python functions, several of them
+           concurrently, and merges their results (see merge_outputs).
+        3) Returns the functions' result or the assistant’s content.
+
+        tool_kwargs are passed to the function on top of the LLM's arguments e.g. {"seed": ...}.
+        They are not part of the request, so they don't change the cache key. The seed of every call after the
+        first is derived from it with call_seed.
+        on_function_call is called with the function name and the LLM's arguments of each call, in order, before
+        the functions run, e.g. to record them in a ParameterStore.
+        """
+        api_kwargs = self._build_api_kwargs(user_message)
+
+        cache_key = make_cache_key(api_kwargs) if self.cache is not None else None
+        msg = self._cached_message(cache_key)
+        if msg is None:
+            # Call the ChatCompletion API
+            resp = self._create(api_kwargs)
+            msg = resp.choices[0].message
+            self._store_message(cache_key, msg)
+
+        # Handle function calls if present
+        calls = self._get_function_calls(msg)
+        if calls:
+            if on_function_call is not None:
+                for fname, _, args in calls:
+                    on_function_call(fname, args)
+            jobs = [functools.partial(func, **self._call_kwargs(args, tool_kwargs, i))
+                    for i, (_, func, args) in enumerate(calls)]
+            if len(jobs) == 1:
+                return jobs[0]()
+            with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+                return merge_outputs(list(executor.map(lambda job: job(), jobs)))
+
+        # Otherwise, return the assistant’s text
+        logger.info("No valid Function call found")
+        return msg.content
+
+    async def agenerate_reply(
+        self,
+        user_message: List[Dict[str,str]],
+        tool_kwargs: Optional[Dict[str, Any]] = None,
+        on_function_call: Optional[Callable[[str, Dict[str, Any]], None]] = None
+    ) -> Any:
+        """
+        Async counterpart of generate_reply built on the async OpenAI client.
+        Function calls are executed in worker threads, concurrently, so CPU bound tools
+        do not stall other requests waiting on the event loop.
+        """
+        api_kwargs = self._build_api_kwargs(user_message)
+
+        cache_key = make_cache_key(api_kwargs) if self.cache is not None else None
+        msg = self._cached_message(cache_key)
+        if msg is None:
+            # Call the ChatCompletion API without blocking the event loop
+            resp = await self._acreate(api_kwargs)
+            msg = resp.choices[0].message
+            self._store_message(cache_key, msg)
+
+        # Handle function calls if present
+        calls = self._get_function_calls(msg)
+        if calls:
+            if on_function_call is not None:
+                for fname, _, args in calls:
+                    on_function_call(fname, args)
+            results = await asyncio.gather(*(
+                func(**self._call_kwargs(args, tool_kwargs, i)) if asyncio.iscoroutinefunction(func)
+                else asyncio.to_thread(func, **self._call_kwargs(args, tool_kwargs, i))
+                for i, (_, func, args) in enumerate(calls)))
+            return merge_outputs(list(results))
 
         # Otherwise, return the assistant’s text
         logger.info("No valid Function call found")
@@ -117,10 +267,14 @@ class RouterAgent(FunctionCallingAgent):
         llm_config: dict,
         human_input_mode: str,
         code_execution_config: dict,
-        description: str
+        description: str,
+        cache: Optional[LLMResponseCache] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        client_factory: Optional[OpenAIClientFactory] = None
     ):
         # **1) Set the attribute first, so build_router_prompt and make_router_schema can see it.**
-        self.agents = agents
+        # A copy, as the caller adds the router itself to its dict afterwards and it is not a routing choice
+        self.agents = dict(agents)
 
         # **2) Build the JSON schema now that self.agents exists.**
         router_schema = make_router_schema(self.agents)
@@ -137,13 +291,112 @@ class RouterAgent(FunctionCallingAgent):
             function_map={"choose_agent": lambda agent: agent},
             human_input_mode=human_input_mode,
             code_execution_config=code_execution_config,
-            description=description
+            description=description,
+            cache=cache,
+            scheduler=scheduler,
+            client_factory=client_factory
         )
 
     def choose_agent(self, user_message: List[Dict[str, str]]) -> str:
         # No change here—generate_reply will trigger the function call.
         return self.generate_reply(user_message=user_message, function_call="choose_agent")
 
+    def _cached_choices(self, user_messages: List[List[Dict[str, str]]]) -> Tuple[List[Optional[str]], List[Optional[str]]]:
+        """
+        Cache key and cached choice of each narrative. The key is the one generate_reply uses for the narrative's
+        own routing request, so choices made in a batch are also hits for single routing and vice versa.
+        """
+        keys = [make_cache_key(self._build_api_kwargs(m)) if self.cache is not None else None for m in user_messages]
+        choices = []
+        for key in keys:
+            msg = self._cached_message(key)
+            function_call = getattr(msg, "function_call", None)
+            try:
+                choice = json.loads(function_call.arguments).get("agent") if function_call else None
+                choices.append(choice if choice in self.agents else None)
+            except (ValueError, AttributeError, TypeError):
+                # An unreadable entry is routed again
+                choices.append(None)
+        return keys, choices
+
+    def _build_batch_api_kwargs(self, user_messages: List[List[Dict[str, str]]]) -> Dict[str, Any]:
+        content = "\n".join(f"Narrative {i}: {m[-1]['content']}" for i, m in enumerate(user_messages, start=1))
+        api_kwargs = self._build_api_kwargs([{"role": "user", "content": content}])
+        api_kwargs["messages"][0] = {"role": "system", "content": self.build_batch_router_prompt()}
+        api_kwargs["functions"] = [make_batch_router_schema(self.agents, len(user_messages))]
+        api_kwargs["function_call"] = {"name": "choose_agents"}
+        return api_kwargs
+
+    def _pending_choices(self, user_messages: List[List[Dict[str, str]]],
+                         choices: List[Optional[str]]) -> Dict[str, List[int]]:
+        # Narratives without a cached choice, each sent once however often it occurs
+        pending: Dict[str, List[int]] = {}
+        for i, (m, choice) in enumerate(zip(user_messages, choices)):
+            if choice is None:
+                pending.setdefault(m[-1]["content"], []).append(i)
+        if pending:
+            logger.info(f"Routing {len(pending)} of {len(user_messages)} narratives in one request")
+        return pending
+
+    def _fill_choices(self, msg: Any, pending: Dict[str, List[int]], keys: List[Optional[str]],
+                      choices: List[Optional[str]]) -> List[str]:
+        """
+        Validate a choose_agents reply against the router enum and cache each narrative's choice.
+
+        Raises:
+            ValueError: If the reply is malformed, has no choose_agents call, or not one known agent per pending
+                narrative. JSON errors are ValueErrors too.
+        """
+        function_call = getattr(msg, "function_call", None)
+        try:
+            if not function_call or function_call.name != "choose_agents":
+                raise ValueError("Reply has no choose_agents call")
+            args = json.loads(function_call.arguments)
+            chosen = args.get("agents") if isinstance(args, dict) else None
+            if not isinstance(chosen, list) or len(chosen) != len(pending):
+                raise ValueError(f"Expected {len(pending)} agents, got {chosen!r}")
+            unknown = [choice for choice in chosen if not isinstance(choice, str) or choice not in self.agents]
+        except (AttributeError, TypeError) as e:
+            # e.g. arguments that are not a string
+            raise ValueError(f"Malformed choose_agents reply: {e}") from e
+        if unknown:
+            raise ValueError(f"Agents {unknown} are not one of {list(self.agents)}")
+        for choice, indices in zip(chosen, pending.values()):
+            for i in indices:
+                choices[i] = choice
+            self._store_message(keys[indices[0]], SimpleNamespace(
+                content=None, function_call=SimpleNamespace(name="choose_agent",
+                                                            arguments=json.dumps({"agent": choice}))))
+        return choices
+
+    def choose_agents(self, user_messages: List[List[Dict[str, str]]]) -> List[str]:
+        """
+        Route several narratives with one choose_agents call instead of one request each.
+
+        :param user_messages: The routing message of each narrative, as passed to generate_reply.
+        :return: The chosen agent of each narrative, in order.
+        :raises ValueError: If the reply is not one valid agent per narrative. Nothing is cached then.
+        """
+        keys, choices = self._cached_choices(user_messages)
+        pending = self._pending_choices(user_messages, choices)
+        if pending:
+            api_kwargs = self._build_batch_api_kwargs([user_messages[indices[0]] for indices in pending.values()])
+            msg = self._create(api_kwargs).choices[0].message
+            self._fill_choices(msg, pending, keys, choices)
+        return choices
+
+    async def achoose_agents(self, user_messages: List[List[Dict[str, str]]]) -> List[str]:
+        """
+        Async counterpart of choose_agents
+        """
+        keys, choices = self._cached_choices(user_messages)
+        pending = self._pending_choices(user_messages, choices)
+        if pending:
+            api_kwargs = self._build_batch_api_kwargs([user_messages[indices[0]] for indices in pending.values()])
+            msg = (await self._acreate(api_kwargs)).choices[0].message
+            self._fill_choices(msg, pending, keys, choices)
+        return choices
+
     def build_router_prompt(self):
         """
         Use the dict `self.agents` to construct a textual prompt:
@@ -176,12 +429,27 @@ class RouterAgent(FunctionCallingAgent):
         )
         return prompt
 
-def instantiate_all_base_agents(configs):
+    def build_batch_router_prompt(self):
+        """
+        The router prompt for choose_agents, whose message holds several numbered narratives
+        """
+        return (
+            self.build_router_prompt()
+            + "\n\nThe message holds several numbered narratives. Choose the most suitable agent for each of them "
+            "separately and return the choices in the order of the narratives."
+        )
+
+def instantiate_all_base_agents(configs, scheduler: Optional[RequestScheduler] = None,
+                                client_factory: Optional[OpenAIClientFactory] = None,
+                                response_formats: Optional[Dict[str, Dict[str, Any]]] = None):
     """
     Instantiate ConversableAgent objects from a list of configuration dictionaries.
 
     Args:
         configs (list of dict): List of agent configurations.
+        scheduler (RequestScheduler, optional): Scheduler every LLM call of the agents is routed through.
+        client_factory (OpenAIClientFactory, optional): Factory whose pooled HTTP client the agents share.
+        response_formats (dict, optional): response_format to set in the llm_config of the named agents.
 
     Returns:
         dict: A dictionary of agent instances keyed by their names.
@@ -191,6 +459,10 @@ def instantiate_all_base_agents(configs):
         name = config.get('name', 'Default_Agent_Name')
         system_message = config.get('system_message', 'Default system message.')
         llm_config = config.get('llm_config', {})
+        if response_formats and name in response_formats:
+            llm_config = {**llm_config, "response_format": response_formats[name]}
+        if client_factory is not None:
+            llm_config = client_factory.llm_config_with_client(llm_config)
         human_input_mode = config.get('human_input_mode', 'ALWAYS')  # Default to 'ALWAYS' if not specified
 
         logger.info(f"Loaded configuration for agent '{name}' ")
@@ -204,6 +476,8 @@ def instantiate_all_base_agents(configs):
             llm_config=llm_config,
             human_input_mode=human_input_mode,
         )
+        if scheduler is not None:
+            schedule_conversable_agent(agent, scheduler)
 
         logger.info(f"Instantiated '{name}' ")
         agents[name] = agent
@@ -211,6 +485,29 @@ def instantiate_all_base_agents(configs):
         
     return agents
 
+def copy_conversable_agent(agent: ConversableAgent, scheduler: Optional[RequestScheduler] = None) -> ConversableAgent:
+    """
+    Build a new ConversableAgent with the name, system message, llm_config and human input mode of agent but none
+    of its chat state. initiate_chat is not thread-safe on the sender, so chats that run concurrently each need
+    their own sender.
+
+    Args:
+        agent (ConversableAgent): Agent to copy.
+        scheduler (RequestScheduler, optional): Scheduler the copy's LLM calls are routed through.
+
+    Returns:
+        ConversableAgent: The copy.
+    """
+    copied = ConversableAgent(
+        name=agent.name,
+        system_message=agent.system_message,
+        llm_config=agent.llm_config,
+        human_input_mode=agent.human_input_mode,
+    )
+    if scheduler is not None:
+        schedule_conversable_agent(copied, scheduler)
+    return copied
+
 def instantiate_base_agent(agent_name, config):
     """
     Instantiate a ConversableAgent with the given configuration.
@@ -276,10 +573,15 @@ def create_two_agent_chat(sender_agent , receiver_agent, message,summary_prompt)
 
 
 
-def instantiate_agents_for_trxn_generation(configs):
+def instantiate_agents_for_trxn_generation(configs, cache: Optional[LLMResponseCache] = None,
+                                           scheduler: Optional[RequestScheduler] = None,
+                                           client_factory: Optional[OpenAIClientFactory] = None):
     '''
     Instantiates agents necessary for trxn generation from a narrative and other inputs. This includes the Simple Trxn generation agent
     and Trxn generation agent which uses a tool as well as the Router Agent.
+    If a cache is passed, the Trxn generation agent with tool and the Router Agent reuse LLM responses for identical requests.
+    If a scheduler is passed, every LLM call made by the three agents is paced through it.
+    If a client_factory is passed, all three agents make their LLM calls through its pooled HTTP clients.
     '''
     agents = {}
 
@@ -294,6 +596,8 @@ def instantiate_agents_for_trxn_generation(configs):
         agent_name = trxn_generation_agent_config.get('name', 'Default_Agent_Name')
         system_message = trxn_generation_agent_config.get('system_message')
         llm_config = trxn_generation_agent_config.get('llm_config')
+        if client_factory is not None:
+            llm_config = client_factory.llm_config_with_client(llm_config)
         human_input_mode = trxn_generation_agent_config.get('human_input_mode',"NEVER")
         code_execution_config = trxn_generation_agent_config.get("trxn_generation_agent_config", False)
         description = trxn_generation_agent_config.get("description","")
@@ -311,6 +615,8 @@ def instantiate_agents_for_trxn_generation(configs):
             code_execution_config =code_execution_config,
             description= description
         )
+        if scheduler is not None:
+            schedule_conversable_agent(agent1, scheduler)
         logger.info("Transaction_Generation_Agent instantiated successfully.")
 
         agents[agent_name] = agent1
@@ -343,7 +649,11 @@ def instantiate_agents_for_trxn_generation(configs):
             llm_config=llm_config,
             description=description,
             function_schemas= [generate_transactions_schema],
-            function_map={"generate_transactions": generate_transactions}
+            # Columnar output skips building a dict per trxn; workflow 2 consumes the DataFrame directly
+            function_map={"generate_transactions": functools.partial(generate_transactions, output_format="dataframe")},
+            cache=cache,
+            scheduler=scheduler,
+            client_factory=client_factory
         )
 
 
@@ -374,7 +684,10 @@ def instantiate_agents_for_trxn_generation(configs):
                  llm_config = llm_config, 
                  human_input_mode= human_input_mode, 
                  code_execution_config = code_execution_config, 
-                 description = description)
+                 description = description,
+                 cache = cache,
+                 scheduler = scheduler,
+                 client_factory = client_factory)
 
 
         logger.info("Router Agent instantiated successfully.")
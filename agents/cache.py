@@ -0,0 +1,167 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+import diskcache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = "./.cache/llm_responses"
+
+
+def make_cache_key(api_kwargs: Dict[str, Any]) -> str:
+    """
+    Content-address a ChatCompletion request. The key is a sha256 over the canonical JSON of
+    model, temperature, messages, function or tool schemas, forced function_call and the remaining
+    sampling parameters, so any change to the prompt or schema produces a new key.
+    """
+    keyed = {
+        "model": api_kwargs.get("model"),
+        "temperature": api_kwargs.get("temperature"),
+        "messages": api_kwargs.get("messages"),
+        "functions": api_kwargs.get("functions"),
+        "function_call": api_kwargs.get("function_call"),
+        "max_tokens": api_kwargs.get("max_tokens"),
+        "response_format": api_kwargs.get("response_format"),
+    }
+    # Tools API parameters are only keyed when set, so keys of requests without them are unchanged
+    for name in ("tools", "tool_choice", "parallel_tool_calls"):
+        if api_kwargs.get(name) is not None:
+            keyed[name] = api_kwargs[name]
+    payload = json.dumps(keyed, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def message_to_cache_value(msg: Any) -> Dict[str, Any]:
+    """
+    Keep only the replayable parts of an assistant message
+    """
+    function_call = getattr(msg, "function_call", None)
+    value = {
+        "content": getattr(msg, "content", None),
+        "function_call": (
+            {"name": function_call.name, "arguments": function_call.arguments}
+            if function_call else None
+        ),
+    }
+    tool_calls = getattr(msg, "tool_calls", None)
+    if tool_calls:
+        value["tool_calls"] = [{"name": call.function.name, "arguments": call.function.arguments}
+                               for call in tool_calls]
+    return value
+
+
+def message_from_cache_value(value: Dict[str, Any]) -> SimpleNamespace:
+    """
+    Rebuild an object exposing the same attributes as an OpenAI ChatCompletionMessage
+    """
+    function_call = value.get("function_call")
+    return SimpleNamespace(
+        content=value.get("content"),
+        function_call=SimpleNamespace(**function_call) if function_call else None,
+        tool_calls=[SimpleNamespace(function=SimpleNamespace(**call)) for call in value.get("tool_calls") or []],
+    )
+
+
+class LLMResponseCache:
+    """
+    Two-tier cache for LLM replies: an in-memory LRU in front of a diskcache store.
+
+    Values are the parts of the assistant message needed to replay it (content, function_call and tool_calls),
+    never the result of executing the function, so stochastic tools still run on every hit.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = DEFAULT_CACHE_DIR,
+        max_memory_entries: int = 1024,
+        disk_size_limit: int = 2**30,
+        ttl: Optional[float] = 7 * 24 * 3600,
+    ):
+        """
+        :param directory:          Folder for the on-disk tier. None keeps the cache in memory only.
+        :param max_memory_entries: Number of entries kept in the LRU tier before the oldest is evicted
+        :param disk_size_limit:    Size of the on-disk tier in bytes before least recently used entries are culled
+        :param ttl:                Seconds an entry stays valid in either tier. None disables expiry.
+        """
+        self.max_memory_entries = max_memory_entries
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        if directory:
+            self._disk = diskcache.Cache(directory, size_limit=disk_size_limit,
+                                         eviction_policy="least-recently-used")
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+        value = self._disk.get(key) if self._disk is not None else None
+        with self._lock:
+            if value is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            # Promote to the memory tier
+            self._put_memory(key, value, now)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._put_memory(key, value, time.time())
+        if self._disk is not None:
+            self._disk.set(key, value, expire=self.ttl)
+
+    def _put_memory(self, key: str, value: Dict[str, Any], now: float) -> None:
+        expires_at = now + self.ttl if self.ttl is not None else None
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def hit_rate(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def close(self) -> None:
+        if self._disk is not None:
+            self._disk.close()
+
+
+_default_cache: Optional[LLMResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """
+    Return the process-wide LLM response cache used by the workflow 2 agents
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMResponseCache()
+            logger.info(f"LLM response cache opened at {DEFAULT_CACHE_DIR}")
+        return _default_cache
@@ -0,0 +1,112 @@
+import logging
+import math
+from datetime import datetime
+from typing import Any, Dict, List
+
+from agents.tools import TRXN_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Compact output protocol of the Transaction_Generation_Agent. Fields with the same value in every trxn (usually the
+# parties) are written once under "Shared", and the rest as delimited rows under a header:
+#
+#   {"Shared": {"Originator_Name": "John", ..., "Trxn_Channel": "Cash"},
+#    "Header": "Trxn_Date|Trxn_Amount|Branch_or_ATM_Location",
+#    "Rows": ["2024-01-04|5000|Main Road, NY", "2024-01-07|7500|Main Road, NY"]}
+#
+# Output tokens then grow with what varies between trxns rather than with the row width. The reply is expanded
+# locally into the {"1": {...}, "2": {...}} dictionary convert_dict_to_df expects.
+
+DELIMITER = "|"
+COMPACT_KEYS = ["Shared", "Header", "Rows"]
+
+
+def is_compact_trxns(payload: Any) -> bool:
+    return isinstance(payload, dict) and "Header" in payload and "Rows" in payload
+
+
+def _check_value(field: str, value: Any, where: str) -> Any:
+    if isinstance(value, (dict, list)) or value is None:
+        raise ValueError(f"{where}: {field} must be a single value, got {value!r}")
+    value = str(value).strip()
+    if value == "":
+        # Missing, as the prompt asks the model to write it
+        return value
+    if field == "Trxn_Date":
+        try:
+            datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            raise ValueError(f"{where}: Trxn_Date {value!r} is not a YYYY-MM-DD date") from None
+    elif field == "Trxn_Amount":
+        try:
+            amount = float(value)
+        except ValueError:
+            raise ValueError(f"{where}: Trxn_Amount {value!r} is not a number") from None
+        if not math.isfinite(amount) or amount < 0:
+            raise ValueError(f"{where}: Trxn_Amount {value!r} must be a non-negative number")
+        return amount
+    return value
+
+
+def expand_compact_trxns(payload: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Validate a compact reply and expand it into one dictionary per trxn.
+
+    Every trxn field must be given exactly once, either in Shared or in Header, and every row must have one value
+    per header field. Dates must be YYYY-MM-DD and amounts plain non-negative numbers. Missing values, dates and
+    amounts included, are "".
+
+    Args:
+        payload (dict): Parsed compact reply with the keys Shared, Header and Rows.
+
+    Returns:
+        dict: {"1": {<field>: <value>}, "2": ...} with the fields in TRXN_COLUMNS order and float amounts (or "").
+
+    Raises:
+        ValueError: If the reply does not follow the protocol.
+    """
+    if not isinstance(payload, dict) or sorted(payload) != sorted(COMPACT_KEYS):
+        raise ValueError(f"Compact trxns must have exactly the keys {COMPACT_KEYS}, got "
+                         f"{sorted(payload) if isinstance(payload, dict) else type(payload).__name__}")
+    shared, header, rows = payload["Shared"], payload["Header"], payload["Rows"]
+    if not isinstance(shared, dict):
+        raise ValueError("Shared must be an object of field values")
+    if not isinstance(header, str):
+        raise ValueError("Header must be a string of field names separated by '|'")
+    if not isinstance(rows, list) or not all(isinstance(row, str) for row in rows):
+        raise ValueError("Rows must be a list of strings")
+
+    columns = [column.strip() for column in header.split(DELIMITER)] if header.strip() else []
+    unknown = [field for field in [*shared, *columns] if field not in TRXN_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown trxn fields {unknown}")
+    repeated = sorted({field for field in columns if columns.count(field) > 1} | (set(shared) & set(columns)))
+    if repeated:
+        raise ValueError(f"Fields {repeated} are given more than once")
+    missing = [field for field in TRXN_COLUMNS if field not in shared and field not in columns]
+    if missing:
+        raise ValueError(f"Fields {missing} are neither in Shared nor in Header")
+
+    shared = {field: _check_value(field, value, "Shared") for field, value in shared.items()}
+    trxns = {}
+    for i, row in enumerate(rows, start=1):
+        # With every field shared, each row is an empty string
+        values = row.split(DELIMITER) if columns or row.strip() else []
+        if len(values) != len(columns):
+            raise ValueError(f"Row {i} has {len(values)} values for {len(columns)} header fields: {row!r}")
+        trxn = {**shared, **{field: _check_value(field, value, f"Row {i}") for field, value in zip(columns, values)}}
+        trxns[str(i)] = {field: trxn[field] for field in TRXN_COLUMNS}
+    logger.info(f"Expanded {len(trxns)} compact trxns with {len(shared)} shared fields")
+    return trxns
+
+
+def to_compact_trxns(trxns: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Inverse of expand_compact_trxns: fields with one value across all trxns go to Shared, the rest to the rows
+    """
+    rows: List[Dict[str, Any]] = list(trxns.values())
+    shared = {field: rows[0].get(field, "") for field in TRXN_COLUMNS
+              if rows and all(row.get(field, "") == rows[0].get(field, "") for row in rows)}
+    columns = [field for field in TRXN_COLUMNS if field not in shared]
+    return {"Shared": shared, "Header": DELIMITER.join(columns),
+            "Rows": [DELIMITER.join(str(row.get(field, "")) for field in columns) for row in rows]}
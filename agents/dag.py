@@ -0,0 +1,98 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Stage:
+    """
+    A unit of work in a workflow DAG.
+
+    :param name: Unique name of the stage. Its output is available to later stages under this name.
+    :param func: Callable invoked with one keyword argument per input.
+    :param inputs: Names of the initial inputs or earlier stages this stage depends on.
+    """
+    name: str
+    func: Callable[..., Any]
+    inputs: List[str] = field(default_factory=list)
+
+
+def _validate(stages: List[Stage], initial_inputs: Dict[str, Any]) -> None:
+    names = [stage.name for stage in stages]
+    duplicates = {name for name in names if names.count(name) > 1 or name in initial_inputs}
+    if duplicates:
+        raise ValueError(f"Stage names must be unique and differ from the initial inputs: {sorted(duplicates)}")
+    available = set(initial_inputs) | set(names)
+    for stage in stages:
+        missing = [name for name in stage.inputs if name not in available]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown inputs {missing}")
+
+    # Kahn's algorithm: every stage must become ready at some point
+    resolved = set(initial_inputs)
+    remaining = list(stages)
+    while remaining:
+        ready = [stage for stage in remaining if set(stage.inputs) <= resolved]
+        if not ready:
+            raise ValueError(f"Stages {[stage.name for stage in remaining]} form a dependency cycle")
+        resolved.update(stage.name for stage in ready)
+        remaining = [stage for stage in remaining if stage not in ready]
+
+
+def run_stages(stages: List[Stage], initial_inputs: Dict[str, Any],
+               max_workers: Optional[int] = None) -> Tuple[Dict[str, Any], Dict[str, Dict[str, float]]]:
+    """
+    Run a DAG of stages on a thread pool. Each stage starts as soon as all of its inputs are available, so
+    independent stages run concurrently.
+
+    Args:
+        stages (list of Stage): Stages of the workflow. The order only matters for tie-breaking.
+        initial_inputs (dict): Values available before any stage runs e.g. {"sar_text": ...}.
+        max_workers (int, optional): Size of the thread pool. Defaults to the number of stages.
+
+    Returns:
+        tuple: (outputs keyed by stage name, timings keyed by stage name with start/end offsets and seconds)
+    """
+    _validate(stages, initial_inputs)
+    values = dict(initial_inputs)
+    outputs: Dict[str, Any] = {}
+    timings: Dict[str, Dict[str, float]] = {}
+    pending = list(stages)
+    dag_start = time.perf_counter()
+
+    def timed(stage: Stage, kwargs: Dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            return stage.func(**kwargs)
+        finally:
+            end = time.perf_counter()
+            timings[stage.name] = {"start": start - dag_start, "end": end - dag_start, "seconds": end - start}
+            logger.info(f"Stage {stage.name} finished in {end - start:.2f}s")
+
+    with ThreadPoolExecutor(max_workers=max_workers or max(len(stages), 1)) as executor:
+        running = {}
+        while pending or running:
+            for stage in [stage for stage in pending if all(name in values for name in stage.inputs)]:
+                pending.remove(stage)
+                kwargs = {name: values[name] for name in stage.inputs}
+                running[executor.submit(timed, stage, kwargs)] = stage
+                logger.info(f"Stage {stage.name} started")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    outputs[stage.name] = values[stage.name] = future.result()
+                except Exception:
+                    for other in running:
+                        other.cancel()
+                    logger.error(f"Stage {stage.name} failed")
+                    raise
+
+    total = time.perf_counter() - dag_start
+    timings["total"] = {"start": 0.0, "end": total, "seconds": total}
+    return outputs, timings
@@ -0,0 +1,310 @@
+import asyncio
+import logging
+import threading
+from dataclasses import astuple, dataclass, fields
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+import openai
+
+from utils import load_config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HttpClientSettings:
+    """
+    Connection pool and timeout settings shared by every OpenAI call in the process
+    """
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    connect_timeout: float = 10.0
+    read_timeout: float = 120.0
+    write_timeout: float = 30.0
+    pool_timeout: float = 30.0
+
+    @classmethod
+    def from_config(cls, config_file: str) -> "HttpClientSettings":
+        """
+        Read the `http_client` section of the agents config file. Unknown keys are ignored.
+        """
+        config = load_config(config_file).get("http_client", {}) or {}
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in config.items() if k in known})
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=self.read_timeout,
+            write=self.write_timeout,
+            pool=self.pool_timeout,
+        )
+
+
+class _SharedClientMixin:
+    """
+    autogen deep-copies llm_config when an agent is created. Returning self keeps every agent
+    on the one pooled client instead of cloning its connection pool.
+    """
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class PooledHttpClient(_SharedClientMixin, httpx.Client):
+    pass
+
+
+class AsyncPooledHttpClient(_SharedClientMixin, httpx.AsyncClient):
+    pass
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class OpenAIClientFactory:
+    """
+    Process-wide owner of the pooled HTTP clients and of the OpenAI clients built on them.
+    Clients are created lazily so importing the agents does not require an API key.
+    """
+
+    def __init__(self, settings: Optional[HttpClientSettings] = None, base_url: Optional[str] = None,
+                 api_key: Optional[str] = None):
+        """
+        :param settings: Pool and timeout settings
+        :param base_url: Alternative OpenAI-compatible endpoint, e.g. the local stand-in server
+        :param api_key:  API key to use with base_url. None falls back to OPENAI_API_KEY.
+        """
+        self.settings = settings or HttpClientSettings()
+        self.base_url = base_url
+        self.api_key = api_key
+        if self.settings.http2 and not _http2_available():
+            logger.warning("http2 requested but the 'h2' package is not installed. Falling back to HTTP/1.1")
+            self.settings.http2 = False
+        self._lock = threading.Lock()
+        self._http_client: Optional[PooledHttpClient] = None
+        # OpenAI clients on the pools, keyed by their max_retries (None for the SDK default)
+        self._openai_clients: Dict[Optional[int], openai.OpenAI] = {}
+        # An httpx.AsyncClient is bound to the event loop it first connects on, so async clients are kept per loop
+        # (None outside a running loop). Each asyncio.run then gets its own pool.
+        self._async_http_clients: Dict[Optional[asyncio.AbstractEventLoop], AsyncPooledHttpClient] = {}
+        self._async_openai_clients: Dict[Tuple[Optional[asyncio.AbstractEventLoop], Optional[int]],
+                                         openai.AsyncOpenAI] = {}
+        self._counters = {"requests_total": 0, "responses_total": 0}
+
+    def _on_request(self, request) -> None:
+        with self._lock:
+            self._counters["requests_total"] += 1
+
+    def _on_response(self, response) -> None:
+        with self._lock:
+            self._counters["responses_total"] += 1
+
+    async def _aon_request(self, request) -> None:
+        self._on_request(request)
+
+    async def _aon_response(self, response) -> None:
+        self._on_response(response)
+
+    def _client_kwargs(self) -> Dict[str, Any]:
+        return {
+            "limits": self.settings.limits(),
+            "timeout": self.settings.timeout(),
+            "http2": self.settings.http2,
+            "follow_redirects": True,
+        }
+
+    @property
+    def http_client(self) -> PooledHttpClient:
+        with self._lock:
+            if self._http_client is None:
+                self._http_client = PooledHttpClient(
+                    event_hooks={"request": [self._on_request], "response": [self._on_response]},
+                    **self._client_kwargs(),
+                )
+            return self._http_client
+
+    @staticmethod
+    def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+
+    def _drop_closed_loops(self) -> None:
+        # Clients of a closed loop cannot be used or closed any more; their connections go with them
+        for loop in [loop for loop in self._async_http_clients if loop is not None and loop.is_closed()]:
+            del self._async_http_clients[loop]
+        self._async_openai_clients = {key: client for key, client in self._async_openai_clients.items()
+                                      if key[0] in self._async_http_clients}
+
+    @property
+    def async_http_client(self) -> AsyncPooledHttpClient:
+        """
+        The pooled async client of the running event loop
+        """
+        loop = self._running_loop()
+        with self._lock:
+            if loop not in self._async_http_clients:
+                self._drop_closed_loops()
+                self._async_http_clients[loop] = AsyncPooledHttpClient(
+                    event_hooks={"request": [self._aon_request], "response": [self._aon_response]},
+                    **self._client_kwargs(),
+                )
+            return self._async_http_clients[loop]
+
+    def _endpoint_kwargs(self) -> Dict[str, Any]:
+        kwargs = {}
+        if self.base_url:
+            kwargs["base_url"] = self.base_url
+        if self.api_key:
+            kwargs["api_key"] = self.api_key
+        return kwargs
+
+    def _client_options(self, max_retries: Optional[int]) -> Dict[str, Any]:
+        return {**self._endpoint_kwargs(), **({"max_retries": max_retries} if max_retries is not None else {})}
+
+    def openai_client(self, max_retries: Optional[int] = None) -> openai.OpenAI:
+        """
+        The OpenAI client on the pooled HTTP client. max_retries overrides the SDK's retries of failed requests,
+        e.g. 0 when a RequestScheduler retries rate-limited requests itself.
+        """
+        if max_retries not in self._openai_clients:
+            self._openai_clients[max_retries] = openai.OpenAI(http_client=self.http_client,
+                                                              **self._client_options(max_retries))
+        return self._openai_clients[max_retries]
+
+    def async_openai_client(self, max_retries: Optional[int] = None) -> openai.AsyncOpenAI:
+        """
+        The AsyncOpenAI client of the running event loop, see async_http_client and openai_client
+        """
+        key = (self._running_loop(), max_retries)
+        if key not in self._async_openai_clients:
+            self._async_openai_clients[key] = openai.AsyncOpenAI(http_client=self.async_http_client,
+                                                                 **self._client_options(max_retries))
+        return self._async_openai_clients[key]
+
+    def llm_config_with_client(self, llm_config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Return a copy of an autogen llm_config that makes the agent's OpenAIWrapper reuse the pooled client
+        """
+        if not llm_config:
+            return llm_config
+        return {**llm_config, "http_client": self.http_client, **self._endpoint_kwargs()}
+
+    @staticmethod
+    def _pool_stats(client: Optional[httpx.Client]) -> Dict[str, int]:
+        # httpx does not expose its httpcore pool publicly; report zeros if the internals change
+        try:
+            connections = client._transport._pool.connections
+        except AttributeError:
+            return {"connections": 0, "idle": 0, "active": 0}
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {"connections": len(connections), "idle": idle, "active": len(connections) - idle}
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Pool utilisation of the sync and async clients plus request counters
+        """
+        with self._lock:
+            counters = dict(self._counters)
+        return {
+            **counters,
+            "max_connections": self.settings.max_connections,
+            "max_keepalive_connections": self.settings.max_keepalive_connections,
+            "sync_pool": self._pool_stats(self._http_client),
+            "async_pool": self._pool_stats(self._async_http_clients.get(self._running_loop())),
+        }
+
+    def close(self) -> None:
+        """
+        Close the sync and async pools. The async pools need an event loop to close, so inside a running loop
+        await aclose instead. Pools of event loops that are already closed are dropped.
+        """
+        with self._lock:
+            http_client, self._http_client, self._openai_clients = self._http_client, None, {}
+        if http_client is not None:
+            http_client.close()
+        with self._lock:
+            self._drop_closed_loops()
+            if not self._async_http_clients:
+                return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(self._aclose_async_pool())
+        else:
+            raise RuntimeError("close() cannot close the async pool inside a running event loop, await aclose()")
+
+    async def aclose(self) -> None:
+        """
+        Close the sync and async pools from within an event loop
+        """
+        with self._lock:
+            http_client, self._http_client, self._openai_clients = self._http_client, None, {}
+        if http_client is not None:
+            http_client.close()
+        await self._aclose_async_pool()
+
+    async def _aclose_async_pool(self) -> None:
+        with self._lock:
+            self._drop_closed_loops()
+            async_http_clients = list(self._async_http_clients.values())
+            self._async_http_clients, self._async_openai_clients = {}, {}
+        for async_http_client in async_http_clients:
+            await async_http_client.aclose()
+
+
+_factories: Dict[Tuple, OpenAIClientFactory] = {}
+_factory_lock = threading.Lock()
+
+
+def _factory_settings(config_file: Optional[str]) -> Tuple[HttpClientSettings, Optional[str], Optional[str]]:
+    # Pool settings, base_url and api_key from the `http_client` and `llm_backend` sections of config_file
+    settings = HttpClientSettings.from_config(config_file) if config_file else HttpClientSettings()
+    base_url, api_key = None, None
+    backend = (load_config(config_file).get("llm_backend", {}) or {}) if config_file else {}
+    if backend.get("provider", "openai") == "stand_in":
+        from agents.stand_in_server import StandInSettings
+        base_url = StandInSettings.from_config(config_file).base_url
+        api_key = "stand-in"
+    return settings, base_url, api_key
+
+
+def get_client_factory(config_file: Optional[str] = None) -> OpenAIClientFactory:
+    """
+    Return the client factory for the `http_client` and `llm_backend` sections of config_file, or for the
+    defaults if None. Configs with the same settings share one factory and so one connection pool.
+    With `llm_backend.provider: stand_in` every client points at the local stand-in server.
+    """
+    settings, base_url, api_key = _factory_settings(config_file)
+    key = (astuple(settings), base_url, api_key)
+    with _factory_lock:
+        if key not in _factories:
+            _factories[key] = OpenAIClientFactory(settings, base_url=base_url, api_key=api_key)
+            logger.info(f"Pooled OpenAI client factory created with {settings} (base_url={base_url or 'default'})")
+        return _factories[key]
+
+
+def get_openai_client(config_file: Optional[str] = None, max_retries: Optional[int] = None) -> openai.OpenAI:
+    return get_client_factory(config_file).openai_client(max_retries)
+
+
+def get_async_openai_client(config_file: Optional[str] = None,
+                            max_retries: Optional[int] = None) -> openai.AsyncOpenAI:
+    return get_client_factory(config_file).async_openai_client(max_retries)
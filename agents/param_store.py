@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Arguments an LLM produced for generate_transactions, one JSON line per call. Regenerating trxns from them needs no
+# LLM call, so training and backtest data can be resampled as often as needed.
+
+_AMOUNT_ARGS = ["Total_Amount", "Min_Ind_Trxn_Amt", "Max_Ind_Trxn_Amt"]
+_DATE_ARGS = ["Start_Date", "End_Date"]
+
+
+class ParameterStore:
+    """
+    Append-only JSON Lines store of generate_transactions arguments keyed by (SAR id, account, trxn set).
+
+    Each line holds one call: {"sar_id", "account", "trxn_set", "seed", "function", "args"}. A later line for the
+    same key supersedes earlier ones when the store is read. A trxn set generated once for several accounts' identical
+    sub-narratives is recorded under the first of them, with every (account, trxn set) in "attributed_to".
+
+    :param path: Path to the .jsonl file. Parent folders are created on the first write.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, account: str, trxn_set: str, args: Dict[str, Any], sar_id: Optional[str] = None,
+               seed: Optional[int] = None, function: str = "generate_transactions",
+               attributed_to: Optional[List[Tuple[str, str]]] = None) -> None:
+        record = {"sar_id": sar_id, "account": account, "trxn_set": trxn_set, "seed": seed, "function": function,
+                  "args": args}
+        if attributed_to:
+            record["attributed_to"] = [list(owner) for owner in attributed_to]
+        line = json.dumps(record, separators=(",", ":"), default=str)
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+        logger.info(f"Recorded {function} arguments for account {account}, {trxn_set}")
+
+    def records(self, sar_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Return the latest record of every (SAR id, account, trxn set), optionally only those of one SAR
+        """
+        if not os.path.exists(self.path):
+            return []
+        latest: Dict[Tuple, Dict[str, Any]] = {}
+        with self._lock, open(self.path, encoding="utf-8") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                latest[(record["sar_id"], record["account"], record["trxn_set"])] = record
+        return [record for record in latest.values() if sar_id is None or record["sar_id"] == sar_id]
+
+    def sar_ids(self) -> List[Optional[str]]:
+        return list(dict.fromkeys(record["sar_id"] for record in self.records()))
+
+
+def _shift_date(value: Any, days: int) -> Any:
+    if not value or not days:
+        return value
+    return (datetime.strptime(value, "%Y-%m-%d") + timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def apply_overrides(args: Dict[str, Any], amount_scale: float = 1.0, count_scale: float = 1.0,
+                    date_shift_days: int = 0) -> Dict[str, Any]:
+    """
+    Return a copy of recorded generate_transactions arguments with amounts and trxn counts scaled and dates shifted.
+    Blank values the LLM left for missing arguments are kept as is.
+
+    Args:
+        args (dict): Arguments as recorded.
+        amount_scale (float): Factor applied to Total_Amount, Min_Ind_Trxn_Amt and Max_Ind_Trxn_Amt.
+        count_scale (float): Factor applied to N_transactions. At least one trxn is kept.
+        date_shift_days (int): Days added to Start_Date and End_Date.
+
+    Returns:
+        dict: The new arguments.
+    """
+    new_args = dict(args)
+    for name in _AMOUNT_ARGS:
+        if new_args.get(name) not in (None, "") and amount_scale != 1.0:
+            new_args[name] = round(float(new_args[name]) * amount_scale, 2)
+    if new_args.get("N_transactions") not in (None, "") and count_scale != 1.0:
+        new_args["N_transactions"] = max(int(round(int(new_args["N_transactions"]) * count_scale)), 1)
+    for name in _DATE_ARGS:
+        new_args[name] = _shift_date(new_args.get(name), date_shift_days)
+    return new_args
+
+
+_stores: Dict[str, ParameterStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_parameter_store(path: str) -> ParameterStore:
+    """
+    Return the process-wide ParameterStore for a path
+    """
+    key = os.path.abspath(path)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = ParameterStore(path)
+        return _stores[key]
@@ -0,0 +1,152 @@
+import hashlib
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+from agents.agents import instantiate_all_base_agents, instantiate_agents_for_trxn_generation
+from agents.cache import get_llm_cache
+from agents.http_client import get_client_factory
+from agents.scheduler import get_scheduler
+from agents.structured_outputs import WORKFLOW1_RESPONSE_FORMATS
+
+logger = logging.getLogger(__name__)
+
+WORKFLOW1 = "workflow1"
+TRXN_GENERATION = "trxn_generation"
+
+
+class AgentRegistry:
+    """
+    Process-wide cache of the parsed agents config and of pre-built agents for one config file.
+
+    The config is parsed once and re-parsed only when the file's mtime/size change and its sha256 differs.
+    Built agents are keyed by the config hash, so a changed config never hands out stale agents.
+
+    Workflow 1 agents keep per-chat state, so they are handed out exclusively through `checkout` and returned
+    to an idle pool afterwards. Transaction generation agents only answer explicit message lists and are
+    shared by every caller through `shared_agents`.
+
+    :param config_file: Path to the agents config YAML.
+    """
+
+    def __init__(self, config_file: str):
+        self.config_file = config_file
+        self._lock = threading.RLock()
+        self._stat: Optional[Tuple[int, int]] = None
+        self._config: Dict[str, Any] = {}
+        self.version: Optional[str] = None
+        self._idle: Dict[Tuple, List[Dict[str, Any]]] = {}
+        self._shared: Dict[Tuple, Dict[str, Any]] = {}
+        self.stats = {"config_loads": 0, "agent_sets_built": 0, "agent_sets_reused": 0}
+
+    def _refresh(self) -> None:
+        stat = os.stat(self.config_file)
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        if stat_key == self._stat:
+            return
+        with open(self.config_file, "rb") as file:
+            raw = file.read()
+        self._stat = stat_key
+        digest = hashlib.sha256(raw).hexdigest()
+        if digest == self.version:
+            return
+        self._config = yaml.safe_load(raw) or {}
+        self.version = digest
+        self._idle.clear()
+        self._shared.clear()
+        self.stats["config_loads"] += 1
+        logger.info(f"Loaded config {self.config_file} (sha256 {digest[:12]})")
+
+    def config(self) -> Dict[str, Any]:
+        """
+        Return the parsed config file, re-reading it only if it has changed
+        """
+        with self._lock:
+            self._refresh()
+            return self._config
+
+    def agent_configs(self) -> List[Dict[str, Any]]:
+        return self.config().get("agents", [])
+
+    def _build(self, kind: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        agent_configs = self.agent_configs()
+        scheduler = get_scheduler(self.config_file)
+        client_factory = get_client_factory(self.config_file)
+        if kind == WORKFLOW1:
+            response_formats = WORKFLOW1_RESPONSE_FORMATS if options.get("structured_output") else None
+            agents = instantiate_all_base_agents(agent_configs, scheduler=scheduler, client_factory=client_factory,
+                                                 response_formats=response_formats)
+        elif kind == TRXN_GENERATION:
+            cache = get_llm_cache() if options.get("use_cache", True) else None
+            agents = instantiate_agents_for_trxn_generation(agent_configs, cache=cache, scheduler=scheduler,
+                                                            client_factory=client_factory)
+        else:
+            raise ValueError(f"Unknown agent set '{kind}'")
+        self.stats["agent_sets_built"] += 1
+        return agents
+
+    @staticmethod
+    def _key(kind: str, options: Dict[str, Any]) -> Tuple:
+        return (kind, tuple(sorted(options.items())))
+
+    @contextmanager
+    def checkout(self, kind: str, **options) -> Iterator[Dict[str, Any]]:
+        """
+        Borrow a set of agents for the exclusive use of one workflow run.
+
+        Args:
+            kind (str): Agent set to borrow, e.g. "workflow1".
+            **options: Build options of the set, e.g. structured_output=True.
+
+        Yields:
+            dict: Agents keyed by name.
+        """
+        key = self._key(kind, options)
+        with self._lock:
+            self._refresh()
+            version = self.version
+            idle = self._idle.get(key)
+            agents = idle.pop() if idle else None
+            if agents is None:
+                agents = self._build(kind, options)
+            else:
+                self.stats["agent_sets_reused"] += 1
+        try:
+            yield agents
+        finally:
+            with self._lock:
+                # Agents built from an outdated config are dropped
+                if version == self.version:
+                    self._idle.setdefault(key, []).append(agents)
+
+    def shared_agents(self, kind: str, **options) -> Dict[str, Any]:
+        """
+        Return a set of agents shared by all callers. Only for agents that are safe to call concurrently.
+        """
+        key = self._key(kind, options)
+        with self._lock:
+            self._refresh()
+            if key in self._shared:
+                self.stats["agent_sets_reused"] += 1
+            else:
+                self._shared[key] = self._build(kind, options)
+            return self._shared[key]
+
+
+_registries: Dict[str, AgentRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_agent_registry(config_file: str) -> AgentRegistry:
+    """
+    Return the process-wide AgentRegistry for a config file
+    """
+    path = os.path.abspath(config_file)
+    with _registries_lock:
+        if path not in _registries:
+            _registries[path] = AgentRegistry(config_file)
+        return _registries[path]
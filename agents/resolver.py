@@ -0,0 +1,64 @@
+import logging
+import re
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_OWNER = "Unknown"
+_DUMMY_BANK_PATTERN = re.compile(r"^Dummy_Bank_(\d+)$")
+
+
+def _next_dummy_bank(acct_to_fi: Dict[str, str]) -> int:
+    used = [int(m.group(1)) for fi in acct_to_fi.values() if (m := _DUMMY_BANK_PATTERN.match(str(fi)))]
+    return max(used, default=0) + 1
+
+
+def resolve_entities(entity_results: Dict) -> Dict[str, Dict[str, Dict[str, str]]]:
+    """
+    Deterministic replacement for the Entity_Resolution_Agent.
+
+    Follows the agent's instructions exactly: group accounts by the FI they are held at (in the order the
+    FIs appear in Acct_to_FI), then assign sequential customer IDs CUST_001, CUST_002, ... to each distinct
+    owner at each FI. Accounts owned by the same customer at the same FI share a customer ID; the same
+    owner at a different FI gets a new ID. Accounts with no FI are placed at a new Dummy_Bank_<n> and
+    accounts with an unknown owner each get their own customer ID.
+
+    Args:
+        entity_results (dict): Output of the Entity_Extraction_Agent with Account_IDs, Acct_to_FI and Acct_to_Cust.
+
+    Returns:
+        dict: {"FI_to_Acct_to_Cust": {<FI>: {<Account_ID>: <Customer_ID>}}}
+    """
+    account_ids: List[str] = list(entity_results.get("Account_IDs", []) or [])
+    acct_to_fi: Dict[str, str] = dict(entity_results.get("Acct_to_FI", {}) or {})
+    acct_to_cust: Dict[str, str] = entity_results.get("Acct_to_Cust", {}) or {}
+
+    # Accounts mentioned anywhere, ordered as in Acct_to_FI first so FIs keep the agent's ordering
+    accounts = list(dict.fromkeys(list(acct_to_fi) + account_ids + list(acct_to_cust)))
+
+    missing_fi = [acct for acct in accounts if not acct_to_fi.get(acct)]
+    if missing_fi:
+        dummy_bank = f"Dummy_Bank_{_next_dummy_bank(acct_to_fi)}"
+        for acct in missing_fi:
+            acct_to_fi[acct] = dummy_bank
+        logger.info(f"Accounts {missing_fi} have no FI and were assigned to {dummy_bank}")
+
+    fi_to_accounts: Dict[str, List[str]] = {}
+    for acct in accounts:
+        fi_to_accounts.setdefault(acct_to_fi[acct], []).append(acct)
+
+    fi_to_acct_to_cust: Dict[str, Dict[str, str]] = {}
+    n_customers = 0
+    for fi, fi_accounts in fi_to_accounts.items():
+        owner_to_cust_id: Dict[str, str] = {}
+        fi_to_acct_to_cust[fi] = {}
+        for acct in fi_accounts:
+            owner = acct_to_cust.get(acct) or UNKNOWN_OWNER
+            # Unknown owners cannot be assumed to be the same customer
+            owner_key = f"{UNKNOWN_OWNER}:{acct}" if owner == UNKNOWN_OWNER else owner
+            if owner_key not in owner_to_cust_id:
+                n_customers += 1
+                owner_to_cust_id[owner_key] = f"CUST_{n_customers:03d}"
+            fi_to_acct_to_cust[fi][acct] = owner_to_cust_id[owner_key]
+
+    return {"FI_to_Acct_to_Cust": fi_to_acct_to_cust}
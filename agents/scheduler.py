@@ -0,0 +1,337 @@
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+import openai
+
+from utils import load_config
+
+logger = logging.getLogger(__name__)
+
+# Seconds to sleep between checks while waiting for a concurrency slot
+_POLL_INTERVAL = 0.05
+
+
+@dataclass
+class ModelLimits:
+    """
+    Provider limits for one model
+    """
+    rpm: int = 500
+    tpm: int = 200000
+
+
+class TokenBucket:
+    """
+    Classic token bucket refilled continuously at capacity / 60 per second.
+    Non-blocking: try_acquire returns how long the caller has to wait, so the same bucket
+    can back both the threaded and the asyncio paths.
+    """
+
+    def __init__(self, capacity: float, period: float = 60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, amount: float) -> float:
+        """
+        Take `amount` from the bucket if available and return 0, otherwise return the seconds
+        until enough capacity will have refilled. Requests larger than the bucket are clamped.
+        """
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.level >= amount:
+                self.level -= amount
+                return 0.0
+            return (amount - self.level) / self.rate
+
+    def refund(self, amount: float) -> None:
+        with self._lock:
+            self.level = min(self.capacity, self.level + amount)
+
+    def clamp(self, remaining: float) -> None:
+        """
+        Never believe we have more headroom than the provider reports
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.level = min(self.level, float(remaining))
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parse OpenAI reset headers such as "1s", "6m0s" or "250ms" into seconds
+    """
+    if not value:
+        return None
+    total = 0.0
+    matched = False
+    for amount, unit in re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value):
+        matched = True
+        total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total if matched else None
+
+
+class RequestScheduler:
+    """
+    Shared gate for every LLM request in the process.
+
+    Each model has a requests-per-minute and a tokens-per-minute bucket. A request waits until both
+    buckets can cover it (prompt tokens are estimated up front) and until one of the adaptive
+    concurrency slots is free. The concurrency limit is halved whenever the provider returns a 429
+    and grows by one on successful responses while the rate-limit headers show spare quota.
+
+    The 429 handling needs the rate-limit errors to reach the scheduler, so FunctionCallingAgent calls
+    it with pooled clients that have the OpenAI SDK's own retries turned off (max_retries=0). Agents
+    wrapped by schedule_conversable_agent only get the token-bucket limiting, see there.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, ModelLimits]] = None,
+        default_limits: Optional[ModelLimits] = None,
+        max_concurrency: int = 8,
+        max_retries: int = 5,
+    ):
+        self.limits = limits or {}
+        self.default_limits = default_limits or ModelLimits()
+        self.max_concurrency = max_concurrency
+        self.concurrency_limit = max_concurrency
+        self.max_retries = max_retries
+        self.in_flight = 0
+        self._buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self._encoders: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "rate_limited": 0, "wait_seconds": 0.0}
+
+    @classmethod
+    def from_config(cls, config_file: str) -> "RequestScheduler":
+        """
+        Build a scheduler from the `rate_limits` section of the agents config file
+        """
+        config = load_config(config_file).get("rate_limits", {}) or {}
+        default = ModelLimits(**config.get("default", {}))
+        limits = {model: ModelLimits(**vals) for model, vals in (config.get("models") or {}).items()}
+        return cls(
+            limits=limits,
+            default_limits=default,
+            max_concurrency=config.get("max_concurrency", 8),
+            max_retries=config.get("max_retries", 5),
+        )
+
+    def _get_buckets(self, model: str) -> Dict[str, TokenBucket]:
+        with self._lock:
+            if model not in self._buckets:
+                limits = self.limits.get(model, self.default_limits)
+                self._buckets[model] = {"requests": TokenBucket(limits.rpm), "tokens": TokenBucket(limits.tpm)}
+            return self._buckets[model]
+
+    def estimate_tokens(self, api_kwargs: Dict[str, Any]) -> int:
+        """
+        Estimate the tokens a request will be charged for: prompt (messages and function schemas)
+        plus the completion budget when max_tokens is set.
+        """
+        text = json.dumps(api_kwargs.get("messages", []), default=str)
+        if api_kwargs.get("functions"):
+            text += json.dumps(api_kwargs["functions"], default=str)
+        if api_kwargs.get("tools"):
+            text += json.dumps(api_kwargs["tools"], default=str)
+        n_tokens = self._count_tokens(api_kwargs.get("model", ""), text)
+        return n_tokens + int(api_kwargs.get("max_tokens") or 0)
+
+    def _count_tokens(self, model: str, text: str) -> int:
+        encoder = self._encoders.get(model)
+        if encoder is None:
+            try:
+                import tiktoken
+                try:
+                    encoder = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    encoder = tiktoken.get_encoding("o200k_base")
+            except Exception:  # tiktoken missing or encoding files unavailable offline
+                encoder = False
+            self._encoders[model] = encoder
+        if encoder is False:
+            return len(text) // 4 + 1
+        return len(encoder.encode(text))
+
+    def _try_acquire(self, model: str, tokens: int) -> float:
+        """
+        Reserve a concurrency slot, a request and `tokens` tokens. Returns 0 on success or the seconds to wait.
+        """
+        with self._lock:
+            if self.in_flight >= self.concurrency_limit:
+                return _POLL_INTERVAL
+            self.in_flight += 1
+        buckets = self._get_buckets(model)
+        wait = buckets["requests"].try_acquire(1)
+        if wait == 0:
+            wait = buckets["tokens"].try_acquire(tokens)
+            if wait > 0:
+                # Give the request back; it is retaken together with the tokens
+                buckets["requests"].refund(1)
+        if wait > 0:
+            with self._lock:
+                self.in_flight -= 1
+        return wait
+
+    def acquire(self, model: str, tokens: int) -> None:
+        while True:
+            wait = self._try_acquire(model, tokens)
+            if wait == 0:
+                return
+            self.stats["wait_seconds"] += wait
+            time.sleep(wait)
+
+    async def aacquire(self, model: str, tokens: int) -> None:
+        while True:
+            wait = self._try_acquire(model, tokens)
+            if wait == 0:
+                return
+            self.stats["wait_seconds"] += wait
+            await asyncio.sleep(wait)
+
+    def release(self, model: str, headers: Optional[Any] = None) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.stats["requests"] += 1
+        if headers is not None:
+            self.update_from_headers(model, headers)
+
+    def update_from_headers(self, model: str, headers: Any) -> None:
+        """
+        Sync the buckets with the x-ratelimit-* headers and grow concurrency while quota is spare
+        """
+        buckets = self._get_buckets(model)
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_requests is not None:
+            buckets["requests"].clamp(float(remaining_requests))
+        if remaining_tokens is not None:
+            buckets["tokens"].clamp(float(remaining_tokens))
+
+        spare = all(
+            remaining is None or float(remaining) > 0.2 * buckets[kind].capacity
+            for kind, remaining in (("requests", remaining_requests), ("tokens", remaining_tokens))
+        )
+        with self._lock:
+            if spare and self.concurrency_limit < self.max_concurrency:
+                self.concurrency_limit += 1
+
+    def on_rate_limited(self, model: str, headers: Optional[Any] = None) -> float:
+        """
+        Halve concurrency after a 429 and return how long to back off before retrying
+        """
+        with self._lock:
+            self.concurrency_limit = max(1, self.concurrency_limit // 2)
+            self.stats["rate_limited"] += 1
+        backoff = None
+        if headers is not None:
+            backoff = parse_reset_duration(headers.get("x-ratelimit-reset-tokens")) or \
+                      parse_reset_duration(headers.get("x-ratelimit-reset-requests"))
+            if headers.get("retry-after"):
+                try:
+                    backoff = float(headers["retry-after"])
+                except ValueError:
+                    pass
+        logger.warning(f"Rate limited on model '{model}'. Concurrency reduced to {self.concurrency_limit}")
+        return backoff if backoff is not None else 1.0
+
+    def _finish(self, model: str, result: Any) -> Any:
+        # Raw responses (with_raw_response) carry the rate-limit headers and must be parsed
+        headers = getattr(result, "headers", None)
+        self.release(model, headers)
+        if headers is not None and hasattr(result, "parse"):
+            return result.parse()
+        return result
+
+    def call(self, func: Callable[..., Any], api_kwargs: Dict[str, Any], model: Optional[str] = None) -> Any:
+        """
+        Run func(**api_kwargs) once the buckets allow it, retrying on 429s
+        """
+        model = model or api_kwargs.get("model", "")
+        tokens = self.estimate_tokens(api_kwargs)
+        for attempt in range(self.max_retries + 1):
+            self.acquire(model, tokens)
+            try:
+                result = func(**api_kwargs)
+            except openai.RateLimitError as e:
+                self.release(model)
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self.on_rate_limited(model, getattr(e.response, "headers", None)) * (attempt + 1))
+                continue
+            except Exception:
+                self.release(model)
+                raise
+            return self._finish(model, result)
+
+    async def acall(self, func: Callable[..., Any], api_kwargs: Dict[str, Any], model: Optional[str] = None) -> Any:
+        """
+        Async counterpart of call for coroutine functions
+        """
+        model = model or api_kwargs.get("model", "")
+        tokens = self.estimate_tokens(api_kwargs)
+        for attempt in range(self.max_retries + 1):
+            await self.aacquire(model, tokens)
+            try:
+                result = await func(**api_kwargs)
+            except openai.RateLimitError as e:
+                self.release(model)
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self.on_rate_limited(model, getattr(e.response, "headers", None)) * (attempt + 1))
+                continue
+            except Exception:
+                self.release(model)
+                raise
+            return self._finish(model, result)
+
+
+def schedule_conversable_agent(agent: Any, scheduler: RequestScheduler) -> Any:
+    """
+    Route every LLM call an autogen ConversableAgent makes (chat replies and reflection_with_llm
+    summaries) through the scheduler by wrapping its OpenAIWrapper.create.
+
+    This path only gets the token-bucket limiting (and the concurrency slots): autogen builds its own
+    OpenAI client from llm_config with the SDK's default retries, so 429s are retried inside the SDK
+    before the scheduler sees them and the adaptive concurrency does not react to them.
+    """
+    client = getattr(agent, "client", None)
+    if client is None:
+        return agent
+    create = client.create
+    model = (agent.llm_config or {}).get("model", "")
+
+    def _scheduled_create(**config):
+        return scheduler.call(create, config, model=config.get("model") or model)
+
+    client.create = _scheduled_create
+    return agent
+
+
+_schedulers: Dict[str, RequestScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(config_file: str) -> RequestScheduler:
+    """
+    Return the process-wide scheduler for a config file so every workflow shares the same buckets
+    """
+    with _schedulers_lock:
+        if config_file not in _schedulers:
+            _schedulers[config_file] = RequestScheduler.from_config(config_file)
+            logger.info(f"Request scheduler created from {config_file}")
+        return _schedulers[config_file]
@@ -0,0 +1,427 @@
+"""
+Local, deterministic, OpenAI-compatible stand-in for the Chat Completions API.
+
+Used to benchmark the workflows (orchestration overhead, concurrency, parsing) with no network.
+Select it with `llm_backend.provider: stand_in` in configs/agents_config.yaml and start it with
+
+    python -m agents.stand_in_server --config configs/agents_config.yaml
+"""
+import argparse
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field, fields
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from agents.cache import LLMResponseCache, make_cache_key
+from agents.compact_output import to_compact_trxns
+from agents.structured_outputs import to_structured_records
+from utils import load_config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StandInSettings:
+    """
+    Behaviour of the stand-in server. Latency is drawn per request from `latency` and
+    completion tokens are "streamed" at output_tokens_per_second on top of it.
+    """
+    host: str = "127.0.0.1"
+    port: int = 8765
+    mode: str = "synthesize"                  # "synthesize" or "replay"
+    replay_cache_dir: Optional[str] = None    # LLMResponseCache directory holding recorded responses
+    replay_fallback: str = "synthesize"       # what to do on a replay miss: "synthesize" or "error"
+    seed: int = 0
+    latency: Dict[str, Any] = field(default_factory=lambda: {"distribution": "constant", "ms": 0})
+    output_tokens_per_second: float = 0.0
+    rate_limit_error_rate: float = 0.0
+    rpm: int = 0                              # 0 disables the simulated provider limits
+    tpm: int = 0
+
+    @classmethod
+    def from_config(cls, config_file: str) -> "StandInSettings":
+        backend = load_config(config_file).get("llm_backend", {}) or {}
+        config = backend.get("stand_in", {}) or {}
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in config.items() if k in known})
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+
+def request_hash(body: Dict[str, Any]) -> str:
+    """
+    Requests are keyed exactly like LLMResponseCache so recorded cache entries can be replayed
+    """
+    return make_cache_key(body)
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+########################################################
+# Synthesis of schema-valid outputs
+########################################################
+
+_ACCOUNT_PATTERN = re.compile(r"#\s?([0-9][0-9-]{3,})")
+
+
+def _conversation_text(messages: List[Dict[str, Any]]) -> str:
+    return "\n".join(str(m.get("content") or "") for m in messages)
+
+
+def _accounts_in(text: str) -> List[str]:
+    accounts = list(dict.fromkeys(_ACCOUNT_PATTERN.findall(text)))
+    return accounts or ["Dummy_Acct_1"]
+
+
+def _synthesize_generate_transactions(rng: random.Random, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Arguments for generate_transactions using the parties of the sub-narrative when they can be read from the prompt
+    """
+    originator = {}
+    try:
+        narrative = json.loads(messages[-1]["content"])
+        acct = next(iter(narrative["Narratives"]))
+        owner = narrative.get("Acct_to_Cust", {}).get(acct, "Unknown")
+        fi = narrative.get("Acct_to_FI", {}).get(acct, "")
+        cust_id = narrative.get("FI_to_Acct_to_Cust", {}).get(fi, {}).get(acct, "")
+        originator = {"Originator_Name": owner, "Originator_Account_ID": acct, "Originator_Customer_ID": cust_id}
+    except (KeyError, ValueError, TypeError, StopIteration, IndexError):
+        pass
+    start = date(2024, 1, 1) + timedelta(days=rng.randrange(0, 300))
+    end = start + timedelta(days=rng.randrange(7, 90))
+    n_transactions = rng.randrange(10, 60)
+    return {
+        "Originator_Name": originator.get("Originator_Name", "Unknown"),
+        "Originator_Account_ID": originator.get("Originator_Account_ID", ""),
+        "Originator_Customer_ID": originator.get("Originator_Customer_ID", ""),
+        "Beneficiary_Name": "Unknown",
+        "Beneficiary_Account_ID": "",
+        "Beneficiary_Customer_ID": "",
+        "Trxn_Channel": rng.sample(["Wire", "Cash", "Check"], k=rng.randrange(1, 3)),
+        "Start_Date": start.isoformat(),
+        "End_Date": end.isoformat(),
+        "Min_Ind_Trxn_Amt": "",
+        "Max_Ind_Trxn_Amt": "",
+        "Total_Amount": round(n_transactions * rng.uniform(2000, 9500), 2),
+        "N_transactions": n_transactions,
+        "Branch_or_ATM_Location": [""],
+    }
+
+
+def _synthesize_from_schema(rng: random.Random, schema: Dict[str, Any]) -> Any:
+    """
+    Generic fallback: a value that validates against a (simple) JSON schema
+    """
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    kind = schema.get("type", "string")
+    if isinstance(kind, list):
+        kind = kind[0]
+    if kind == "object":
+        props = schema.get("properties", {})
+        return {name: _synthesize_from_schema(rng, sub) for name, sub in props.items()}
+    if kind == "array":
+        # e.g. choose_agents asks for exactly one choice per narrative
+        return [_synthesize_from_schema(rng, schema.get("items", {"type": "string"}))
+                for _ in range(max(schema.get("minItems", 1), 1))]
+    if kind == "integer":
+        return rng.randrange(1, 20)
+    if kind == "number":
+        return round(rng.uniform(100, 10000), 2)
+    if kind == "boolean":
+        return bool(rng.getrandbits(1))
+    return ""
+
+
+def _synthesize_function_arguments(rng: random.Random, name: str, schema: Dict[str, Any],
+                                   messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if name == "generate_transactions":
+        return _synthesize_generate_transactions(rng, messages)
+    # choose_agent, choose_agents and any other function: derive from its schema
+    return _synthesize_from_schema(rng, schema.get("parameters", {}))
+
+
+def _synthesize_tool_calls(rng: random.Random, schema: Dict[str, Any], messages: List[Dict[str, Any]],
+                           parallel: bool) -> List[Dict[str, Any]]:
+    """
+    Tool calls of a tools API reply. With parallel calls allowed, generate_transactions is called once per account
+    the narrative sends to (at most 3), as a model would for a fan-out narrative.
+    """
+    args = _synthesize_function_arguments(rng, schema["name"], schema, messages)
+    calls = [args]
+    if parallel and schema["name"] == "generate_transactions":
+        counterparties = [acct for acct in _accounts_in(_conversation_text(messages[-1:]))
+                          if acct not in (args["Originator_Account_ID"], "Dummy_Acct_1")][:3]
+        calls = [{**args, "Beneficiary_Account_ID": acct} for acct in counterparties] or calls
+    return [{"id": f"call_{i}", "type": "function",
+             "function": {"name": schema["name"], "arguments": json.dumps(call_args)}}
+            for i, call_args in enumerate(calls)]
+
+
+def _synthesize_transactions_json(rng: random.Random, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Output contract of the Transaction_Generation_Agent: compact trxns with the parties shared (see
+    agents/compact_output.py)
+    """
+    args = _synthesize_generate_transactions(rng, messages)
+    start = date.fromisoformat(args["Start_Date"])
+    trxns = {}
+    for i in range(rng.randrange(1, 6)):
+        trxns[str(i + 1)] = {
+            "Originator_Name": args["Originator_Name"],
+            "Originator_Account_ID": args["Originator_Account_ID"],
+            "Originator_Customer_ID": args["Originator_Customer_ID"],
+            "Beneficiary_Name": args["Beneficiary_Name"],
+            "Beneficiary_Account_ID": args["Beneficiary_Account_ID"],
+            "Beneficiary_Customer_ID": args["Beneficiary_Customer_ID"],
+            "Trxn_Channel": rng.choice(args["Trxn_Channel"]),
+            "Trxn_Date": (start + timedelta(days=rng.randrange(0, 30))).isoformat(),
+            "Trxn_Amount": round(rng.uniform(500, 9500), 2),
+            "Branch_or_ATM_Location": "",
+        }
+    return to_compact_trxns(trxns)
+
+
+def _synthesize_workflow1_summary(messages: List[Dict[str, Any]], prompt: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Workflow 1 summary prompts are recognised by the artefact they ask for. The synthetic artefacts
+    are consistent across the three stages so workflow 2 can run on the result.
+    """
+    prompt = str(messages[-1].get("content") or "") if prompt is None else prompt
+    accounts = _accounts_in(_conversation_text(messages))
+    if "FI_to_Acct_to_Cust" in prompt:
+        return {"FI_to_Acct_to_Cust": {"Dummy_Bank_1": {acct: f"CUST_{i + 1:03d}" for i, acct in enumerate(accounts)}}}
+    if "Narratives" in prompt:
+        return {"Narratives": {acct: {"Trxn_Set_1": f"Customer_{i + 1} made multiple cash deposits into Acct #{acct} "
+                                                    f"between Jan 1, 2024 and Mar 31, 2024 totaling $90,000."}
+                               for i, acct in enumerate(accounts)}}
+    if "Entities" in prompt:
+        return {
+            "Entities": {"Individuals": [f"Customer_{i + 1}" for i in range(len(accounts))], "Organizations": [],
+                         "Financial_Institutions": ["Dummy_Bank_1"], "Locations": []},
+            "Account_IDs": accounts,
+            "Acct_to_FI": {acct: "Dummy_Bank_1" for acct in accounts},
+            "Acct_to_Cust": {acct: f"Customer_{i + 1}" for i, acct in enumerate(accounts)},
+        }
+    return None
+
+
+def synthesize_message(body: Dict[str, Any], key: str, seed: int = 0) -> Dict[str, Any]:
+    """
+    Build a deterministic assistant message for a request. The same request body always yields the same message.
+    """
+    rng = random.Random(f"{seed}:{key}")
+    messages = body.get("messages", [])
+    functions = body.get("functions") or []
+    forced = (body.get("function_call") or {}).get("name") if isinstance(body.get("function_call"), dict) else None
+    tools = [tool["function"] for tool in body.get("tools") or [] if tool.get("type") == "function"]
+    if tools:
+        return {"role": "assistant", "content": None,
+                "tool_calls": _synthesize_tool_calls(rng, tools[0], messages, bool(body.get("parallel_tool_calls")))}
+    if functions:
+        schema = next((f for f in functions if f.get("name") == forced), functions[0])
+        arguments = _synthesize_function_arguments(rng, schema["name"], schema, messages)
+        return {"role": "assistant", "content": None,
+                "function_call": {"name": schema["name"], "arguments": json.dumps(arguments)}}
+
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        # Structured-output mode of workflow 1: identify the stage from the schema's top-level properties
+        properties = " ".join(response_format["json_schema"].get("schema", {}).get("properties", {}))
+        user_messages = [m for m in messages if m.get("role") != "system"]
+        summary = _synthesize_workflow1_summary(user_messages, prompt=properties) or {}
+        return {"role": "assistant", "content": json.dumps(to_structured_records(summary))}
+
+    if response_format.get("type") == "json_object":
+        return {"role": "assistant", "content": json.dumps(_synthesize_transactions_json(rng, messages))}
+
+    summary = _synthesize_workflow1_summary(messages)
+    if summary is not None:
+        return {"role": "assistant", "content": repr(summary)}
+    return {"role": "assistant", "content": "Acknowledged."}
+
+
+########################################################
+# Server
+########################################################
+
+class StandInBackend:
+    """
+    Request handling independent of HTTP so it can be exercised directly in tests and benchmarks
+    """
+
+    def __init__(self, settings: StandInSettings):
+        self.settings = settings
+        self._rng = random.Random(settings.seed)
+        self._lock = threading.Lock()
+        self._window: deque = deque()   # (timestamp, tokens) of requests in the last minute
+        self.replay = None
+        if settings.mode == "replay":
+            if not settings.replay_cache_dir:
+                raise ValueError("replay mode requires stand_in.replay_cache_dir")
+            self.replay = LLMResponseCache(directory=settings.replay_cache_dir, ttl=None)
+        self.stats = {"requests": 0, "replayed": 0, "synthesized": 0, "rate_limited": 0}
+
+    def sample_latency(self, completion_tokens: int) -> float:
+        spec = self.settings.latency or {}
+        kind = spec.get("distribution", "constant")
+        with self._lock:
+            if kind == "uniform":
+                ms = self._rng.uniform(spec.get("min_ms", 0), spec.get("max_ms", 0))
+            elif kind == "normal":
+                ms = max(0.0, self._rng.gauss(spec.get("mean_ms", 0), spec.get("std_ms", 0)))
+            elif kind == "lognormal":
+                ms = spec.get("median_ms", 0) * self._rng.lognormvariate(0, spec.get("sigma", 0.5))
+            else:
+                ms = spec.get("ms", 0)
+        seconds = ms / 1000.0
+        if self.settings.output_tokens_per_second > 0:
+            seconds += completion_tokens / self.settings.output_tokens_per_second
+        return seconds
+
+    def _rate_limit_headers(self, tokens: int) -> Tuple[bool, Dict[str, str]]:
+        """
+        Track a one minute window and decide if the request is throttled (simulated limits or random injection)
+        """
+        now = time.monotonic()
+        with self._lock:
+            while self._window and now - self._window[0][0] > 60:
+                self._window.popleft()
+            used_requests = len(self._window)
+            used_tokens = sum(t for _, t in self._window)
+            over = (self.settings.rpm and used_requests + 1 > self.settings.rpm) or \
+                   (self.settings.tpm and used_tokens + tokens > self.settings.tpm)
+            injected = self._rng.random() < self.settings.rate_limit_error_rate
+            if not over and not injected:
+                self._window.append((now, tokens))
+                used_requests += 1
+                used_tokens += tokens
+        headers = {}
+        if self.settings.rpm:
+            headers["x-ratelimit-limit-requests"] = str(self.settings.rpm)
+            headers["x-ratelimit-remaining-requests"] = str(max(0, self.settings.rpm - used_requests))
+            headers["x-ratelimit-reset-requests"] = "1s"
+        if self.settings.tpm:
+            headers["x-ratelimit-limit-tokens"] = str(self.settings.tpm)
+            headers["x-ratelimit-remaining-tokens"] = str(max(0, self.settings.tpm - used_tokens))
+            headers["x-ratelimit-reset-tokens"] = "1s"
+        return bool(over or injected), headers
+
+    def handle(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any], Dict[str, str], float]:
+        """
+        Returns (status, json body, headers, latency in seconds)
+        """
+        key = request_hash(body)
+        prompt_tokens = _estimate_tokens(json.dumps(body.get("messages", [])))
+        throttled, headers = self._rate_limit_headers(prompt_tokens)
+        with self._lock:
+            self.stats["requests"] += 1
+        if throttled:
+            with self._lock:
+                self.stats["rate_limited"] += 1
+            headers["retry-after"] = "1"
+            error = {"error": {"message": "Rate limit reached (stand-in)", "type": "requests", "code": "rate_limit_exceeded"}}
+            return 429, error, headers, 0.0
+
+        message = None
+        if self.replay is not None:
+            recorded = self.replay.get(key)
+            if recorded is not None:
+                message = {"role": "assistant", **recorded}
+                if not message.get("function_call"):
+                    message.pop("function_call", None)
+                # Recorded tool calls only keep the function name and arguments
+                tool_calls = message.pop("tool_calls", None)
+                if tool_calls:
+                    message["tool_calls"] = [{"id": f"call_{i}", "type": "function", "function": call}
+                                             for i, call in enumerate(tool_calls)]
+                with self._lock:
+                    self.stats["replayed"] += 1
+            elif self.settings.replay_fallback == "error":
+                return 404, {"error": {"message": f"No recorded response for request {key}"}}, headers, 0.0
+        if message is None:
+            message = synthesize_message(body, key, self.settings.seed)
+            with self._lock:
+                self.stats["synthesized"] += 1
+
+        output = message.get("content") or json.dumps(message.get("function_call") or message.get("tool_calls"))
+        completion_tokens = _estimate_tokens(output)
+        response = {
+            "id": f"chatcmpl-standin-{key[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stand-in"),
+            "choices": [{"index": 0, "message": message,
+                         "finish_reason": "tool_calls" if message.get("tool_calls") else
+                                          "function_call" if message.get("function_call") else "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+        return 200, response, headers, self.sample_latency(completion_tokens)
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    backend: StandInBackend = None
+    # Keep-alive like the real API, so connection pooling behaves the same against the stand-in
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, {"error": {"message": f"Unsupported path {self.path}"}}, {})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        status, payload, headers, latency = self.backend.handle(body)
+        if latency:
+            time.sleep(latency)
+        self._send(status, payload, headers)
+
+    def _send(self, status: int, payload: Dict[str, Any], headers: Dict[str, str]) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug("stand-in: " + format, *args)
+
+
+def start_stand_in_server(settings: StandInSettings) -> ThreadingHTTPServer:
+    """
+    Start the stand-in on a daemon thread and return the server (call .shutdown() to stop it)
+    """
+    handler = type("StandInHandler", (_StandInHandler,), {"backend": StandInBackend(settings)})
+    server = ThreadingHTTPServer((settings.host, settings.port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logger.info(f"Stand-in LLM server listening on {settings.base_url} (mode={settings.mode})")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the local stand-in for the OpenAI Chat Completions API.")
+    parser.add_argument("--config", default="configs/agents_config.yaml", help="Agents config file with an llm_backend section")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = start_stand_in_server(StandInSettings.from_config(args.config))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
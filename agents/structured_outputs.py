@@ -0,0 +1,128 @@
+import json
+import logging
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# JSON-schema response formats for the workflow 1 agents. Strict structured outputs do not allow objects
+# with arbitrary keys, so every mapping (Acct_to_FI, FI_to_Acct_to_Cust, Narratives ...) is returned as a
+# list of records and converted back to the dictionaries the rest of the pipeline expects.
+
+
+def _string_list(description: str) -> Dict[str, Any]:
+    return {"type": "array", "items": {"type": "string"}, "description": description}
+
+
+def _records(description: str, **fields: str) -> Dict[str, Any]:
+    return {
+        "type": "array",
+        "description": description,
+        "items": {
+            "type": "object",
+            "properties": {field: {"type": "string", "description": desc} for field, desc in fields.items()},
+            "required": list(fields),
+            "additionalProperties": False,
+        },
+    }
+
+
+def _json_schema_format(name: str, properties: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": properties,
+                "required": list(properties),
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+WORKFLOW1_RESPONSE_FORMATS = {
+    "Entity_Extraction_Agent": _json_schema_format("entity_extraction", {
+        "Entities": {
+            "type": "object",
+            "properties": {
+                "Individuals": _string_list("Individuals described in the narrative"),
+                "Organizations": _string_list("Organizations described in the narrative"),
+                "Financial_Institutions": _string_list("Financial institutions, including Dummy_Bank_<n>"),
+                "Locations": _string_list("Branch or ATM locations"),
+            },
+            "required": ["Individuals", "Organizations", "Financial_Institutions", "Locations"],
+            "additionalProperties": False,
+        },
+        "Account_IDs": _string_list("Account IDs, including Dummy_Acct_<n>"),
+        "Acct_to_FI": _records("Financial institution each account is held at",
+                               Account_ID="Account ID", Financial_Institution="Financial institution"),
+        "Acct_to_Cust": _records("Individual or organization owning each account, or Unknown",
+                                 Account_ID="Account ID", Customer="Owner of the account"),
+    }),
+    "Entity_Resolution_Agent": _json_schema_format("entity_resolution", {
+        "FI_to_Acct_to_Cust": _records("Customer ID of each account at each financial institution",
+                                       Financial_Institution="Financial institution", Account_ID="Account ID",
+                                       Customer_ID="Customer ID e.g. CUST_001"),
+    }),
+    "Narrative_Extraction_Agent": _json_schema_format("narrative_extraction", {
+        "Narratives": _records("Excerpt of the narrative for each transaction set of each account",
+                               Account_ID="Account ID", Trxn_Set_ID="Trxn_Set_<n>",
+                               Narrative="Excerpt relevant to the transaction set"),
+    }),
+}
+
+
+def parse_structured_output(agent_name: str, content: str) -> Dict[str, Any]:
+    """
+    Convert the JSON returned by a workflow 1 agent in structured-output mode to the dictionary its
+    summary_prompt would have produced.
+
+    Args:
+        agent_name (str): Name of the workflow 1 agent.
+        content (str): JSON content of the agent's reply.
+
+    Returns:
+        dict: Artefacts of the agent e.g. {"FI_to_Acct_to_Cust": {<FI>: {<Acct>: <Cust_ID>}}}
+    """
+    payload = json.loads(content) if isinstance(content, str) else content
+    if agent_name == "Entity_Extraction_Agent":
+        return {
+            "Entities": payload["Entities"],
+            "Account_IDs": payload["Account_IDs"],
+            "Acct_to_FI": {r["Account_ID"]: r["Financial_Institution"] for r in payload["Acct_to_FI"]},
+            "Acct_to_Cust": {r["Account_ID"]: r["Customer"] for r in payload["Acct_to_Cust"]},
+        }
+    if agent_name == "Entity_Resolution_Agent":
+        fi_to_acct_to_cust: Dict[str, Dict[str, str]] = {}
+        for r in payload["FI_to_Acct_to_Cust"]:
+            fi_to_acct_to_cust.setdefault(r["Financial_Institution"], {})[r["Account_ID"]] = r["Customer_ID"]
+        return {"FI_to_Acct_to_Cust": fi_to_acct_to_cust}
+    if agent_name == "Narrative_Extraction_Agent":
+        narratives: Dict[str, Dict[str, str]] = {}
+        for r in payload["Narratives"]:
+            narratives.setdefault(r["Account_ID"], {})[r["Trxn_Set_ID"]] = r["Narrative"]
+        return {"Narratives": narratives}
+    raise ValueError(f"No structured output format defined for agent '{agent_name}'")
+
+
+def to_structured_records(artefacts: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Inverse of parse_structured_output: express workflow 1 artefacts in the record form of the response formats
+    """
+    records: Dict[str, Any] = {}
+    for key, value in artefacts.items():
+        if key == "Acct_to_FI":
+            records[key] = [{"Account_ID": a, "Financial_Institution": fi} for a, fi in value.items()]
+        elif key == "Acct_to_Cust":
+            records[key] = [{"Account_ID": a, "Customer": c} for a, c in value.items()]
+        elif key == "FI_to_Acct_to_Cust":
+            records[key] = [{"Financial_Institution": fi, "Account_ID": a, "Customer_ID": c}
+                            for fi, accts in value.items() for a, c in accts.items()]
+        elif key == "Narratives":
+            records[key] = [{"Account_ID": a, "Trxn_Set_ID": s, "Narrative": n}
+                            for a, sets in value.items() for s, n in sets.items()]
+        else:
+            records[key] = value
+    return records
@@ -0,0 +1,272 @@
+import logging
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Deterministic fast path for transaction listings embedded in SARs as delimited tables. Rows are turned straight
+# into the transaction schema of workflow 2 and only the free text around the tables is sent to the agents.
+
+# Canonical column -> header synonyms (lower case, punctuation stripped)
+COLUMN_SYNONYMS = {
+    "Trxn_Date": ["date", "trxn date", "transaction date", "txn date", "value date", "posting date", "post date"],
+    "Account_ID": ["account", "account number", "account no", "account id", "acct", "acct number", "acct no",
+                   "account num", "subject account", "originator account"],
+    "Trxn_Amount": ["amount", "deposit amount", "transaction amount", "trxn amount", "txn amount", "amount usd",
+                    "usd amount", "wire amount", "withdrawal amount", "check amount", "value"],
+    "Trxn_Type": ["type", "transaction type", "trxn type", "txn type", "channel", "method", "activity",
+                  "transaction", "description"],
+    "Counterparty_Name": ["beneficiary", "beneficiary name", "payee", "recipient", "counterparty",
+                          "counterparty name", "remitter", "originator", "sender"],
+    "Counterparty_Account_ID": ["beneficiary account", "beneficiary account number", "beneficiary acct",
+                                "payee account", "recipient account", "counterparty account", "remitter account",
+                                "originator account number", "sender account"],
+    "Counterparty_Bank": ["bank", "beneficiary bank", "receiving bank", "counterparty bank", "sending bank",
+                          "remitter bank", "institution", "financial institution"],
+    "Location": ["location", "branch", "branch location", "atm", "atm location", "city", "country"],
+}
+
+_HEADER_LOOKUP = {synonym: column for column, synonyms in COLUMN_SYNONYMS.items() for synonym in synonyms}
+_REQUIRED_COLUMNS = {"Trxn_Date", "Trxn_Amount"}
+_DATE_FORMATS = ["%m/%d/%y", "%m/%d/%Y", "%Y-%m-%d", "%d-%b-%Y", "%d-%b-%y", "%b %d, %Y", "%B %d, %Y",
+                 "%d %b %Y", "%d %B %Y", "%m-%d-%Y", "%m-%d-%y", "%Y/%m/%d"]
+_INCOMING_PATTERN = re.compile(r"\b(incoming|received|receipt|credit|inbound)\b", re.IGNORECASE)
+
+
+@dataclass
+class TableBlock:
+    """
+    A delimited transaction table found in a SAR.
+
+    :param start: Index of the header line in the SAR's lines.
+    :param end: Index one past the last line of the table.
+    :param columns: Canonical column name for each cell of the header, None for unmapped columns.
+    :param rows: Cells of each data row, padded to the header width.
+    :param unparsed_lines: Data lines whose date or amount could not be normalised. They are left in the free text.
+    """
+    start: int
+    end: int
+    columns: List[Optional[str]]
+    rows: List[List[str]] = field(default_factory=list)
+    unparsed_lines: List[str] = field(default_factory=list)
+
+
+def _normalise_header(cell: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^a-z0-9 ]", " ", cell.lower())).strip()
+
+
+def map_columns(header_cells: List[str]) -> List[Optional[str]]:
+    """
+    Map header cells to canonical column names using COLUMN_SYNONYMS. Each canonical column is used at most once.
+    """
+    columns, used = [], set()
+    for cell in header_cells:
+        column = _HEADER_LOOKUP.get(_normalise_header(cell))
+        columns.append(column if column not in used else None)
+        used.add(column)
+    return columns
+
+
+def normalise_amount(value: str) -> Optional[float]:
+    """
+    "$9,900" -> 9900.0, "USD 1,234.50" -> 1234.5, "(500)" -> -500.0. Returns None if no amount is found.
+    """
+    text = value.strip()
+    negative = text.startswith("(") and text.endswith(")") or text.startswith("-")
+    match = re.search(r"\d[\d,]*(?:\.\d+)?", text)
+    if not match:
+        return None
+    amount = float(match.group(0).replace(",", ""))
+    return -amount if negative else amount
+
+
+def normalise_date(value: str) -> Optional[str]:
+    """
+    Parse a date in any of the common SAR formats and return it as yyyy-mm-dd, or None if it can't be parsed.
+    """
+    text = re.sub(r"\s+", " ", value.strip())
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def normalise_account(value: str) -> str:
+    return re.sub(r"^(acct|account)?\s*(no\.?|number)?\s*#?\s*", "", value.strip(), flags=re.IGNORECASE)
+
+
+def normalise_channel(value: str) -> str:
+    """
+    Map a free-text transaction type to the channels used by workflow 2 (Wire, Cash, Check)
+    """
+    text = value.lower()
+    if "wire" in text:
+        return "Wire"
+    if "cash" in text and "check" not in text and "cheque" not in text:
+        return "Cash"
+    if "check" in text or "cheque" in text:
+        return "Check"
+    return value.strip()
+
+
+def _split_row(line: str) -> Optional[List[str]]:
+    if "\t" in line:
+        return [cell.strip() for cell in line.split("\t")]
+    stripped = line.strip()
+    if stripped.startswith("|") and stripped.endswith("|"):
+        return [cell.strip() for cell in stripped.strip("|").split("|")]
+    return None
+
+
+def _row_is_valid(cells: List[str], columns: List[Optional[str]]) -> bool:
+    values = dict(zip(columns, cells))
+    return (normalise_date(values.get("Trxn_Date", "")) is not None and
+            normalise_amount(values.get("Trxn_Amount", "")) is not None)
+
+
+def detect_tables(sar_text: str) -> List[TableBlock]:
+    """
+    Find delimited (tab or pipe) transaction tables whose header maps to at least a date and an amount column.
+
+    Args:
+        sar_text (str): The SAR narrative.
+
+    Returns:
+        list of TableBlock: Tables in the order they appear.
+    """
+    lines = sar_text.splitlines()
+    tables = []
+    i = 0
+    while i < len(lines):
+        header = _split_row(lines[i])
+        columns = map_columns(header) if header else []
+        if not _REQUIRED_COLUMNS <= set(columns):
+            i += 1
+            continue
+        table = TableBlock(start=i, end=i + 1, columns=columns)
+        j = i + 1
+        while j < len(lines):
+            cells = _split_row(lines[j])
+            if cells is None:
+                break
+            if all(re.fullmatch(r":?-+:?", cell) for cell in cells if cell):  # markdown separator row
+                j += 1
+                continue
+            cells = (cells + [""] * len(columns))[:len(columns)]
+            if _row_is_valid(cells, columns):
+                table.rows.append(cells)
+            else:
+                table.unparsed_lines.append(lines[j])
+            j += 1
+        table.end = j
+        if table.rows:
+            tables.append(table)
+            logger.info(f"Detected table with {len(table.rows)} rows and columns {columns}")
+        i = j
+    return tables
+
+
+def _table_summary(table: TableBlock) -> str:
+    records = [dict(zip(table.columns, row)) for row in table.rows]
+    accounts = list(dict.fromkeys(normalise_account(r.get("Account_ID", "")) for r in records
+                                  if r.get("Account_ID")))
+    counterparties = list(dict.fromkeys(
+        " ".join(part for part in [r.get("Counterparty_Name", ""),
+                                   f"(account #{normalise_account(r['Counterparty_Account_ID'])})"
+                                   if r.get("Counterparty_Account_ID") else "",
+                                   f"at {r['Counterparty_Bank']}" if r.get("Counterparty_Bank") else ""] if part)
+        for r in records if r.get("Counterparty_Name")))
+    dates = sorted(normalise_date(r["Trxn_Date"]) for r in records)
+    summary = (f"[{len(records)} transactions dated {dates[0]} to {dates[-1]} were listed in a table here and have "
+               f"already been extracted; do not summarise them as transactions.")
+    if accounts:
+        summary += " Accounts: " + ", ".join(f"#{acct}" for acct in accounts) + "."
+    if counterparties:
+        summary += " Counterparties: " + "; ".join(counterparties) + "."
+    return summary + "]"
+
+
+def split_tabular_sar(sar_text: str) -> Tuple[str, List[TableBlock]]:
+    """
+    Separate the transaction tables of a SAR from its free text.
+
+    Each table is replaced by a one-line note naming its accounts and counterparties so entity extraction still
+    sees them. Rows that could not be parsed are kept in the free text.
+
+    Returns:
+        tuple: (free-text remainder for the agents, detected tables)
+    """
+    tables = detect_tables(sar_text)
+    if not tables:
+        return sar_text, []
+    lines = sar_text.splitlines()
+    remainder, last = [], 0
+    for table in tables:
+        remainder.extend(lines[last:table.start])
+        remainder.append(_table_summary(table))
+        remainder.extend(table.unparsed_lines)
+        last = table.end
+    remainder.extend(lines[last:])
+    return "\n".join(remainder), tables
+
+
+def _customer_id(acct: str, fi_to_acct_to_cust: Dict[str, Dict[str, str]]) -> str:
+    for acct_to_cust in fi_to_acct_to_cust.values():
+        if acct in acct_to_cust:
+            return acct_to_cust[acct]
+    return ""
+
+
+def tables_to_trxns(tables: List[TableBlock], entity_results: Dict[str, Any]) -> Dict[int, Dict[str, Any]]:
+    """
+    Convert table rows to transactions in the workflow 2 schema, using the workflow 1 results for account owners
+    and customer IDs.
+
+    A row without a counterparty (e.g. a cash deposit) has the account owner as both originator and beneficiary.
+    Rows whose type reads as incoming have the counterparty as originator; all other rows have it as beneficiary.
+
+    Args:
+        tables (list of TableBlock): Tables returned by detect_tables or split_tabular_sar.
+        entity_results (dict): Workflow 1 results with Acct_to_Cust and FI_to_Acct_to_Cust.
+
+    Returns:
+        dict: {<Trxn_ID>: {<transaction attributes>}} as returned by the transaction generation agents.
+    """
+    acct_to_cust = entity_results.get("Acct_to_Cust", {}) or {}
+    fi_to_acct_to_cust = entity_results.get("FI_to_Acct_to_Cust", {}) or {}
+    trxns = {}
+    for table in tables:
+        for row in table.rows:
+            record = dict(zip(table.columns, row))
+            acct = normalise_account(record.get("Account_ID", ""))
+            party = {"Name": acct_to_cust.get(acct, ""), "Account_ID": acct,
+                     "Customer_ID": _customer_id(acct, fi_to_acct_to_cust)}
+
+            counterparty = dict(party)
+            if record.get("Counterparty_Name") or record.get("Counterparty_Account_ID"):
+                name = record.get("Counterparty_Name", "")
+                cp_acct = normalise_account(record.get("Counterparty_Account_ID", ""))
+                # Only reuse a known customer ID if the account is held by the named counterparty
+                known = cp_acct in acct_to_cust and (not name or acct_to_cust[cp_acct] == name)
+                counterparty = {"Name": name or acct_to_cust.get(cp_acct, ""), "Account_ID": cp_acct,
+                                "Customer_ID": _customer_id(cp_acct, fi_to_acct_to_cust) if known else ""}
+
+            trxn_type = record.get("Trxn_Type", "")
+            originator, beneficiary = ((counterparty, party) if _INCOMING_PATTERN.search(trxn_type)
+                                       else (party, counterparty))
+            channel = normalise_channel(trxn_type)
+            trxns[len(trxns) + 1] = {
+                "Originator_Name": originator["Name"], "Originator_Account_ID": originator["Account_ID"],
+                "Originator_Customer_ID": originator["Customer_ID"],
+                "Beneficiary_Name": beneficiary["Name"], "Beneficiary_Account_ID": beneficiary["Account_ID"],
+                "Beneficiary_Customer_ID": beneficiary["Customer_ID"],
+                "Trxn_Channel": channel, "Trxn_Date": normalise_date(record["Trxn_Date"]),
+                "Trxn_Amount": normalise_amount(record["Trxn_Amount"]),
+                "Branch_or_ATM_Location": record.get("Location", "") if channel == "Cash" else "",
+            }
+    logger.info(f"Extracted {len(trxns)} transactions from {len(tables)} tables without an LLM call")
+    return trxns
@@ -1,10 +1,12 @@
-from typing import List, Literal, Union
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Literal, Optional, Tuple, Union
 from typing_extensions import Annotated
 
 import numpy as np
-from datetime import datetime, timedelta
-import random
+import pandas as pd
+from datetime import datetime
 import math
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,6 +17,233 @@ logger = logging.getLogger(__name__)
 # b) Total Amount and N_trxns
 # c) Total Amount and min_ind_amount and max_ind_amount
 
+# Columns of a generated transaction, in output order
+TRXN_COLUMNS = ["Originator_Name", "Originator_Account_ID", "Originator_Customer_ID",
+                "Beneficiary_Name", "Beneficiary_Account_ID", "Beneficiary_Customer_ID",
+                "Trxn_Channel", "Trxn_Date", "Trxn_Amount", "Branch_or_ATM_Location"]
+# Index of the Monte Carlo realisation a trxn belongs to, added when several realisations are generated
+REALIZATION_COLUMN = "Realization"
+
+
+@dataclass
+class TransactionBatch:
+    """
+    Columnar batch of generated transactions.
+
+    :param n: Number of transactions in the batch.
+    :param arrays: Columns that vary per transaction as numpy arrays of length n. Trxn_Date is datetime64[D].
+    :param constants: Columns with the same value for every transaction, stored once.
+    """
+    n: int
+    arrays: Dict[str, np.ndarray] = field(default_factory=dict)
+    constants: Dict[str, Any] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def column(self, name: str) -> np.ndarray:
+        if name in self.arrays:
+            return self.arrays[name]
+        return np.full(self.n, self.constants[name], dtype=object)
+
+    def dates_as_strings(self) -> np.ndarray:
+        dates = self.arrays.get("Trxn_Date")
+        if dates is None:
+            return self.column("Trxn_Date")
+        return np.datetime_as_string(dates, unit="D")
+
+    def columns(self) -> List[str]:
+        """
+        TRXN_COLUMNS, followed by REALIZATION_COLUMN for batches holding several realisations
+        """
+        return TRXN_COLUMNS + [REALIZATION_COLUMN] if REALIZATION_COLUMN in self.arrays else TRXN_COLUMNS
+
+    def to_frame(self, date_strings: bool = False) -> pd.DataFrame:
+        """
+        Build a DataFrame in columns() order. Trxn_Date stays datetime64 unless date_strings is True.
+        """
+        data = {name: (self.arrays[name] if name in self.arrays else self.constants[name]) for name in self.columns()}
+        if date_strings:
+            data["Trxn_Date"] = self.dates_as_strings()
+        return pd.DataFrame(data, index=pd.RangeIndex(self.n))
+
+    def to_dict(self) -> Dict[int, Dict[str, Any]]:
+        """
+        Legacy {<Trxn_ID>: {<attributes>}} form with 1-based Trxn IDs and yyyy-mm-dd date strings
+        """
+        names = self.columns()
+        columns = {name: self.column(name).tolist() for name in names if name != "Trxn_Date"}
+        columns["Trxn_Date"] = self.dates_as_strings().tolist()
+        return {i + 1: {name: columns[name][i] for name in names} for i in range(self.n)}
+
+
+def _format_output(batch: TransactionBatch, output_format: str):
+    if output_format == "dict":
+        return batch.to_dict()
+    if output_format == "columns":
+        return batch
+    if output_format == "dataframe":
+        return batch.to_frame(date_strings=True)
+    raise ValueError(f"output_format must be one of 'dict', 'columns' or 'dataframe', got {output_format!r}")
+
+
+########################################################
+# Amount samplers
+########################################################
+
+CENT = 0.01
+# Unit of "even dollar" amounts e.g. $9,900 or $5,000
+EVEN_DOLLAR_UNIT = 100.0
+# Currency Transaction Report threshold that structured amounts stay just below
+REPORTING_THRESHOLD = 10000.0
+# "Just below" the threshold means within this fraction of it e.g. $9,000 - $9,999.99
+BELOW_THRESHOLD_BAND = 0.1
+
+Amount_Shapes = Literal["uniform", "even_dollar", "below_threshold"]
+
+
+def derive_seed(*parts: Any) -> int:
+    """
+    Derive a 64-bit seed from e.g. (SAR id, account, trxn set). Identical parts give identical seeds in every process.
+    """
+    digest = hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def call_seed(seed: int, index: int) -> int:
+    """
+    Seed of the index-th of several tool calls in one reply (parallel tool calls). The first call keeps the seed, so
+    a reply with a single call generates the same trxns as before.
+    """
+    return seed if index == 0 else derive_seed(seed, index)
+
+
+def merge_outputs(outputs: List[Any]) -> Any:
+    """
+    Merge the results of several generate_transactions calls in one reply, e.g. one per counterparty, into one
+    transaction set in call order. Dictionaries are renumbered from 1; otherwise a DataFrame is returned.
+    """
+    if len(outputs) == 1:
+        return outputs[0]
+    if all(isinstance(output, dict) for output in outputs):
+        return {i + 1: trxn for i, trxn in enumerate(trxn for output in outputs for trxn in output.values())}
+    frames = [output.to_frame(date_strings=True) if isinstance(output, TransactionBatch)
+              else pd.DataFrame.from_dict(output, orient="index") if isinstance(output, dict) else output
+              for output in outputs]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _shape_bounds(low: Optional[float], high: Optional[float], shape: str,
+                  threshold: float) -> Tuple[Optional[float], Optional[float], float]:
+    """
+    Return the (low, high, unit) an amount shape implies, intersected with any bounds already given
+    """
+    unit = EVEN_DOLLAR_UNIT if shape == "even_dollar" else CENT
+    if shape == "below_threshold":
+        band_low, band_high = threshold * (1 - BELOW_THRESHOLD_BAND), threshold - CENT
+        new_low = band_low if low is None else max(low, band_low)
+        new_high = band_high if high is None else min(high, band_high)
+        if new_low <= new_high:
+            return new_low, new_high, unit
+        logger.warning(f"Bounds [{low}, {high}] do not overlap the band below {threshold}; ignoring the shape")
+    return low, high, unit
+
+
+def _to_units(low: float, high: float, unit: float) -> Tuple[int, int, float]:
+    low_u, high_u = math.ceil(low / unit - 1e-9), math.floor(high / unit + 1e-9)
+    if low_u > high_u and unit != CENT:
+        # No round amount fits between the bounds
+        return _to_units(low, high, CENT)
+    return low_u, high_u, unit
+
+
+def choose_n_transactions(total: float, low: float, high: float, n_requested: Optional[int] = None) -> int:
+    """
+    Number of transactions for which amounts in [low, high] can sum to total. A requested count is kept if it is
+    feasible, otherwise the count closest to total / mid-point of the bounds is used.
+    """
+    n_lo = max(math.ceil(total / high - 1e-9), 1)
+    n_hi = math.floor(total / low + 1e-9)
+    if n_requested and n_lo <= n_requested <= n_hi:
+        return n_requested
+    if n_lo <= n_hi:
+        return int(np.clip(round(total / ((low + high) / 2)), n_lo, n_hi))
+    logger.warning(f"No number of transactions in [{low}, {high}] sums to {total}; the lower bound will be relaxed")
+    return n_lo
+
+
+def sample_amounts_with_total(rng: np.random.Generator, n: int, total: float, low: float, high: float,
+                              unit: float = CENT, n_realizations: int = 1) -> np.ndarray:
+    """
+    Sample n amounts in [low, high] that are multiples of unit and sum exactly to total, in a single pass.
+
+    The slack above the lower bound is split with normalised uniform weights (a Dirichlet-like split), amounts over
+    the upper bound are capped and their excess redistributed over the rest (water-filling), and the result is
+    rounded to whole units with the remainder handed out by largest fractional part. If total is not a multiple of
+    unit, the residue is spread over the smallest amounts without taking them over high. When no n multiples of
+    unit fit the bounds and total, cents are used instead. Infeasible bounds are relaxed.
+
+    With n_realizations > 1, that many independent sets of n amounts are sampled together and returned one after
+    the other, so the result has n_realizations * n amounts.
+    """
+    low_u, high_u, unit = _to_units(low, high, unit)
+    total_u = math.floor(total / unit + 1e-9)
+    if unit != CENT and not (n * low_u <= total_u <= n * high_u and total <= n * high + 1e-9):
+        # Round amounts cannot meet the bounds and total together
+        low_u, high_u, unit = _to_units(low, high, CENT)
+        total_u = math.floor(total / unit + 1e-9)
+    residue = round(total - total_u * unit, 2)
+    # Infeasible bounds are widened symmetrically about the mean amount so the amounts still vary
+    if n * high_u < total_u:
+        high_u = max(-(-2 * total_u // n) - low_u, -(-total_u // n))
+    if n * low_u > total_u:
+        low_u = max(min(2 * total_u // n - high_u, total_u // n), 0)
+
+    # One row per realisation
+    slack_total, cap = total_u - n * low_u, high_u - low_u
+    weights = rng.uniform(size=(n_realizations, n))
+    slack = slack_total * weights / weights.sum(axis=1, keepdims=True)
+    free = np.ones(slack.shape, dtype=bool)
+    while True:
+        over = slack > cap
+        if not over.any():
+            break
+        excess = np.where(over, slack - cap, 0.0).sum(axis=1, keepdims=True)
+        slack[over] = cap
+        free &= ~over
+        free_weights = np.where(free, weights, 0.0)
+        free_total = free_weights.sum(axis=1, keepdims=True)
+        slack += np.divide(excess * free_weights, free_total, out=np.zeros_like(slack), where=free_total > 0)
+
+    units = np.floor(slack + 1e-9).astype(np.int64)
+    remainder = slack_total - units.sum(axis=1, keepdims=True)
+    # Rank the amounts of each realisation by fractional part, largest first
+    ranks = np.empty_like(units)
+    np.put_along_axis(ranks, np.argsort(units - slack, axis=1), np.arange(n)[None, :].repeat(n_realizations, 0), 1)
+    units += ranks < remainder
+
+    amounts = (low_u + units) * unit
+    if residue:
+        # Fill the room below high in cents, smallest amounts first; what does not fit goes to the smallest amount
+        residue_c = round(residue / CENT)
+        order = np.argsort(amounts, axis=1, kind="stable")
+        room = np.floor((max(high, high_u * unit) - np.take_along_axis(amounts, order, 1)) / CENT + 1e-6)
+        room = np.maximum(room, 0).astype(np.int64)
+        added = np.clip(residue_c - (np.cumsum(room, axis=1) - room), 0, room)
+        added[:, 0] += residue_c - added.sum(axis=1)
+        np.put_along_axis(amounts, order, np.take_along_axis(amounts, order, 1) + added * CENT, 1)
+    return np.round(amounts, 2).ravel()
+
+
+def sample_amounts_in_bounds(rng: np.random.Generator, n: int, low: float, high: float,
+                             unit: float = CENT) -> np.ndarray:
+    """
+    Sample n amounts uniformly from the multiples of unit in [low, high]
+    """
+    low_u, high_u, unit = _to_units(low, high, unit)
+    return np.round(rng.integers(low_u, high_u + 1, size=n) * unit, 2)
+
+
 Channels_allowed = Literal["Wire","Cash","Check"]
 def generate_transactions(
         Originator_Name:Annotated[str, "Entity or Customer originating the transactions"],
@@ -30,9 +259,27 @@ def generate_transactions(
         Max_Ind_Trxn_Amt:Annotated[float, "The largest transaction amount"],
         Branch_or_ATM_Location:Annotated[Union[str, List[str]], "Branch or ATM location(s) for transactions"],
         N_transactions:Annotated[int, "The number of transactions made between the Originator and Beneficary"] = None,
-        Total_Amount:Annotated[float, "Total amount of all transactions"] = None) -> dict:
+        Total_Amount:Annotated[float, "Total amount of all transactions"] = None,
+        Amount_Shape:Annotated[Amount_Shapes, "Shape of the individual amounts"] = "uniform",
+        Reporting_Threshold:Annotated[float, "Reporting threshold structured amounts stay below"] = REPORTING_THRESHOLD,
+        seed: Optional[int] = None,
+        n_realizations: int = 1,
+        output_format: Literal["dict", "columns", "dataframe"] = "dict") -> Union[dict, TransactionBatch, pd.DataFrame]:
     '''
     Tool to generate trxns
+
+    All columns are sampled as arrays in one vectorised pass. output_format selects the result:
+    "dict" ({<Trxn_ID>: {<attributes>}}, the form returned to agents), "columns" (TransactionBatch) or
+    "dataframe" (one row per trxn, dates as yyyy-mm-dd strings).
+
+    Amounts given a Total_Amount sum to it exactly. Amount_Shape "even_dollar" draws multiples of EVEN_DOLLAR_UNIT and
+    "below_threshold" keeps amounts just below Reporting_Threshold.
+
+    Every draw comes from a numpy Generator owned by the call, so concurrent calls never share RNG state. Calls with
+    the same seed and arguments return identical transactions; without a seed fresh OS entropy is used.
+
+    With n_realizations > 1, that many independent realisations of the trxn set are sampled in the same vectorised
+    pass and tagged with their index (0 based) in the REALIZATION_COLUMN column.
     '''
     logger.info("generate_transactions called with args: %s", locals())
 
@@ -112,96 +359,78 @@ def generate_transactions(
             "b) N_transactions & Total_Amount (with Min_Ind_Trxn_Amt and Max_Ind_Trxn_Amt unset or zero), "
             "c) Total_Amount & Min_Ind_Trxn_Amt & Max_Ind_Trxn_Amt."
         )
-        return {}
-    
-    trxns = {} #Dictionary to hold transactions
+        return _format_output(TransactionBatch(n=0, arrays={"Trxn_Date": np.array([], dtype="datetime64[D]"),
+                                                            **{name: np.array([], dtype=object) for name in TRXN_COLUMNS
+                                                               if name != "Trxn_Date"}}),
+                              output_format)
+
+    n_realizations = max(int(n_realizations), 1)
+    rng = np.random.default_rng(seed)
+    if Amount_Shape not in ("uniform", "even_dollar", "below_threshold"):
+        logger.warning(f"Unknown Amount_Shape {Amount_Shape!r}; using uniform amounts")
+        Amount_Shape = "uniform"
 
     if case_total_and_count_only:
         # Use provided N_transactions to split Total_Amount
         logger.info(f"Generating {N_transactions} transactions based on total and count only")
-        # Weights sampled near uniform to reduce variance
-        epsilon = 1.0 / (2 * N_transactions)
-        base = 1.0 / N_transactions
-        weights = np.random.uniform(
-            low=base - epsilon,
-            high=base + epsilon,
-            size=N_transactions
-        )
-        weights /= weights.sum()
-        amounts = np.round(weights * Total_Amount, 2)
-        diff = round(Total_Amount - amounts.sum(), 2)
-        amounts[0] = round(amounts[0] + diff, 2)
-        trxn_amounts = amounts
+        # Amounts within +/-50% of the average reduce variance
+        base = Total_Amount / N_transactions
+        low, high, unit = _shape_bounds(base / 2, base * 1.5, Amount_Shape, Reporting_Threshold)
+        trxn_amounts = sample_amounts_with_total(rng, N_transactions, Total_Amount, low, high, unit, n_realizations)
 
     elif case_total_and_bounds:
-        # Determine number of transactions from total and bounds
-        N_transactions = math.ceil(Total_Amount / Min_Ind_Trxn_Amt)
+        low, high, unit = _shape_bounds(Min_Ind_Trxn_Amt, Max_Ind_Trxn_Amt, Amount_Shape, Reporting_Threshold)
+        # Determine number of transactions from total and bounds, keeping N_transactions if it is feasible
+        N_transactions = choose_n_transactions(Total_Amount, low, high, N_transactions)
         logger.info(f"Generating {N_transactions} transactions based on total and bounds")
-        # Sample random amounts until their sum meets or exceeds Total_Amount
-        attempts = 0
-        max_attempts = 1000
-        while True:
-            raw_amounts = np.round(
-                np.random.uniform(
-                    low=Min_Ind_Trxn_Amt,
-                    high=Max_Ind_Trxn_Amt,
-                    size=N_transactions
-                ),
-                2
-            )
-            total_raw = raw_amounts.sum()
-            if total_raw >= Total_Amount:
-                break
-            attempts += 1
-            if attempts >= max_attempts:
-                raise ValueError("Could not generate transaction amounts to meet Total_Amount after multiple attempts")
-        cumsum = np.cumsum(raw_amounts)
-        idx = int(np.argmax(cumsum >= Total_Amount))
-        trxn_amounts = raw_amounts[:idx+1].tolist()
-        prev_sum = float(cumsum[idx] - raw_amounts[idx])
-        last_amt = round(Total_Amount - prev_sum, 2)
-        trxn_amounts[-1] = last_amt
-        trxn_amounts = np.array(trxn_amounts)
-        N_transactions = len(trxn_amounts)
+        trxn_amounts = sample_amounts_with_total(rng, N_transactions, Total_Amount, low, high, unit, n_realizations)
 
     elif case_min_max:
         logger.info(f"Generating {N_transactions} transactions based on Min and Max Ind Trxn Amount")
         # Sample uniform random amounts within bounds
-        trxn_amounts = np.round(
-            np.random.uniform(
-                low=Min_Ind_Trxn_Amt,
-                high=Max_Ind_Trxn_Amt,
-                size=N_transactions
-            ),
-            2
-        )
+        low, high, unit = _shape_bounds(Min_Ind_Trxn_Amt, Max_Ind_Trxn_Amt, Amount_Shape, Reporting_Threshold)
+        trxn_amounts = sample_amounts_in_bounds(rng, N_transactions * n_realizations, low, high, unit)
 
     else:
         # This should not happen due to earlier validation
         raise RuntimeError("Unhandled transaction generation case")
         
-    # Sample channels and dates once N_transactions is finalized
-    trxn_channels = random.choices(Trxn_Channel, k=N_transactions)
+    # Sample channels, dates and locations as arrays once N_transactions is finalized
+    size = N_transactions * n_realizations
+    trxn_channels = rng.choice(np.asarray(Trxn_Channel, dtype=object), size=size)
     if Start_Date and End_Date:
-        sample_deltas = random.choices(range((End_Date - Start_Date).days), k=N_transactions)
-        trxn_dates = [Start_Date + timedelta(delta) for delta in sample_deltas]
-        trxn_dates = [d.strftime("%Y-%m-%d") for d in trxn_dates]
+        start = np.datetime64(Start_Date.date(), "D")
+        n_days = max((End_Date - Start_Date).days, 1)
+        trxn_dates = start + rng.integers(0, n_days, size=size).astype("timedelta64[D]")
     else:
-        trxn_dates = [""] * N_transactions
+        trxn_dates = None
 
     # Handle list of locations by sampling one per transaction
     if isinstance(Branch_or_ATM_Location, list):
-        location_options = Branch_or_ATM_Location
+        location_options = np.asarray(Branch_or_ATM_Location, dtype=object)
+        trxn_locations = rng.choice(location_options, size=size)
     else:
-        location_options = [Branch_or_ATM_Location]
+        trxn_locations = None
 
-    for i in range(N_transactions):
-        trxns[(i+1)] = {"Originator_Name": Originator_Name , "Originator_Account_ID": Originator_Account_ID,"Originator_Customer_ID": Originator_Customer_ID,
-                            "Beneficiary_Name": Beneficiary_Name, "Beneficiary_Account_ID": Beneficiary_Account_ID,"Beneficiary_Customer_ID": Beneficiary_Customer_ID,
-                             "Trxn_Channel": trxn_channels[i], "Trxn_Date": trxn_dates[i], "Trxn_Amount":trxn_amounts[i],
-                              "Branch_or_ATM_Location": random.choice(location_options) }
+    batch = TransactionBatch(
+        n=size,
+        arrays={"Trxn_Channel": trxn_channels, "Trxn_Amount": np.asarray(trxn_amounts, dtype=float)},
+        constants={"Originator_Name": Originator_Name, "Originator_Account_ID": Originator_Account_ID,
+                   "Originator_Customer_ID": Originator_Customer_ID, "Beneficiary_Name": Beneficiary_Name,
+                   "Beneficiary_Account_ID": Beneficiary_Account_ID, "Beneficiary_Customer_ID": Beneficiary_Customer_ID},
+    )
+    if trxn_dates is not None:
+        batch.arrays["Trxn_Date"] = trxn_dates
+    else:
+        batch.constants["Trxn_Date"] = ""
+    if trxn_locations is not None:
+        batch.arrays["Branch_or_ATM_Location"] = trxn_locations
+    else:
+        batch.constants["Branch_or_ATM_Location"] = Branch_or_ATM_Location
+    if n_realizations > 1:
+        batch.arrays[REALIZATION_COLUMN] = np.repeat(np.arange(n_realizations), N_transactions)
 
-    return trxns
+    return _format_output(batch, output_format)
 
 generate_transactions_schema = {
     "name": "generate_transactions",
@@ -271,6 +500,16 @@ generate_transactions_schema = {
             "Total_Amount": {
                 "type": "number",
                 "description": "Total amount of all transactions"
+            },
+            "Amount_Shape": {
+                "type": "string",
+                "enum": ["uniform", "even_dollar", "below_threshold"],
+                "description": "Shape of the individual amounts: even_dollar for round amounts (e.g. $5,000), "
+                               "below_threshold for amounts just under the reporting threshold, otherwise uniform"
+            },
+            "Reporting_Threshold": {
+                "type": "number",
+                "description": "Reporting threshold that below_threshold amounts stay under (default 10000)"
             }
         },
         "required": [
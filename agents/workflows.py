@@ -1,32 +1,39 @@
 from autogen import GroupChat, GroupChatManager
-from utils import load_agents_from_single_config , get_agent_config, split_dictionary_into_subnarratives,convert_dict_to_df,generate_dynamic_output_file_name , write_data_to_file, normalize_dict
-from agents.agents import instantiate_all_base_agents, instantiate_agents_for_trxn_generation
-from agents.agent_utils import  route_and_execute
+from utils import get_agent_config, split_dictionary_into_subnarratives,convert_dict_to_df,generate_dynamic_output_file_name , write_data_to_file, normalize_dict, group_subnarratives
+from agents.agent_utils import  route_and_execute, aroute_and_execute, route_batch, aroute_batch
+from agents.scheduler import RequestScheduler, get_scheduler
+from agents.agents import copy_conversable_agent
+from agents.resolver import resolve_entities
+from agents.dag import Stage, run_stages
+from agents.table_parser import split_tabular_sar, tables_to_trxns
+from agents.structured_outputs import parse_structured_output
+from agents.registry import get_agent_registry, WORKFLOW1, TRXN_GENERATION
+from agents.tools import call_seed, derive_seed, generate_transactions, REALIZATION_COLUMN
+from agents.param_store import ParameterStore, apply_overrides, get_parameter_store
+from knowledge_graph.store import KnowledgeGraph, get_knowledge_graph
 from autogen import Cache
-from typing import  Dict, Any, List
+from typing import  Callable, Dict, Any, List, Optional, Union
 import ast
+import itertools
 import logging
 import json
 import pandas as pd
 import copy
+import asyncio
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 logger = logging.getLogger(__name__)
 
-def run_agentic_workflow1(sar_text: str,config_file:str) -> Dict[str, Any]:
-    '''
-    Runs the full agentic workflow and returns results as a dictionary. 
-    To be updated when more agents are added to the workflow.
-    
-    '''
-
-    assert sar_text and sar_text.strip(), "SAR narrative must not be empty or whitespace only"
-    logger.info(f"Starting run_agentic_workflow1 for SAR text (length={len(sar_text)})")
-
-    agent_configs = load_agents_from_single_config(config_file)
-    agents = instantiate_all_base_agents(agent_configs)
-    logger.info("All agents instantiated successfully")
+# Default cap on sub-narratives in flight in arun_agentic_workflow2
+DEFAULT_MAX_CONCURRENCY = 20
 
+def _run_workflow1_stages(agents: Dict[str, Any], agent_configs: List[Dict[str, Any]], sar_text: str,
+                          structured_output: bool, use_local_resolver: Optional[bool],
+                          scheduler: Optional[RequestScheduler] = None):
+    """
+    Run the workflow 1 stage DAG with a checked-out set of agents and return (results per stage, timings).
+    The stages that run concurrently each chat through their own copy of the SAR_Agent, routed through scheduler.
+    """
     #Dictionary to store other relevant config of each agent
     agent_config_dict = {}
 
@@ -35,75 +42,124 @@ def run_agentic_workflow1(sar_text: str,config_file:str) -> Dict[str, Any]:
         agent_config_dict[name] = {} # Dictonary to store other relevant configs for each agent
         agent_config = get_agent_config(agent_configs, name) #Get configuratins for the specific agent
         agent_config_dict[name]["summary_prompt"] = agent_config.get("summary_prompt")
-        agent_config_dict[name]["summary_method"] = agent_config.get("summary_method")
+        # The reply itself is the schema-constrained JSON, so no summary call is needed
+        agent_config_dict[name]["summary_method"] = "last_msg" if structured_output else agent_config.get("summary_method")
         agent_config_dict[name]["max_turns"] = agent_config.get("max_turns",1)
+        agent_config_dict[name]["use_local_resolver"] = agent_config.get("use_local_resolver", False)
         logger.info("  Additional configs for Agent %s read successfully",name)
         
-    
+    if use_local_resolver is None:
+        use_local_resolver = agent_config_dict["Entity_Resolution_Agent"]["use_local_resolver"]
+    if use_local_resolver:
+        logger.info("Entity resolution will be done by the local resolver")
+
+    # initiate_chat changes the sender's chat state, so the concurrent stages must not share the SAR_Agent
+    senders = {"Entity_Extraction_Agent": agents["SAR_Agent"],
+               **{name: copy_conversable_agent(agents["SAR_Agent"], scheduler)
+                  for name in ["Entity_Resolution_Agent", "Narrative_Extraction_Agent"]}}
 
     # Use DiskCache as cache
     with Cache.disk() as cache:
-        
-        chat_results = agents["SAR_Agent"].initiate_chats(
-              [
-                {
-                    "recipient": agents["Entity_Extraction_Agent"],
-                    "message": sar_text,
-                    "max_turns": agent_config_dict["Entity_Extraction_Agent"]["max_turns"],
-                    "summary_method": agent_config_dict["Entity_Extraction_Agent"]["summary_method"],
-                    "summary_args": {
-                        "summary_prompt" : agent_config_dict["Entity_Extraction_Agent"]["summary_prompt"]                                                                
-                    },
-                },
-
-                {
-                    "recipient": agents["Entity_Resolution_Agent"],
-                    "message": sar_text,
-                    "max_turns": agent_config_dict["Entity_Resolution_Agent"]["max_turns"],
-                    "summary_method": agent_config_dict["Entity_Resolution_Agent"]["summary_method"],
-                    "summary_args": {
-                        "summary_prompt" : agent_config_dict["Entity_Resolution_Agent"]["summary_prompt"] 
-                                        },
-                },
-                {
-                    "recipient": agents["Narrative_Extraction_Agent"],
-                    "message": sar_text,
-                    "max_turns": agent_config_dict["Narrative_Extraction_Agent"]["max_turns"],
-                    "summary_method": agent_config_dict["Narrative_Extraction_Agent"]["summary_method"],
-                    "summary_args": {
-                        "summary_prompt" : agent_config_dict["Narrative_Extraction_Agent"]["summary_prompt"] 
-                                        },
-                },
-                
-
-            ] 
-
-                                                             )
-
-
-    results0 = chat_results[0].summary
-    results1 = chat_results[1].summary
-    results2 = chat_results[2].summary
 
+        def chat(name: str, sar_text: str, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+            """Chat between the SAR Agent and a workflow 1 agent, returning the agent's artefacts as a dictionary"""
+            chat_result = senders[name].initiate_chat(
+                agents[name],
+                message=sar_text,
+                carryover=repr(context) if context else None,
+                max_turns=agent_config_dict[name]["max_turns"],
+                summary_method=agent_config_dict[name]["summary_method"],
+                summary_args={"summary_prompt": agent_config_dict[name]["summary_prompt"]},
+                cache=cache,
+            )
+            if structured_output:
+                result = parse_structured_output(name, chat_result.summary)
+            else:
+                cleaned_results = chat_result.summary.strip("```python\n").strip("```")
+                # Convert to dictionary
+                result = ast.literal_eval(cleaned_results)
+            logger.info(f"Results from {name} converted to a dictionary")
+            return result
+
+        def resolve(sar_text: str, Entity_Extraction_Agent: Dict[str, Any]) -> Dict[str, Any]:
+            if use_local_resolver:
+                return resolve_entities(Entity_Extraction_Agent)
+            return chat("Entity_Resolution_Agent", sar_text, Entity_Extraction_Agent)
+
+        stages = [
+            Stage("Entity_Extraction_Agent", lambda sar_text: chat("Entity_Extraction_Agent", sar_text), ["sar_text"]),
+            Stage("Entity_Resolution_Agent", resolve, ["sar_text", "Entity_Extraction_Agent"]),
+            Stage("Narrative_Extraction_Agent",
+                  lambda sar_text, Entity_Extraction_Agent: chat("Narrative_Extraction_Agent", sar_text,
+                                                                 Entity_Extraction_Agent),
+                  ["sar_text", "Entity_Extraction_Agent"]),
+        ]
+        results_dicts, timings = run_stages(stages, {"sar_text": sar_text})
+    return results_dicts, timings
+
+
+def run_agentic_workflow1(sar_text: str,config_file:str, use_local_resolver: Optional[bool] = None,
+                          structured_output: Optional[bool] = None, return_timings: bool = False,
+                          tabular_fast_path: Optional[bool] = None):
+    '''
+    Runs the full agentic workflow and returns results as a dictionary. 
+    To be updated when more agents are added to the workflow.
+
+    The workflow is a small DAG of stages run by agents/dag.py: entity extraction first, then entity resolution
+    and narrative extraction concurrently since both only need the extracted accounts.
+
+    If use_local_resolver is True, the Entity_Resolution_Agent chat is replaced by the deterministic
+    resolve_entities function. If None, the `use_local_resolver` flag of the Entity_Resolution_Agent config is used.
+
+    If structured_output is True, each agent returns its artefacts directly as JSON constrained by the schemas in
+    agents/structured_outputs.py and no reflection_with_llm summary call is made. If None, `workflow1.structured_output`
+    in the config file is used.
+
+    If tabular_fast_path is True, delimited transaction tables are parsed locally by agents/table_parser.py into
+    results["Tabular_Trxns"] and only the free text around them is sent to the agents. If None,
+    `workflow1.tabular_fast_path` in the config file is used.
+
+    If return_timings is True, a (results, timings) tuple is returned where timings holds the start/end offsets and
+    duration in seconds of each stage and of the whole DAG.
     
-    cleaned_results0 = results0.strip("```python\n").strip("```")
-    cleaned_results1 = results1.strip("```python\n").strip("```")
-    cleaned_results2 = results2.strip("```python\n").strip("```")
-    # Convert to dictionary
-    results_dict0 = ast.literal_eval(cleaned_results0)
-    logger.info("Results from Entity Extraction Agent converted to a dictionary")
-    results_dict1 = ast.literal_eval(cleaned_results1)
-    logger.info("Results from Entity Resolution Agent converted to a dictionary")
-    results_dict2 = ast.literal_eval(cleaned_results2)
-    logger.info("Results from Narrative Extraction Agent converted to a dictionary")
+    '''
+
+    assert sar_text and sar_text.strip(), "SAR narrative must not be empty or whitespace only"
+    logger.info(f"Starting run_agentic_workflow1 for SAR text (length={len(sar_text)})")
+
+    registry = get_agent_registry(config_file)
+    workflow1_config = registry.config().get("workflow1", {}) or {}
+    if structured_output is None:
+        structured_output = workflow1_config.get("structured_output", False)
+    logger.info(f"Workflow 1 structured output mode: {structured_output}")
+
+    tables = []
+    if tabular_fast_path is None:
+        tabular_fast_path = workflow1_config.get("tabular_fast_path", False)
+    if tabular_fast_path:
+        sar_text, tables = split_tabular_sar(sar_text)
+        logger.info(f"{len(tables)} transaction tables will be parsed without the agents")
+
+    agent_configs = registry.agent_configs()
+    with registry.checkout(WORKFLOW1, structured_output=bool(structured_output)) as agents:
+        logger.info("All agents checked out successfully")
+        results_dicts, timings = _run_workflow1_stages(agents, agent_configs, sar_text, structured_output,
+                                                       use_local_resolver, get_scheduler(config_file))
+
+    logger.info("Workflow 1 stage timings: " +
+                ", ".join(f"{name}={timing['seconds']:.2f}s" for name, timing in timings.items()))
 
     # Combine results from first agentic workflow
-    results = {**results_dict0,**results_dict1,**results_dict2}
+    results = {**results_dicts["Entity_Extraction_Agent"],**results_dicts["Entity_Resolution_Agent"],
+               **results_dicts["Narrative_Extraction_Agent"]}
     logger.info("Results  from agents aggregated into a single dictionary")
 
     results = normalize_dict(results)
     logging.info("Results normalized to remove unexpected characters")
 
+    if tables:
+        results["Tabular_Trxns"] = normalize_dict(tables_to_trxns(tables, results))
+
     #Write output file for later reuse or verification
     output_file = generate_dynamic_output_file_name(filename="entity_metrics",output_file_type="json",
                                                     output_folder="./data/output")
@@ -111,48 +167,114 @@ def run_agentic_workflow1(sar_text: str,config_file:str) -> Dict[str, Any]:
     write_data_to_file(results,output_file)
     
     logger.info("Finished run_agentic_workflow1")
+    if return_timings:
+        return results, timings
     return results
 
 
-def run_agentic_workflow2(input:Dict, config_file:str) -> List[Dict[str, Dict[int, Dict[str, Any]]]] :
-    
-    agent_configs = load_agents_from_single_config(config_file)
-    agents = instantiate_agents_for_trxn_generation(agent_configs)
+def _load_trxn_generation_agents(config_file: str, use_cache: bool = True) -> Dict[str, Any]:
+    # Transaction generation agents only answer explicit message lists, so one warm set is shared by all runs
+    agents = get_agent_registry(config_file).shared_agents(TRXN_GENERATION, use_cache=use_cache)
 
     n_agents = len(agents)
     assert len(agents)==3 , f"The 3 agents required for trxn generation have not been passed. Only {n_agents} agents have been created"
     logger.info("All agents instantiated successfully")
-    logger.info(f"Input is of type: {type(input)}")
-    logger.info(f"Starting run_agentic_workflow2 with input keys={list(input.keys())}")
-    sub_narratives = split_dictionary_into_subnarratives(input)
-    logger.info(f"No of sub-narratives created: {len(sub_narratives)}")
+    return agents
 
-    ### Call the agentic workflow repeatedly for each transaction set and concatenate the results   ###
-    trxn_df_list = [] # List of generated trxn dataframes
 
-    # Helper to process one sub-narrative
-    def _process_sub_narrative(i: int, sub_narrative: Dict) -> pd.DataFrame:
-        results_dict = route_and_execute(agents, sub_narrative)
-        output_file = generate_dynamic_output_file_name(
-            filename="trxns_dict",
-            output_file_type="json",
-            output_folder="./data/output"
-        )
-        write_data_to_file(results_dict, output_file)
-        logger.info(f"Results from chosen Transaction Generation Agent for Sub narrative {i+1} has been generated")
-        return convert_dict_to_df(i+1, results_dict)
-
-    # Execute sub-narrative processing asynchronously
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        futures = {
-            executor.submit(_process_sub_narrative, i, sn): i
-            for i, sn in enumerate(sub_narratives)
-        }
-        for future in as_completed(futures):
-            trxn_df_list.append(future.result())
+def _tile_realizations(trxns_df: pd.DataFrame, n_realizations: int) -> pd.DataFrame:
+    # Trxns that are not sampled (LLM-only agent, tables) are the same in every realisation
+    if n_realizations <= 1 or trxns_df.empty or REALIZATION_COLUMN in trxns_df.columns:
+        return trxns_df
+    return pd.concat([trxns_df.assign(**{REALIZATION_COLUMN: r}) for r in range(n_realizations)], ignore_index=True)
+
+
+def _save_sub_narrative_trxns(i: int, results_dict: Union[Dict, pd.DataFrame], n_realizations: int = 1) -> pd.DataFrame:
+    # The tool agent returns a DataFrame in columnar mode; the LLM-only agent returns a trxns dictionary
+    is_df = isinstance(results_dict, pd.DataFrame)
+    output_file = generate_dynamic_output_file_name(
+        filename="trxns_dict",
+        output_file_type="csv" if is_df else "json",
+        output_folder="./data/output"
+    )
+    write_data_to_file(results_dict, output_file)
+    logger.info(f"Results from chosen Transaction Generation Agent for Sub narrative {i+1} has been generated")
+    return _tile_realizations(results_dict if is_df else convert_dict_to_df(i+1, results_dict), n_realizations)
+
+
+def sub_narrative_seed(sub_narrative: Dict, sar_id: Optional[str] = None, seed: Optional[int] = None) -> int:
+    """
+    Seed of the generate_transactions call for one sub-narrative, derived from (seed or SAR id, account, trxn set).
+    Without either the narrative text stands in for the SAR id, so identical requests still give identical trxns.
+    """
+    (acct_id, trxn_sets), = sub_narrative["Narratives"].items()
+    (trxn_set, narrative_text), = trxn_sets.items()
+    base = seed if seed is not None else sar_id if sar_id is not None else narrative_text
+    return derive_seed(base, acct_id, trxn_set)
 
-    #Columns that indicate a trxn has been duplicated under the same sub-narrative attributed to different account IDs
-    DEDUP_COLS = [
+
+def _get_parameter_store(config_file: str, parameter_store: Optional[str] = None) -> Optional[ParameterStore]:
+    # parameter_store overrides `workflow2.parameter_store` in the config; an empty path disables recording
+    if parameter_store is None:
+        workflow2_config = get_agent_registry(config_file).config().get("workflow2", {}) or {}
+        parameter_store = workflow2_config.get("parameter_store")
+    return get_parameter_store(parameter_store) if parameter_store else None
+
+
+def _get_knowledge_graph(config_file: str, knowledge_graph: Optional[str] = None) -> Optional[KnowledgeGraph]:
+    # knowledge_graph overrides `workflow2.knowledge_graph` in the config; an empty path disables ingestion
+    if knowledge_graph is None:
+        workflow2_config = get_agent_registry(config_file).config().get("workflow2", {}) or {}
+        knowledge_graph = workflow2_config.get("knowledge_graph")
+    return get_knowledge_graph(knowledge_graph) if knowledge_graph else None
+
+
+def _resolve_sar_id(input: Dict, sar_id: Optional[str]) -> str:
+    # Without a SAR id the workflow 1 results stand in for it, so rerunning the same SAR replaces its entries and
+    # different SARs reusing an account and trxn set label are kept apart
+    if sar_id is not None:
+        return sar_id
+    return f"sar_{derive_seed(json.dumps(input, sort_keys=True, default=str)):016x}"
+
+
+def _ingest_into_graph(graph: Optional[KnowledgeGraph], input: Dict, trxns_df: pd.DataFrame, sar_id: str) -> None:
+    if graph is None:
+        return
+    graph.ingest(sar_id, input, trxns_df)
+
+
+def _make_recorder(store: Optional[ParameterStore], sub_narrative: Dict, sar_id: str,
+                   seed: int, owners: Optional[List] = None) -> Optional[Callable[[str, Dict[str, Any]], None]]:
+    if store is None:
+        return None
+    (acct_id, trxn_sets), = sub_narrative["Narratives"].items()
+    trxn_set = next(iter(trxn_sets))
+    attributed_to = owners if owners and len(owners) > 1 else None
+    calls = itertools.count()
+
+    def record(function: str, args: Dict[str, Any]) -> None:
+        # Parallel tool calls in one reply (e.g. one per counterparty) are recorded as separate trxn sets, with the
+        # seed FunctionCallingAgent gives each of them
+        index = next(calls)
+        store.record(acct_id, trxn_set if index == 0 else f"{trxn_set}#{index + 1}", args, sar_id=sar_id,
+                     seed=call_seed(seed, index), function=function, attributed_to=attributed_to)
+    return record
+
+
+def _split_sub_narratives(input: Dict) -> List:
+    # Identical sub-narratives of different accounts are routed and generated once, see group_subnarratives
+    sub_narratives = split_dictionary_into_subnarratives(input)
+    groups = group_subnarratives(sub_narratives)
+    logger.info(f"No of sub-narratives created: {len(sub_narratives)}, {len(groups)} after collapsing duplicates")
+    for sub_narrative, owners in groups:
+        if len(owners) > 1:
+            logger.info(f"Sub-narrative attributed to {owners} is generated once")
+    return groups
+
+
+#Columns that indicate a trxn has been duplicated under sub-narratives attributed to different account IDs. Identical
+#sub-narratives are collapsed before routing; this catches the same trxns described differently under each account
+DEDUP_COLS = [
     "Originator_Account_ID",
     "Originator_Name",
     "Beneficiary_Account_ID",
@@ -164,20 +286,35 @@ def run_agentic_workflow2(input:Dict, config_file:str) -> List[Dict[str, Dict[in
     "Trxn_Channel",
 ]
 
+
+def _combine_trxn_dfs(trxn_df_list: List[pd.DataFrame], tabular_trxns: Optional[Dict] = None,
+                      n_realizations: int = 1) -> pd.DataFrame:
+    """
+    Concatenate the per sub-narrative dataframes, drop duplicated trxns and write the final CSV.
+    Trxns parsed from tables (tabular_trxns) are appended as is since every row is a distinct trxn.
+    With several realisations, duplicates are only dropped within a realisation and table trxns are repeated
+    in each of them.
+    """
     # Concatenate to get a single dataframe with trxns for all trxns sets
     if trxn_df_list:
         trxns_df_final = pd.concat(trxn_df_list)
         if len(trxn_df_list)>1:
-            #Drop duplicate rows as same narrative could be attributes to two account ids (Originator and Beneficary)
-            #Do this only if there is more than one trxn set
+            #Drop duplicate rows as the same trxns could be described under two account ids (Originator and
+            #Beneficary) in different words. Do this only if there is more than one trxn set
             before = len(trxns_df_final)
+            dedup_cols = DEDUP_COLS + ([REALIZATION_COLUMN] if REALIZATION_COLUMN in trxns_df_final.columns else [])
             trxns_df_final = (
                 trxns_df_final
-                .sort_values(DEDUP_COLS)  # deterministic
-                .drop_duplicates(subset=DEDUP_COLS, keep="first")
+                .sort_values(dedup_cols)  # deterministic
+                .drop_duplicates(subset=dedup_cols, keep="first")
             )
             removed = before - len(trxns_df_final)
-            logger.info("Deduplicated %d rows using subset=%s", removed, DEDUP_COLS)
+            logger.info("Deduplicated %d rows using subset=%s", removed, dedup_cols)
+    if tabular_trxns:
+        tabular_df = _tile_realizations(convert_dict_to_df(0, tabular_trxns), n_realizations)
+        trxns_df_final = pd.concat([trxns_df_final, tabular_df]) if trxn_df_list else tabular_df
+        logger.info(f"Added {len(tabular_df)} trxns parsed from tables")
+    if trxn_df_list or tabular_trxns:
         trxns_df_final["Transaction_ID"] = range(1, len(trxns_df_final) + 1)
         #Replace missing Originator and Beneficary accunt IDS with None
         trxns_df_final["Originator_Account_ID"] = trxns_df_final["Originator_Account_ID"].fillna("")
@@ -190,6 +327,138 @@ def run_agentic_workflow2(input:Dict, config_file:str) -> List[Dict[str, Dict[in
     output_file = generate_dynamic_output_file_name(filename="trxns",output_file_type="csv",
                                                     output_folder="./data/output")
     write_data_to_file(trxns_df_final,output_file)
+    return trxns_df_final
+
+
+def run_agentic_workflow2(input:Dict, config_file:str, use_cache:bool = True, sar_id: Optional[str] = None,
+                          seed: Optional[int] = None, parameter_store: Optional[str] = None,
+                          n_realizations: int = 1,
+                          knowledge_graph: Optional[str] = None) -> List[Dict[str, Dict[int, Dict[str, Any]]]] :
+    """
+    Generate trxns for every sub-narrative of the workflow 1 results. Each call to the generate_transactions tool
+    is seeded from (seed or sar_id, account, trxn set) - see sub_narrative_seed - so reruns are reproducible.
+
+    With n_realizations > 1, the tool samples that many realisations of each trxn set from the one set of LLM
+    arguments, and the output has a REALIZATION_COLUMN column. Trxns written by the LLM-only agent or parsed from
+    tables are repeated in every realisation.
+
+    The arguments of every tool call are recorded in the ParameterStore at parameter_store (default
+    `workflow2.parameter_store` in the config file) so the trxns can be regenerated by resimulate without the LLM.
+
+    The workflow 1 results and the trxns are ingested into the KnowledgeGraph at knowledge_graph (default
+    `workflow2.knowledge_graph` in the config file) under sar_id.
+
+    Without a sar_id, one is derived from a hash of the workflow 1 results (sar_<hash>) and used for the seeds, the
+    recorded tool calls and the graph alike.
+    """
+
+    agents = _load_trxn_generation_agents(config_file, use_cache)
+    store = _get_parameter_store(config_file, parameter_store)
+    graph = _get_knowledge_graph(config_file, knowledge_graph)
+    logger.info(f"Input is of type: {type(input)}")
+    logger.info(f"Starting run_agentic_workflow2 with input keys={list(input.keys())}")
+    sar_id = _resolve_sar_id(input, sar_id)
+    sub_narratives = _split_sub_narratives(input)
+    # One Router_Agent call for all sub-narratives instead of one each
+    chosen_agent_names = route_batch(agents, [sn for sn, _ in sub_narratives])
+
+    ### Call the agentic workflow repeatedly for each transaction set and concatenate the results   ###
+    trxn_df_list = [] # List of generated trxn dataframes
+
+    # Helper to process one sub-narrative
+    def _process_sub_narrative(i: int, sub_narrative: Dict, owners: List) -> pd.DataFrame:
+        sub_narrative_seed_ = sub_narrative_seed(sub_narrative, sar_id, seed)
+        results_dict = route_and_execute(agents, sub_narrative, seed=sub_narrative_seed_,
+                                         on_function_call=_make_recorder(store, sub_narrative, sar_id,
+                                                                         sub_narrative_seed_, owners),
+                                         n_realizations=n_realizations, chosen_agent_name=chosen_agent_names[i])
+        return _save_sub_narrative_trxns(i, results_dict, n_realizations)
+
+    # Execute sub-narrative processing asynchronously. The scheduler paces the actual LLM calls,
+    # so the pool only needs to be as wide as the concurrency the scheduler can grant.
+    with ThreadPoolExecutor(max_workers=get_scheduler(config_file).max_concurrency) as executor:
+        futures = {
+            executor.submit(_process_sub_narrative, i, sn, owners): i
+            for i, (sn, owners) in enumerate(sub_narratives)
+        }
+        for future in as_completed(futures):
+            trxn_df_list.append(future.result())
+
+    trxns_df_final = _combine_trxn_dfs(trxn_df_list, input.get("Tabular_Trxns"), n_realizations)
+    _ingest_into_graph(graph, input, trxns_df_final, sar_id)
 
     logger.info("Finished run_agentic_workflow2")
     return  trxns_df_final
+
+
+async def arun_agentic_workflow2(input:Dict, config_file:str, max_concurrency:int = DEFAULT_MAX_CONCURRENCY,
+                                 use_cache:bool = True, sar_id: Optional[str] = None,
+                                 seed: Optional[int] = None, parameter_store: Optional[str] = None,
+                                 n_realizations: int = 1, knowledge_graph: Optional[str] = None) -> pd.DataFrame:
+    """
+    asyncio-native version of run_agentic_workflow2. Every sub-narrative is fanned out with asyncio.gather;
+    a semaphore caps the number of sub-narratives in flight at max_concurrency.
+    """
+    assert max_concurrency > 0, "max_concurrency must be a positive integer"
+
+    agents = _load_trxn_generation_agents(config_file, use_cache)
+    store = _get_parameter_store(config_file, parameter_store)
+    graph = _get_knowledge_graph(config_file, knowledge_graph)
+    logger.info(f"Starting arun_agentic_workflow2 with input keys={list(input.keys())}")
+    sar_id = _resolve_sar_id(input, sar_id)
+    sub_narratives = _split_sub_narratives(input)
+    # One Router_Agent call for all sub-narratives instead of one each
+    chosen_agent_names = await aroute_batch(agents, [sn for sn, _ in sub_narratives])
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    # Helper to process one sub-narrative
+    async def _aprocess_sub_narrative(i: int, sub_narrative: Dict, owners: List) -> pd.DataFrame:
+        async with semaphore:
+            sub_narrative_seed_ = sub_narrative_seed(sub_narrative, sar_id, seed)
+            results_dict = await aroute_and_execute(agents, sub_narrative, seed=sub_narrative_seed_,
+                                                    on_function_call=_make_recorder(store, sub_narrative, sar_id,
+                                                                                    sub_narrative_seed_, owners),
+                                                    n_realizations=n_realizations,
+                                                    chosen_agent_name=chosen_agent_names[i])
+        return _save_sub_narrative_trxns(i, results_dict, n_realizations)
+
+    trxn_df_list = await asyncio.gather(
+        *(_aprocess_sub_narrative(i, sn, owners) for i, (sn, owners) in enumerate(sub_narratives))
+    )
+
+    trxns_df_final = _combine_trxn_dfs(list(trxn_df_list), input.get("Tabular_Trxns"), n_realizations)
+    _ingest_into_graph(graph, input, trxns_df_final, sar_id)
+
+    logger.info("Finished arun_agentic_workflow2")
+    return trxns_df_final
+
+
+def resimulate(parameter_store: str, sar_id: Optional[str] = None, seed: Optional[int] = None,
+               amount_scale: float = 1.0, count_scale: float = 1.0, date_shift_days: int = 0,
+               n_realizations: int = 1) -> pd.DataFrame:
+    """
+    Regenerate trxns from the generate_transactions arguments recorded by run_agentic_workflow2, without any LLM call.
+
+    Args:
+        parameter_store (str): Path of the ParameterStore.
+        sar_id (str, optional): Only regenerate the trxn sets of this SAR. Defaults to every recorded trxn set.
+        seed (int, optional): New seed, combined with each (account, trxn set). If None, the recorded seeds are used
+            and the original trxns are reproduced.
+        amount_scale (float): Factor applied to the recorded amounts.
+        count_scale (float): Factor applied to the recorded number of trxns.
+        date_shift_days (int): Days added to the recorded start and end dates.
+        n_realizations (int): Number of realisations of each trxn set, as in run_agentic_workflow2.
+
+    Returns:
+        pd.DataFrame: Trxns of all recorded trxn sets, combined as in run_agentic_workflow2.
+    """
+    records = get_parameter_store(parameter_store).records(sar_id)
+    logger.info(f"Resimulating {len(records)} trxn sets from {parameter_store}")
+    trxn_df_list = []
+    for record in records:
+        args = apply_overrides(record["args"], amount_scale, count_scale, date_shift_days)
+        record_seed = record["seed"] if seed is None else derive_seed(seed, record["account"], record["trxn_set"])
+        trxn_df_list.append(generate_transactions(**args, seed=record_seed, n_realizations=n_realizations,
+                                                  output_format="dataframe"))
+    return _combine_trxn_dfs(trxn_df_list)
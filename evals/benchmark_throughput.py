@@ -0,0 +1,69 @@
+import argparse
+import glob
+import logging
+import time
+import pandas as pd
+from agents.workflows import run_agentic_workflow1, run_agentic_workflow2
+from agents.scheduler import get_scheduler
+from agents.http_client import get_client_factory
+from agents.stand_in_server import StandInSettings, start_stand_in_server
+from utils import load_config, generate_dynamic_output_file_name, write_data_to_file
+logger = logging.getLogger(__name__)
+
+# Offline throughput benchmark: runs both workflows over a set of SARs against the configured backend
+# (normally the local stand-in server) and reports SARs/minute with per-workflow timings.
+
+
+def benchmark(sar_files, config_file, repeat=1):
+    timings = []
+    total_start_time = time.time()
+    for _ in range(repeat):
+        for sar_file in sar_files:
+            with open(sar_file, 'r', encoding='utf-8') as file:
+                sar_text = file.read()
+            start_time = time.time()
+            results1, stage_timings = run_agentic_workflow1(sar_text=sar_text, config_file=config_file,
+                                                            return_timings=True)
+            workflow1_time = time.time() - start_time
+            trxns = run_agentic_workflow2(input=results1, config_file=config_file)
+            workflow2_time = time.time() - start_time - workflow1_time
+            timings.append({"sar_file": sar_file, "workflow1_seconds": workflow1_time,
+                            "workflow2_seconds": workflow2_time, "n_trxns": len(trxns),
+                            **{f"{stage}_seconds": timing["seconds"] for stage, timing in stage_timings.items()
+                               if stage != "total"}})
+            logger.info(f"{sar_file}: workflow1={workflow1_time:.2f}s workflow2={workflow2_time:.2f}s trxns={len(trxns)}")
+    total_time = time.time() - total_start_time
+    return pd.DataFrame(timings), total_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark SAR throughput of the agentic workflows.")
+    parser.add_argument("--config", default="configs/agents_config.yaml", help="Agents config file")
+    parser.add_argument("--sars", default="data/input/sar_test_*.txt", help="Glob of SAR files to process")
+    parser.add_argument("--repeat", type=int, default=1, help="Number of passes over the SAR files")
+    parser.add_argument("--start-server", action="store_true", help="Start the stand-in server in this process")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    provider = (load_config(args.config).get("llm_backend", {}) or {}).get("provider", "openai")
+    if provider != "stand_in":
+        logger.warning("llm_backend.provider is '%s': this benchmark will call the real API", provider)
+    server = start_stand_in_server(StandInSettings.from_config(args.config)) if args.start_server else None
+
+    sar_files = sorted(glob.glob(args.sars))
+    timings_df, total_time = benchmark(sar_files, args.config, args.repeat)
+
+    n_sars = len(timings_df)
+    logger.info(f"Processed {n_sars} SARs in {total_time:.1f}s: {60 * n_sars / total_time:.1f} SARs/minute")
+    logger.info(f"Mean workflow1 time {timings_df['workflow1_seconds'].mean():.2f}s, "
+                f"mean workflow2 time {timings_df['workflow2_seconds'].mean():.2f}s")
+    logger.info(f"Scheduler stats: {get_scheduler(args.config).stats}")
+    logger.info(f"HTTP pool stats: {get_client_factory(args.config).stats()}")
+    if server is not None:
+        logger.info(f"Stand-in stats: {server.RequestHandlerClass.backend.stats}")
+        server.shutdown()
+
+    output_file = generate_dynamic_output_file_name(filename="throughput_benchmark", output_file_type="csv",
+                                                    output_folder="./data/output/evals/benchmarks")
+    write_data_to_file(timings_df, output_file)
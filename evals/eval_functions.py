@@ -3,6 +3,7 @@ import pandas as pd
 from collections import defaultdict
 from typing import List, Dict, Any, Tuple
 from utils import flatten_nested_mapping,approximate_match_ratio,concatenate_trxn_sets
+from agents.resolver import resolve_entities
 import logging
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -284,6 +285,27 @@ def compare_sar_details(
 
 
 
+def compare_local_resolution(ground_truth_sars: List) -> pd.DataFrame:
+    """
+    Runs the deterministic local resolver on the gold Account_IDs, Acct_to_FI and Acct_to_Cust of each SAR
+    and scores the resulting FI_to_Acct_to_Cust against the gold mapping, to check whether the resolver can
+    stand in for the Entity_Resolution_Agent. It does not match every SAR: the gold mappings of sar_train1 and
+    sar_train4 disagree with their own gold accounts and owners (see tests/test_resolver.py).
+
+    :param ground_truth_sars: A list of ground-truth SAR objects.
+    :return: DataFrame with one row per SAR and the precision, recall and F1 of the nested mapping.
+    """
+    rows = []
+    for gt_sar in ground_truth_sars:
+        resolved = resolve_entities({"Account_IDs": gt_sar.gold_account_ids,
+                                     "Acct_to_FI": gt_sar.gold_acct_to_fi,
+                                     "Acct_to_Cust": gt_sar.gold_acct_to_cust})
+        metrics = evaluate_nested_mapping(resolved["FI_to_Acct_to_Cust"], gt_sar.gold_fi_to_acct_to_cust)
+        rows.append({"sar_name": gt_sar.sar_name, **metrics})
+        logging.info(f"Local resolution for {gt_sar.sar_name}: {metrics}")
+    return pd.DataFrame(rows)
+
+
 def compare_trxns(df: pd.DataFrame, expected_trxns: Dict[str, Dict[str, Any]]) -> pd.DataFrame:
     """
     Compare actual transactions in `df` with expected transaction sets in `expected_trxns`.
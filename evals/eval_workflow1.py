@@ -1,6 +1,6 @@
 
 from evals.golden_data import sars
-from evals.eval_functions import compare_sar_details
+from evals.eval_functions import compare_sar_details, compare_local_resolution
 from utils import generate_dynamic_output_file_name,read_data
 from agents.workflows import run_agentic_workflow1
 import os
@@ -47,6 +47,13 @@ if __name__ == "__main__":
     output_file = generate_dynamic_output_file_name(filename="entity_metrics",output_file_type="csv",output_folder=output_folder)
     entity_metrics.to_csv(output_file)
 
+    # Check the deterministic local resolver against the gold FI_to_Acct_to_Cust mappings
+    resolution_metrics = compare_local_resolution(sars)
+    logger.info(f"\n=== Local Resolver Metrics available in {output_folder} ===")
+    print(resolution_metrics.to_string(index=False))
+    output_file = generate_dynamic_output_file_name(filename="local_resolution_metrics",output_file_type="csv",output_folder=output_folder)
+    resolution_metrics.to_csv(output_file)
+
     logger.info(f"\n=== Narrative Match Results available in {output_folder} ===")
     #print(narrative_metrics.to_string(index=False))
     output_file = generate_dynamic_output_file_name(filename="narrative_metrics",output_file_type="csv",output_folder=output_folder)
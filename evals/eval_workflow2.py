@@ -44,7 +44,7 @@ if __name__ == "__main__":
         # print(f"sar_{idx}: \n {sar.get_sar_extract()}")
 
         # Run the agent workflow
-        pred_output = run_agentic_workflow2(sar.get_sar_extract(), config_file)
+        pred_output = run_agentic_workflow2(sar.get_sar_extract(), config_file, sar_id=sar.sar_name)
         #pred_output = pd.read_csv("./data/output/results_trxn_metrics_20250412_021639.csv")
 
         logger.info(f"Evaluating Predictions for SAR {sar.sar_name}...")
@@ -0,0 +1,353 @@
+import argparse
+import logging
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from simulator.windows import distinct_in_window, sorted_searchsorted, window_keys, window_sums
+
+logger = logging.getLogger(__name__)
+
+# Analytics over the aggregate trxn graph of many SARs (or a simulated population), where networkx is too slow.
+#
+# Accounts are integer-encoded and the trxns are kept as a CSR adjacency: edge arrays sorted by (originator, day)
+# with offsets per account, plus the same order by beneficiary. Paths are grown one hop at a time for all of them at
+# once: the edges that may follow each path are a searchsorted range of the sorted (account, day) keys, expanded with
+# np.repeat, so there are no per-node Python loops.
+
+DEFAULT_MAX_PATHS = 20_000_000
+
+
+@dataclass
+class TransactionGraph:
+    """
+    Trxn graph in CSR form. One edge per trxn between two different accounts.
+
+    :param accounts: Account ID of each node.
+    :param src: Originator node of each edge. Edges are sorted by (src, day).
+    :param dst: Beneficiary node of each edge.
+    :param day: Days since start_date of each edge.
+    :param amount: Amount of each edge.
+    :param indptr: Out-edges of node i are edges indptr[i]:indptr[i + 1].
+    :param in_edges: Edge indices sorted by (dst, day).
+    :param in_indptr: In-edges of node i are in_edges[in_indptr[i]:in_indptr[i + 1]].
+    :param start_date: Date of day 0.
+    """
+    accounts: np.ndarray
+    src: np.ndarray
+    dst: np.ndarray
+    day: np.ndarray
+    amount: np.ndarray
+    indptr: np.ndarray
+    in_edges: np.ndarray
+    in_indptr: np.ndarray
+    start_date: np.datetime64
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.accounts)
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.src)
+
+    @property
+    def span(self) -> int:
+        return int(self.day.max(initial=0)) + 1
+
+    def out_degree(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def in_degree(self) -> np.ndarray:
+        return np.diff(self.in_indptr)
+
+    def dates(self, day: np.ndarray) -> np.ndarray:
+        return self.start_date + day.astype("timedelta64[D]")
+
+
+def build_graph(trxns: pd.DataFrame, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                channels: Optional[List[str]] = None) -> TransactionGraph:
+    """
+    Build the CSR trxn graph from trxns with the generate_transactions columns, e.g. the concatenated outputs of
+    run_agentic_workflow2 or chunks of a simulated population.
+
+    Args:
+        trxns (pd.DataFrame): Trxns. Rows without both accounts or a date, and trxns of an account with itself, are
+            left out.
+        start_date (str, optional): Only keep trxns on or after this date.
+        end_date (str, optional): Only keep trxns on or before this date.
+        channels (list, optional): Only keep trxns of these channels.
+
+    Returns:
+        TransactionGraph
+    """
+    start = time.perf_counter()
+    originator = trxns["Originator_Account_ID"].fillna("").astype(str).to_numpy(dtype=object)
+    beneficiary = trxns["Beneficiary_Account_ID"].fillna("").astype(str).to_numpy(dtype=object)
+    dates = pd.to_datetime(trxns["Trxn_Date"]).to_numpy().astype("datetime64[D]")
+    keep = (originator != "") & (beneficiary != "") & (originator != beneficiary) & ~np.isnat(dates)
+    if start_date is not None:
+        keep &= dates >= np.datetime64(start_date, "D")
+    if end_date is not None:
+        keep &= dates <= np.datetime64(end_date, "D")
+    if channels is not None:
+        keep &= trxns["Trxn_Channel"].isin(channels).to_numpy()
+
+    n = int(keep.sum())
+    codes, accounts = pd.factorize(np.concatenate([originator[keep], beneficiary[keep]]))
+    src, dst = codes[:n].astype(np.int64), codes[n:].astype(np.int64)
+    dates = dates[keep]
+    first_date = dates.min() if n else np.datetime64("1970-01-01", "D")
+    day = (dates - first_date).astype(np.int64)
+    amount = trxns["Trxn_Amount"].to_numpy(dtype=float)[keep]
+
+    n_nodes, span = len(accounts), int(day.max(initial=0)) + 1
+    order = np.argsort(window_keys(src, day, span))
+    src, dst, day, amount = src[order], dst[order], day[order], amount[order]
+    in_edges = np.argsort(window_keys(dst, day, span))
+    graph = TransactionGraph(
+        accounts=np.asarray(accounts, dtype=object), src=src, dst=dst, day=day, amount=amount,
+        indptr=np.concatenate([[0], np.cumsum(np.bincount(src, minlength=n_nodes))]),
+        in_edges=in_edges, in_indptr=np.concatenate([[0], np.cumsum(np.bincount(dst, minlength=n_nodes))]),
+        start_date=first_date)
+    logger.info(f"Built graph of {n_nodes} accounts and {n} edges in {time.perf_counter() - start:.1f}s")
+    return graph
+
+
+def find_hubs(graph: TransactionGraph, min_counterparties: int = 10, window_days: Optional[int] = None,
+              direction: str = "in") -> pd.DataFrame:
+    """
+    Fan-in (direction="in") or fan-out ("out") hubs: accounts receiving from / sending to at least
+    min_counterparties distinct accounts, over the whole graph or within any window of window_days.
+
+    Returns:
+        pd.DataFrame: Account_ID, N_Counterparties, Total_Amount and the Window_End of the first busiest window
+        (first trxn date without a window), most counterparties first.
+    """
+    if direction not in ("in", "out"):
+        raise ValueError(f"direction must be 'in' or 'out', got {direction!r}")
+    account, counterparty = (graph.dst, graph.src) if direction == "in" else (graph.src, graph.dst)
+    span = graph.span + (window_days or 0)
+    keys = window_keys(account, graph.day, span)
+    order = np.argsort(keys)
+    keys, account, counterparty, day = keys[order], account[order], counterparty[order], graph.day[order]
+    amount = graph.amount[order]
+    if window_days is None:
+        distinct = np.bincount(np.unique(account * graph.n_nodes + counterparty) // graph.n_nodes,
+                               minlength=graph.n_nodes)[account]
+        totals = np.bincount(account, weights=amount, minlength=graph.n_nodes)[account]
+    else:
+        distinct = distinct_in_window(account, counterparty, day, keys, window_days, span)
+        totals = window_sums(keys, amount, keys, window_days)
+    # Busiest window of each account, the first one if there are several. Events are sorted by (account, day), so
+    # that is the first event of the account reaching its maximum
+    group_starts = np.flatnonzero(np.r_[True, account[1:] != account[:-1]])
+    maximum = np.repeat(np.maximum.reduceat(distinct, group_starts), np.diff(np.r_[group_starts, len(account)]))
+    peaks = np.flatnonzero((distinct == maximum) & (distinct >= min_counterparties))
+    last = peaks[np.r_[True, account[peaks][1:] != account[peaks][:-1]]] if len(peaks) else peaks
+    hubs = pd.DataFrame({"Account_ID": graph.accounts[account[last]], "N_Counterparties": distinct[last],
+                         "Total_Amount": totals[last], "Window_End": graph.dates(day[last])})
+    return hubs.sort_values(["N_Counterparties", "Total_Amount"], ascending=False, ignore_index=True)
+
+
+def _next_edges(graph: TransactionGraph, last_node: np.ndarray, last_day: np.ndarray, last_amount: np.ndarray,
+                latest_day: np.ndarray, min_amount_ratio: float, max_amount_ratio: float,
+                order: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (path, edge) pairs of every out-edge of each path's last node dated from its last day to latest_day, with an
+    amount within the ratios of the path's last amount. order sorts the paths by (last node, last day), if known.
+    """
+    span = graph.span
+    keys = window_keys(graph.src, graph.day, span)
+    start_keys = window_keys(last_node, last_day, span)
+    # Both searches share one sort of the queries: ordered by node, the end keys are nearly sorted too
+    order = np.argsort(start_keys) if order is None else order
+    low = sorted_searchsorted(keys, start_keys, "left", order)
+    high = sorted_searchsorted(keys, window_keys(last_node, np.minimum(latest_day, span - 1), span), "right", order)
+    counts = np.maximum(high - low, 0)
+    path = np.repeat(np.arange(len(low)), counts)
+    edge = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts - low, counts)
+    amount = graph.amount[edge]
+    keep = (amount >= min_amount_ratio * last_amount[path]) & (amount <= max_amount_ratio * last_amount[path])
+    return path[keep], edge[keep]
+
+
+class _Paths:
+    """
+    Paths of equal length grown one hop at a time: nodes (P x hops + 1) and edges (P x hops)
+    """
+
+    def __init__(self, edges: np.ndarray, graph: TransactionGraph):
+        """
+        One-hop paths of the given (unique) edges
+        """
+        self.graph = graph
+        self.edges = edges[:, None]
+        self.nodes = np.stack([graph.src[edges], graph.dst[edges]], axis=1)
+        # The in-edge index already sorts the edges by (dst, day), so the first hop needs no sort
+        position = np.full(graph.n_edges, -1)
+        position[edges] = np.arange(len(edges))
+        self.order = position[graph.in_edges]
+        self.order = self.order[self.order >= 0]
+
+    def __len__(self) -> int:
+        return len(self.edges)
+
+    @property
+    def first_day(self) -> np.ndarray:
+        return self.graph.day[self.edges[:, 0]]
+
+    def extend(self, path: np.ndarray, edge: np.ndarray) -> "_Paths":
+        paths = _Paths.__new__(_Paths)
+        paths.graph = self.graph
+        paths.edges = np.concatenate([self.edges[path], edge[:, None]], axis=1)
+        paths.nodes = np.concatenate([self.nodes[path], self.graph.dst[edge][:, None]], axis=1)
+        paths.order = None
+        return paths
+
+    def next_edges(self, max_days: Optional[int], max_gap_days: Optional[int], min_amount_ratio: float,
+                   max_amount_ratio: float, max_paths: int) -> Tuple[np.ndarray, np.ndarray]:
+        last_edge = self.edges[:, -1]
+        last_day = self.graph.day[last_edge]
+        latest_day = np.full(len(self), self.graph.span - 1)
+        if max_days is not None:
+            latest_day = np.minimum(latest_day, self.first_day + max_days)
+        if max_gap_days is not None:
+            latest_day = np.minimum(latest_day, last_day + max_gap_days)
+        path, edge = _next_edges(self.graph, self.nodes[:, -1], last_day, self.graph.amount[last_edge], latest_day,
+                                 min_amount_ratio, max_amount_ratio, self.order)
+        if len(path) > max_paths:
+            raise ValueError(f"{len(path)} paths exceed max_paths={max_paths}. Tighten the time or amount constraints")
+        return path, edge
+
+    def frame(self, rows: np.ndarray) -> pd.DataFrame:
+        graph, edges = self.graph, self.edges[rows]
+        return pd.DataFrame({
+            "Path": [list(path) for path in graph.accounts[self.nodes[rows]]],
+            "Hops": edges.shape[1],
+            "First_Date": graph.dates(graph.day[edges[:, 0]]),
+            "Last_Date": graph.dates(graph.day[edges[:, -1]]),
+            "First_Amount": graph.amount[edges[:, 0]],
+            "Last_Amount": graph.amount[edges[:, -1]],
+        })
+
+
+def _unique_rows(edges: np.ndarray) -> np.ndarray:
+    # The same set of edges found from different starting edges (trxns on the same day) is kept once
+    _, index = np.unique(np.sort(edges, axis=1), axis=0, return_index=True)
+    return np.sort(index)
+
+
+def find_cycles(graph: TransactionGraph, max_length: int = 4, max_days: Optional[int] = 30,
+                min_amount_ratio: float = 0.0, max_amount_ratio: float = np.inf,
+                max_paths: int = DEFAULT_MAX_PATHS) -> pd.DataFrame:
+    """
+    Round-tripping: money leaving an account and coming back to it through at most max_length hops, each trxn on or
+    after the previous one and the whole cycle within max_days.
+
+    Args:
+        graph (TransactionGraph): Trxn graph.
+        max_length (int): Longest cycle in hops, at least 2.
+        max_days (int, optional): Days between the first and last trxn of a cycle. None for no limit.
+        min_amount_ratio, max_amount_ratio (float): Bounds on each hop's amount relative to the previous hop.
+        max_paths (int): Raise ValueError rather than hold more partial paths in memory.
+
+    Returns:
+        pd.DataFrame: One row per cycle: Path (account IDs, ending where it started), Hops, First_Date, Last_Date,
+        First_Amount and Last_Amount.
+    """
+    paths, cycles = _Paths(np.arange(graph.n_edges), graph), []
+    for _ in range(2, max_length + 1):
+        path, edge = paths.next_edges(max_days, None, min_amount_ratio, max_amount_ratio, max_paths)
+        target = graph.dst[edge]
+        closes = target == paths.nodes[path, 0]
+        revisits = (paths.nodes[path, 1:] == target[:, None]).any(axis=1)
+        closed = paths.extend(path[closes], edge[closes])
+        if len(closed):
+            cycles.append(closed.frame(_unique_rows(closed.edges)))
+        paths = paths.extend(path[~closes & ~revisits], edge[~closes & ~revisits])
+        if not len(paths):
+            break
+    return pd.concat(cycles, ignore_index=True) if cycles else _Paths(np.arange(0), graph).frame(np.arange(0))
+
+
+def find_layering_chains(graph: TransactionGraph, min_hops: int = 3, max_hops: int = 6, max_gap_days: int = 5,
+                         min_amount_ratio: float = 0.8, max_amount_ratio: float = 1.05,
+                         max_paths: int = DEFAULT_MAX_PATHS) -> pd.DataFrame:
+    """
+    Layering: money passed on through a chain of distinct accounts, each hop within max_gap_days of the previous one
+    and for an amount within [min_amount_ratio, max_amount_ratio] of it.
+
+    Only maximal chains are returned: they start with a trxn that does not continue another one and stop where no
+    trxn continues them (or at max_hops).
+
+    Returns:
+        pd.DataFrame: One row per chain with at least min_hops hops, columns as in find_cycles.
+    """
+    everything = _Paths(np.arange(graph.n_edges), graph)
+    path, edge = everything.next_edges(None, max_gap_days, min_amount_ratio, max_amount_ratio, max_paths)
+    # Sending the money straight back does not continue a chain
+    starts = np.setdiff1d(np.arange(graph.n_edges), edge[graph.dst[edge] != graph.src[path]])
+    paths, chains = _Paths(starts, graph), []
+    for hops in range(1, max_hops + 1):
+        if hops == max_hops:
+            ends = np.arange(len(paths))
+        else:
+            path, edge = paths.next_edges(None, max_gap_days, min_amount_ratio, max_amount_ratio, max_paths)
+            valid = ~(paths.nodes[path] == graph.dst[edge][:, None]).any(axis=1)
+            path, edge = path[valid], edge[valid]
+            ends = np.setdiff1d(np.arange(len(paths)), path)
+        if hops >= min_hops and len(ends):
+            chains.append(paths.frame(ends))
+        if hops == max_hops:
+            break
+        paths = paths.extend(path, edge)
+        if not len(paths):
+            break
+    return pd.concat(chains, ignore_index=True) if chains else _Paths(np.arange(0), graph).frame(np.arange(0))
+
+
+def connected_components(graph: TransactionGraph) -> pd.DataFrame:
+    """
+    Weakly connected components, by repeatedly hooking each edge's larger root onto its smaller one and halving
+    paths until nothing changes.
+
+    Returns:
+        pd.DataFrame: Account_ID, Component (smallest node of the component) and Component_Size for every account.
+    """
+    parent = np.arange(graph.n_nodes)
+    while True:
+        low = np.minimum(parent[graph.src], parent[graph.dst])
+        high = np.maximum(parent[graph.src], parent[graph.dst])
+        changed = low != high
+        if not changed.any():
+            break
+        np.minimum.at(parent, high[changed], low[changed])
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+    sizes = np.bincount(parent, minlength=graph.n_nodes)
+    return pd.DataFrame({"Account_ID": graph.accounts, "Component": parent, "Component_Size": sizes[parent]})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Graph analytics over trxn CSVs (e.g. workflow 2 outputs).")
+    parser.add_argument("trxns", nargs="+", help="Trxn CSV files")
+    parser.add_argument("--min-counterparties", type=int, default=10)
+    parser.add_argument("--window-days", type=int, default=30)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    trxns = pd.concat([pd.read_csv(path, dtype={"Originator_Account_ID": str, "Beneficiary_Account_ID": str})
+                       for path in args.trxns], ignore_index=True)
+    graph = build_graph(trxns)
+    print("Fan-in hubs:\n", find_hubs(graph, args.min_counterparties, args.window_days, "in").head(20))
+    print("Fan-out hubs:\n", find_hubs(graph, args.min_counterparties, args.window_days, "out").head(20))
+    print("Cycles:\n", find_cycles(graph, max_days=args.window_days).head(20))
+    print("Layering chains:\n", find_layering_chains(graph).head(20))
+    components = connected_components(graph)
+    print("Largest components:\n", components.drop_duplicates("Component").nlargest(10, "Component_Size"))
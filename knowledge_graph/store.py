@@ -0,0 +1,403 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Persistent graph of the entities, accounts and trxns of every processed SAR, in one SQLite file.
+#
+# Nodes are unique per (type, key) across SARs, so an account or a customer named in several SARs is a single node.
+# Edges and mentions carry the SAR they come from; ingesting a SAR again replaces what it contributed. Edges are
+# indexed from both ends, so neighbourhood and path queries only touch the rows they need.
+
+NODE_TYPES = ["account", "individual", "organization", "financial_institution", "location", "customer_id", "party"]
+TRXN_RELATION = "transacted"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sars (sar_id TEXT PRIMARY KEY, ingested_at TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS nodes (id INTEGER PRIMARY KEY, type TEXT NOT NULL, key TEXT NOT NULL,
+                                  label TEXT NOT NULL, UNIQUE (type, key));
+CREATE INDEX IF NOT EXISTS nodes_key ON nodes (key);
+CREATE TABLE IF NOT EXISTS mentions (node_id INTEGER NOT NULL, sar_id TEXT NOT NULL,
+                                     PRIMARY KEY (node_id, sar_id)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS mentions_sar ON mentions (sar_id);
+CREATE TABLE IF NOT EXISTS edges (src INTEGER NOT NULL, dst INTEGER NOT NULL, relation TEXT NOT NULL,
+                                  channel TEXT NOT NULL DEFAULT '', sar_id TEXT NOT NULL,
+                                  n_trxns INTEGER NOT NULL DEFAULT 0, total_amount REAL NOT NULL DEFAULT 0,
+                                  first_date TEXT, last_date TEXT,
+                                  PRIMARY KEY (src, dst, relation, channel, sar_id)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS edges_dst ON edges (dst);
+CREATE INDEX IF NOT EXISTS edges_sar ON edges (sar_id);
+"""
+
+_EDGE_COLUMNS = "e.src, e.dst, e.relation, e.channel, e.sar_id, e.n_trxns, e.total_amount, e.first_date, e.last_date"
+
+
+def normalize_key(value: Any) -> str:
+    """
+    Lookup key of a node: names and IDs match whatever their case and spacing
+    """
+    return " ".join(str(value).split()).casefold()
+
+
+def entity_type(category: str) -> str:
+    # "Individuals" -> "individual", "Financial_Institutions" -> "financial_institution", as in ui.py
+    return category[:-1].lower() if category.endswith("s") else category.lower()
+
+
+def _blank(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and pd.isna(value)) or not str(value).strip()
+
+
+class KnowledgeGraph:
+    """
+    SQLite backed graph of SAR entities, accounts and the trxns between them.
+
+    Node types are NODE_TYPES. Relations are held_at (account -> financial institution), owned_by (account -> owner),
+    identified_by (account -> customer ID) and transacted (originator -> beneficiary account, one edge per channel
+    with the count, total amount and date range of the trxns).
+
+    :param path: Path of the SQLite file. Parent folders are created if missing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    # Ingestion
+
+    def ingest(self, sar_id: str, entities: Optional[Dict[str, Any]] = None,
+               trxns: Optional[pd.DataFrame] = None) -> Dict[str, int]:
+        """
+        Add (or replace) everything one SAR contributes to the graph.
+
+        Args:
+            sar_id (str): ID of the SAR. What an earlier ingest of the same ID added is removed first.
+            entities (dict, optional): Workflow 1 results (Entities, Account_IDs, Acct_to_FI, Acct_to_Cust,
+                FI_to_Acct_to_Cust).
+            trxns (pd.DataFrame, optional): Workflow 2 trxns. With several realisations only the first is used.
+
+        Returns:
+            dict: Number of nodes mentioned and edges added.
+        """
+        nodes: Dict[Tuple[str, str], str] = {}
+        edges: List[Tuple] = []
+
+        def node(node_type: str, value: Any) -> Tuple[str, str]:
+            key = (node_type, normalize_key(value))
+            nodes.setdefault(key, str(value).strip())
+            return key
+
+        entities = entities or {}
+        for category, names in (entities.get("Entities") or {}).items():
+            for name in names or []:
+                if not _blank(name):
+                    node(entity_type(category), name)
+        # Owners are linked to the entity node of the same name, whatever its type
+        named = {key: (node_type, key) for node_type, key in nodes}
+
+        def owner(name: Any) -> Tuple[str, str]:
+            return named.get(normalize_key(name)) or node("party", name)
+
+        for account in entities.get("Account_IDs") or []:
+            if not _blank(account):
+                node("account", account)
+        for account, fi in (entities.get("Acct_to_FI") or {}).items():
+            if not _blank(account) and not _blank(fi):
+                edges.append((node("account", account), node("financial_institution", fi), "held_at", "",
+                              0, 0.0, None, None))
+        for account, customer in (entities.get("Acct_to_Cust") or {}).items():
+            if not _blank(account) and not _blank(customer):
+                edges.append((node("account", account), owner(customer), "owned_by", "", 0, 0.0, None, None))
+        for fi, accounts in (entities.get("FI_to_Acct_to_Cust") or {}).items():
+            for account, customer_id in (accounts or {}).items():
+                if not _blank(account) and not _blank(customer_id):
+                    edges.append((node("account", account), node("customer_id", customer_id), "identified_by", "",
+                                  0, 0.0, None, None))
+
+        if trxns is not None and len(trxns):
+            edges.extend(self._trxn_edges(trxns, node, owner))
+
+        with self._lock, self._connection:
+            self._remove(sar_id)
+            self._connection.execute("INSERT INTO sars (sar_id, ingested_at) VALUES (?, ?)",
+                                     (sar_id, datetime.now().isoformat(timespec="seconds")))
+            ids = self._upsert_nodes(nodes)
+            self._connection.executemany("INSERT OR IGNORE INTO mentions (node_id, sar_id) VALUES (?, ?)",
+                                         [(node_id, sar_id) for node_id in ids.values()])
+            self._connection.executemany(
+                "INSERT INTO edges (src, dst, relation, channel, sar_id, n_trxns, total_amount, first_date, last_date) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (src, dst, relation, channel, sar_id) "
+                "DO UPDATE SET n_trxns = n_trxns + excluded.n_trxns, "
+                "total_amount = total_amount + excluded.total_amount",
+                [(ids[src], ids[dst], relation, channel, sar_id, n, amount, first, last)
+                 for src, dst, relation, channel, n, amount, first, last in edges])
+        logger.info(f"Ingested SAR {sar_id}: {len(nodes)} nodes, {len(edges)} edges")
+        return {"nodes": len(nodes), "edges": len(edges)}
+
+    @staticmethod
+    def _trxn_edges(trxns: pd.DataFrame, node, owner) -> List[Tuple]:
+        if "Realization" in trxns.columns:
+            trxns = trxns[trxns["Realization"] == trxns["Realization"].min()]
+        df = trxns.copy()
+        df["Trxn_Channel"] = df["Trxn_Channel"].fillna("").astype(str) if "Trxn_Channel" in df else ""
+        df["Trxn_Date"] = pd.to_datetime(df["Trxn_Date"]).dt.strftime("%Y-%m-%d")
+        edges = []
+        for side in ["Originator", "Beneficiary"]:
+            for column, relation, node_of in [(f"{side}_Name", "owned_by", owner),
+                                              (f"{side}_Customer_ID", "identified_by",
+                                               lambda value: node("customer_id", value))]:
+                if column not in df:
+                    continue
+                pairs = df[[f"{side}_Account_ID", column]].drop_duplicates()
+                for account, value in pairs.itertuples(index=False):
+                    if not _blank(account) and not _blank(value):
+                        edges.append((node("account", account), node_of(value), relation, "", 0, 0.0, None, None))
+
+        df = df[~df["Originator_Account_ID"].map(_blank) & ~df["Beneficiary_Account_ID"].map(_blank)]
+        aggregated = (df.groupby(["Originator_Account_ID", "Beneficiary_Account_ID", "Trxn_Channel"])
+                      .agg(n_trxns=("Trxn_Amount", "size"), total_amount=("Trxn_Amount", "sum"),
+                           first_date=("Trxn_Date", "min"), last_date=("Trxn_Date", "max")).reset_index())
+        for row in aggregated.itertuples(index=False):
+            edges.append((node("account", row.Originator_Account_ID), node("account", row.Beneficiary_Account_ID),
+                          TRXN_RELATION, row.Trxn_Channel, int(row.n_trxns), float(row.total_amount),
+                          row.first_date, row.last_date))
+        return edges
+
+    def _upsert_nodes(self, nodes: Dict[Tuple[str, str], str]) -> Dict[Tuple[str, str], int]:
+        self._connection.executemany("INSERT OR IGNORE INTO nodes (type, key, label) VALUES (?, ?, ?)",
+                                     [(node_type, key, label) for (node_type, key), label in nodes.items()])
+        return {(node_type, key): self._connection.execute("SELECT id FROM nodes WHERE type = ? AND key = ?",
+                                                           (node_type, key)).fetchone()[0]
+                for node_type, key in nodes}
+
+    def _remove(self, sar_id: str):
+        for table in ["edges", "mentions", "sars"]:
+            self._connection.execute(f"DELETE FROM {table} WHERE sar_id = ?", (sar_id,))
+
+    def remove(self, sar_id: str):
+        """
+        Remove the edges and mentions of a SAR. Its nodes are kept for the other SARs that name them.
+        """
+        with self._lock, self._connection:
+            self._remove(sar_id)
+
+    # Queries
+
+    def _query(self, sql: str, parameters: Iterable = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._connection.execute(sql, tuple(parameters)).fetchall()
+
+    def sar_ids(self) -> List[str]:
+        return [row["sar_id"] for row in self._query("SELECT sar_id FROM sars ORDER BY sar_id")]
+
+    def find(self, name: str, node_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Nodes whose account ID, customer ID or name is name (ignoring case and spacing), optionally of one type
+        """
+        sql, parameters = "SELECT id, type, key, label FROM nodes WHERE key = ?", [normalize_key(name)]
+        if node_type:
+            sql, parameters = sql + " AND type = ?", parameters + [node_type]
+        return [dict(row) for row in self._query(sql, parameters)]
+
+    def _node_ids(self, name: str, node_type: Optional[str] = None) -> List[int]:
+        return [node["id"] for node in self.find(name, node_type)]
+
+    def _nodes(self, ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        rows = self._query("SELECT id, type, key, label FROM nodes WHERE id IN (SELECT value FROM json_each(?))",
+                           [json.dumps(list(ids))])
+        return {row["id"]: dict(row) for row in rows}
+
+    def _edges(self, ids: Iterable[int], relation: Optional[str] = None, sar_id: Optional[str] = None
+               ) -> List[Dict[str, Any]]:
+        ids = json.dumps(list(ids))
+        filters, parameters = "", []
+        if relation:
+            filters, parameters = filters + " AND e.relation = ?", parameters + [relation]
+        if sar_id:
+            filters, parameters = filters + " AND e.sar_id = ?", parameters + [sar_id]
+        rows = self._query(f"SELECT {_EDGE_COLUMNS} FROM edges e WHERE e.src IN (SELECT value FROM json_each(?)) "
+                           f"{filters} UNION SELECT {_EDGE_COLUMNS} FROM edges e "
+                           f"WHERE e.dst IN (SELECT value FROM json_each(?)) {filters}",
+                           [ids] + parameters + [ids] + parameters)
+        return [dict(row) for row in rows]
+
+    def sars_of(self, name: str, node_type: Optional[str] = None) -> List[str]:
+        """
+        SARs that name an account, customer, institution or entity
+        """
+        ids = self._node_ids(name, node_type)
+        rows = self._query("SELECT DISTINCT sar_id FROM mentions WHERE node_id IN (SELECT value FROM json_each(?)) "
+                           "ORDER BY sar_id", [json.dumps(ids)])
+        return [row["sar_id"] for row in rows]
+
+    def neighbours(self, name: str, node_type: Optional[str] = None, relation: Optional[str] = None,
+                   sar_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Edges from and to a node, each with the node at the other end ("neighbour") and its direction
+        ("out" or "in"), optionally only of one relation or SAR
+        """
+        ids = set(self._node_ids(name, node_type))
+        edges = self._edges(ids, relation, sar_id)
+        nodes = self._nodes({edge["dst"] if edge["src"] in ids else edge["src"] for edge in edges})
+        return [{**edge, "direction": "out" if edge["src"] in ids else "in",
+                 "neighbour": nodes[edge["dst"] if edge["src"] in ids else edge["src"]]} for edge in edges]
+
+    def neighbourhood(self, name: str, hops: int = 1, node_type: Optional[str] = None,
+                      relation: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Nodes and edges within hops of a node, following edges in both directions.
+
+        Returns:
+            dict: {"nodes": [...], "edges": [...]}.
+        """
+        seen = set(self._node_ids(name, node_type))
+        frontier, edges = set(seen), {}
+        for _ in range(hops):
+            if not frontier:
+                break
+            new = set()
+            for edge in self._edges(frontier, relation):
+                edges[(edge["src"], edge["dst"], edge["relation"], edge["channel"], edge["sar_id"])] = edge
+                new.update({edge["src"], edge["dst"]} - seen)
+            seen |= new
+            frontier = new
+        return {"nodes": list(self._nodes(seen).values()), "edges": list(edges.values())}
+
+    def shortest_path(self, source: str, target: str, max_hops: int = 6,
+                      relation: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Nodes of a shortest path between two nodes, following edges in both directions. Searches from both ends
+        at once so only the neighbourhoods up to half the path length are read. Empty if there is none within
+        max_hops.
+        """
+        sources, targets = self._node_ids(source), self._node_ids(target)
+        if not sources or not targets:
+            return []
+        parents = [{node_id: None for node_id in sources}, {node_id: None for node_id in targets}]
+        frontiers = [set(sources), set(targets)]
+        meeting = next(iter(set(sources) & set(targets)), None)
+        hops = 0
+        while meeting is None and hops < max_hops and frontiers[0] and frontiers[1]:
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            new = set()
+            for edge in self._edges(frontiers[side], relation):
+                for here, there in [(edge["src"], edge["dst"]), (edge["dst"], edge["src"])]:
+                    if here in frontiers[side] and there not in parents[side]:
+                        parents[side][there] = here
+                        new.add(there)
+                        if there in parents[1 - side] and meeting is None:
+                            meeting = there
+            frontiers[side] = new
+            hops += 1
+        if meeting is None:
+            return []
+        path, node_id = [], meeting
+        while node_id is not None:
+            path.insert(0, node_id)
+            node_id = parents[0][node_id]
+        node_id = parents[1][meeting]
+        while node_id is not None:
+            path.append(node_id)
+            node_id = parents[1][node_id]
+        nodes = self._nodes(path)
+        return [nodes[node_id] for node_id in path]
+
+    def shared_nodes(self, min_sars: int = 2, node_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Nodes named in at least min_sars SARs, most shared first
+        """
+        sql = ("SELECT n.id, n.type, n.key, n.label, COUNT(*) AS n_sars FROM mentions m JOIN nodes n ON n.id = m.node_id "
+               + ("WHERE n.type = ? " if node_type else "") +
+               "GROUP BY n.id HAVING COUNT(*) >= ? ORDER BY n_sars DESC, n.key")
+        return [dict(row) for row in self._query(sql, ([node_type] if node_type else []) + [min_sars])]
+
+    def stats(self) -> Dict[str, int]:
+        return {table: self._query(f"SELECT COUNT(*) AS n FROM {table}")[0]["n"]
+                for table in ["sars", "nodes", "edges", "mentions"]}
+
+    def to_networkx(self, sar_id: Optional[str] = None):
+        """
+        The graph (or one SAR's part of it) as a networkx MultiDiGraph with the node and edge attributes of
+        ui.generate_network_graph
+        """
+        import networkx as nx
+        graph = nx.MultiDiGraph()
+        where, parameters = ("WHERE e.sar_id = ?", [sar_id]) if sar_id else ("", [])
+        edges = [dict(row) for row in self._query(f"SELECT {_EDGE_COLUMNS} FROM edges e {where}", parameters)]
+        nodes = self._nodes({edge["src"] for edge in edges} | {edge["dst"] for edge in edges})
+        for node in nodes.values():
+            graph.add_node(node["label"], label=node["label"], type=node["type"])
+        for edge in edges:
+            attributes = {"relation": edge["relation"], "sar_id": edge["sar_id"]}
+            if edge["relation"] == TRXN_RELATION:
+                attributes.update({"channel": edge["channel"], "type": edge["channel"],
+                                   "total_amount": edge["total_amount"], "n_trxns": edge["n_trxns"]})
+            graph.add_edge(nodes[edge["src"]]["label"], nodes[edge["dst"]]["label"], **attributes)
+        return graph
+
+
+_graphs: Dict[str, KnowledgeGraph] = {}
+_graphs_lock = threading.Lock()
+
+
+def get_knowledge_graph(path: str) -> KnowledgeGraph:
+    """
+    Return the process-wide KnowledgeGraph for a path
+    """
+    key = os.path.abspath(path)
+    with _graphs_lock:
+        if key not in _graphs:
+            _graphs[key] = KnowledgeGraph(path)
+        return _graphs[key]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest SAR outputs into the knowledge graph or query it.")
+    parser.add_argument("--graph", default="./data/knowledge_graph.sqlite", help="Path of the SQLite file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="Ingest the outputs of workflow 1 and 2 for one SAR")
+    ingest_parser.add_argument("--sar-id", required=True)
+    ingest_parser.add_argument("--entities", help="Workflow 1 results JSON")
+    ingest_parser.add_argument("--trxns", help="Workflow 2 trxns CSV")
+    neighbours_parser = subparsers.add_parser("neighbours", help="Show the neighbours of an account or entity")
+    neighbours_parser.add_argument("name")
+    neighbours_parser.add_argument("--hops", type=int, default=1)
+    path_parser = subparsers.add_parser("path", help="Show a shortest path between two accounts or entities")
+    path_parser.add_argument("source")
+    path_parser.add_argument("target")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    graph = get_knowledge_graph(args.graph)
+    if args.command == "ingest":
+        entities = None
+        if args.entities:
+            with open(args.entities) as file:
+                entities = json.load(file)
+        trxns = pd.read_csv(args.trxns, dtype={"Originator_Account_ID": str, "Beneficiary_Account_ID": str}) \
+            if args.trxns else None
+        print(graph.ingest(args.sar_id, entities, trxns))
+    elif args.command == "neighbours":
+        print(json.dumps(graph.neighbourhood(args.name, args.hops), indent=2))
+    else:
+        print(json.dumps(graph.shortest_path(args.source, args.target), indent=2))
@@ -0,0 +1,100 @@
+import glob
+import json
+import logging
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Chunked columnar storage shared by the population simulator, the rule engine and the feature store.
+# "parquet" needs pyarrow; "npz" only needs numpy and keeps every column as a typed array.
+
+FORMATS = ["parquet", "npz"]
+MANIFEST = "manifest.json"
+
+
+def _to_npz_arrays(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    arrays = {}
+    for name in df.columns:
+        column = df[name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # Expand from the categories so each distinct string is only converted once
+            arrays[name] = column.cat.categories.to_numpy(dtype=str)[column.cat.codes.to_numpy()]
+        elif column.dtype == object or pd.api.types.is_string_dtype(column.dtype):
+            # Strings are stored as fixed width unicode so the file can be loaded without pickle
+            arrays[name] = column.to_numpy(dtype=str)
+        else:
+            arrays[name] = column.to_numpy()
+    return arrays
+
+
+def write_chunk(df: pd.DataFrame, path: str):
+    """
+    Write one DataFrame as parquet or npz, depending on the extension of path
+    """
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        np.savez(path, **_to_npz_arrays(df))
+
+
+class ChunkWriter:
+    """
+    Write DataFrames as numbered columnar chunks (part-00000.parquet, ...) plus a manifest.json describing them.
+
+    :param directory: Output folder, created if missing. Existing chunks of the same format are removed.
+    :param output_format: "parquet" or "npz".
+    :param metadata: Extra entries for the manifest e.g. the config used to build the data.
+    """
+
+    def __init__(self, directory: str, output_format: str = "parquet", metadata: Optional[Dict[str, Any]] = None):
+        if output_format not in FORMATS:
+            raise ValueError(f"output_format must be one of {FORMATS}, got {output_format!r}")
+        self.directory = directory
+        self.output_format = output_format
+        self.metadata = metadata or {}
+        self.chunks: List[Dict[str, Any]] = []
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, f"part-*.{output_format}")):
+            os.remove(path)
+
+    def write(self, df: pd.DataFrame) -> str:
+        path = os.path.join(self.directory, f"part-{len(self.chunks):05d}.{self.output_format}")
+        write_chunk(df, path)
+        self.chunks.append({"path": os.path.basename(path), "rows": len(df)})
+        logger.info(f"Wrote {len(df)} rows to {path}")
+        return path
+
+    def close(self) -> Dict[str, Any]:
+        """
+        Write the manifest and return it
+        """
+        manifest = {"format": self.output_format, "rows": sum(chunk["rows"] for chunk in self.chunks),
+                    "chunks": self.chunks, **self.metadata}
+        with open(os.path.join(self.directory, MANIFEST), "w") as file:
+            json.dump(manifest, file, indent=2, default=str)
+        return manifest
+
+
+def read_manifest(directory: str) -> Dict[str, Any]:
+    with open(os.path.join(directory, MANIFEST)) as file:
+        return json.load(file)
+
+
+def read_chunk(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, columns=columns)
+    with np.load(path, allow_pickle=False) as arrays:
+        names = columns or list(arrays.files)
+        return pd.DataFrame({name: arrays[name] for name in names})
+
+
+def iter_chunks(directory: str, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Yield the chunks listed in a directory's manifest one at a time, optionally only some columns
+    """
+    for chunk in read_manifest(directory)["chunks"]:
+        yield read_chunk(os.path.join(directory, chunk["path"]), columns)
@@ -0,0 +1,332 @@
+import argparse
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from simulator.chunks import FORMATS, read_chunk, write_chunk
+from simulator.population import LABEL_COLUMN, prepare_sar_trxns
+from simulator.windows import (TransactionArrays, load_transactions, window_keys, window_bounds, window_sums,
+                               distinct_in_window, window_entropy)
+from utils import load_config
+
+logger = logging.getLogger(__name__)
+
+# Rolling window features for ML models, per account and per (account, counterparty) pair, kept in a columnar
+# feature store.
+#
+# Each trxn is an event for both of its accounts. Events are sorted once per bucket of accounts and every window is
+# evaluated with the primitives of simulator/windows.py. Accounts are hashed into buckets and each bucket keeps its
+# own trxns, so adding the trxns of new SARs only recomputes the buckets of the accounts they touch.
+
+FEATURE_TABLES = ["accounts", "counterparties"]
+TRXN_TABLE = "trxns"
+FEATURE_MANIFEST = "features.json"
+
+
+@dataclass
+class FeatureConfig:
+    """
+    Settings of the feature pipeline. Read from the `features` section of the config file.
+
+    :param windows: Window lengths in days. Every feature is computed for each window.
+    :param channels: Channels to compute the share of trxns for.
+    :param threshold: Reporting threshold for the near threshold ratio.
+    :param band: Trxns within band * threshold below the threshold count as near it.
+    :param n_buckets: Number of account buckets the store is partitioned into.
+    :param output_format: "parquet" or "npz".
+    """
+    windows: List[int] = field(default_factory=lambda: [1, 7, 30, 90])
+    channels: List[str] = field(default_factory=lambda: ["Cash", "Check", "Wire"])
+    threshold: float = 10000.0
+    band: float = 0.1
+    n_buckets: int = 64
+    output_format: str = "parquet"
+
+    def __post_init__(self):
+        if self.output_format not in FORMATS:
+            raise ValueError(f"output_format must be one of {FORMATS}, got {self.output_format!r}")
+
+    @classmethod
+    def from_config(cls, config_file: str = "configs/agents_config.yaml") -> "FeatureConfig":
+        config = load_config(config_file).get("features", {}) or {}
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in config.items() if k in known})
+
+
+@dataclass
+class _Events:
+    """
+    One event per account of a trxn: direction is 1 for money in, -1 for money out and 0 for trxns from an account to
+    itself (e.g. cash).
+    """
+    account: np.ndarray
+    counterparty: np.ndarray
+    row: np.ndarray
+    direction: np.ndarray
+
+    def take(self, index: np.ndarray) -> "_Events":
+        return _Events(self.account[index], self.counterparty[index], self.row[index], self.direction[index])
+
+
+def _events(trxns: TransactionArrays) -> _Events:
+    rows = np.arange(len(trxns))
+    own = trxns.originator == trxns.beneficiary
+    other = rows[~own]
+    return _Events(
+        account=np.concatenate([trxns.originator[other], trxns.beneficiary[other], trxns.originator[own]]),
+        counterparty=np.concatenate([trxns.beneficiary[other], trxns.originator[other], trxns.originator[own]]),
+        row=np.concatenate([other, other, rows[own]]),
+        direction=np.concatenate([-np.ones(len(other), dtype=np.int8), np.ones(len(other), dtype=np.int8),
+                                  np.zeros(own.sum(), dtype=np.int8)]))
+
+
+def _span(trxns: TransactionArrays, config: FeatureConfig) -> int:
+    return int(trxns.day.max(initial=0)) + max(config.windows) + 1
+
+
+def _amount_features(keys: np.ndarray, amount: np.ndarray, direction: np.ndarray, query_keys: np.ndarray,
+                     window: int) -> Dict[str, np.ndarray]:
+    bounds = window_bounds(keys, query_keys, window)
+    return {"n_trxns": window_sums(keys, np.ones(len(keys)), query_keys, window, bounds),
+            "amount": window_sums(keys, amount, query_keys, window, bounds),
+            "in_amount": window_sums(keys, np.where(direction == 1, amount, 0.0), query_keys, window, bounds),
+            "out_amount": window_sums(keys, np.where(direction == -1, amount, 0.0), query_keys, window, bounds)}
+
+
+def account_features(trxns: TransactionArrays, config: Optional[FeatureConfig] = None,
+                     events: Optional[_Events] = None) -> pd.DataFrame:
+    """
+    Rolling window features of each account on each day it has trxns.
+
+    For every window w (days, including the current one) the columns are
+        n_trxns_{w}d, amount_{w}d, in_amount_{w}d, out_amount_{w}d: count and sums of the trxns.
+        velocity_{w}d: amount moved per day.
+        share_{channel}_{w}d: share of the trxns through each configured channel.
+        location_entropy_{w}d: entropy of the branch / ATM locations used, 0 when there are none.
+        near_threshold_ratio_{w}d: share of the trxns just below the reporting threshold.
+        n_counterparties_{w}d: distinct counterparties, not counting the account itself.
+
+    Args:
+        trxns (TransactionArrays): Trxns from load_transactions.
+        config (FeatureConfig, optional): Defaults to FeatureConfig().
+        events (optional): Only compute the features of these events' accounts. Defaults to all accounts.
+
+    Returns:
+        pd.DataFrame: Account_ID, Date and the features as float32.
+    """
+    config = config or FeatureConfig()
+    events = events if events is not None else _events(trxns)
+    span = _span(trxns, config)
+    keys = window_keys(events.account, trxns.day[events.row], span)
+    order = np.argsort(keys, kind="stable")
+    keys, events = keys[order], events.take(order)
+    query_keys = np.unique(keys)
+
+    amount, day = trxns.amount[events.row], trxns.day[events.row]
+    near = (amount >= config.threshold * (1 - config.band)) & (amount < config.threshold)
+    located = trxns.location[events.row] != _code(trxns.locations, "")
+    other = events.direction != 0
+
+    features = {"Account_ID": trxns.accounts.to_numpy()[query_keys // span],
+                "Date": trxns.dates(query_keys % span)}
+    for window in config.windows:
+        aggregates = _amount_features(keys, amount, events.direction, query_keys, window)
+        n = np.maximum(aggregates["n_trxns"], 1)
+        aggregates["velocity"] = aggregates["amount"] / window
+        for channel in config.channels:
+            in_channel = trxns.channel[events.row] == _code(trxns.channels, channel)
+            aggregates[f"share_{channel.lower()}"] = window_sums(keys, in_channel, query_keys, window) / n
+        aggregates["location_entropy"] = window_entropy(events.account[located], trxns.location[events.row][located],
+                                                        day[located], query_keys, window, span)
+        aggregates["near_threshold_ratio"] = window_sums(keys, near, query_keys, window) / n
+        aggregates["n_counterparties"] = distinct_in_window(events.account[other], events.counterparty[other],
+                                                            day[other], query_keys, window, span)
+        features.update({f"{name}_{window}d": values.astype(np.float32) for name, values in aggregates.items()})
+    return pd.DataFrame(features)
+
+
+def counterparty_features(trxns: TransactionArrays, config: Optional[FeatureConfig] = None,
+                          events: Optional[_Events] = None) -> pd.DataFrame:
+    """
+    Rolling window features of each (account, counterparty) pair on each day they trade, for every window w:
+    n_trxns_{w}d, amount_{w}d, in_amount_{w}d, out_amount_{w}d and share_of_amount_{w}d, the pair's share of all
+    the amount the account moved in the window. Trxns of an account with itself are left out.
+
+    Returns:
+        pd.DataFrame: Account_ID, Counterparty_ID, Date and the features as float32.
+    """
+    config = config or FeatureConfig()
+    events = events if events is not None else _events(trxns)
+    span = _span(trxns, config)
+    account_keys = window_keys(events.account, trxns.day[events.row], span)
+    account_order = np.argsort(account_keys, kind="stable")
+    account_keys, account_amount = account_keys[account_order], trxns.amount[events.row][account_order]
+
+    events = events.take(np.flatnonzero(events.direction != 0))
+    n_accounts = len(trxns.accounts)
+    pair = events.account.astype(np.int64) * n_accounts + events.counterparty
+    keys = window_keys(pair, trxns.day[events.row], span)
+    order = np.argsort(keys, kind="stable")
+    keys, events = keys[order], events.take(order)
+    query_keys = np.unique(keys)
+    query_pair, query_day = query_keys // span, query_keys % span
+    query_account_keys = window_keys(query_pair // n_accounts, query_day, span)
+
+    accounts = trxns.accounts.to_numpy()
+    features = {"Account_ID": accounts[query_pair // n_accounts], "Counterparty_ID": accounts[query_pair % n_accounts],
+                "Date": trxns.dates(query_day)}
+    for window in config.windows:
+        aggregates = _amount_features(keys, trxns.amount[events.row], events.direction, query_keys, window)
+        total = window_sums(account_keys, account_amount, query_account_keys, window)
+        aggregates["share_of_amount"] = np.divide(aggregates["amount"], total, out=np.zeros(len(total)),
+                                                  where=total > 0)
+        features.update({f"{name}_{window}d": values.astype(np.float32) for name, values in aggregates.items()})
+    return pd.DataFrame(features)
+
+
+def _code(index: pd.Index, value: str) -> int:
+    return index.get_loc(value) if value in index else -1
+
+
+def account_buckets(account_ids: np.ndarray, n_buckets: int) -> np.ndarray:
+    """
+    Stable bucket of each account ID, the same across runs and processes
+    """
+    hashes = pd.util.hash_array(np.asarray(account_ids).astype(str).astype(object))
+    return (hashes % np.uint64(n_buckets)).astype(np.int64)
+
+
+def _path(store_dir: str, table: str, bucket: int, output_format: str) -> str:
+    return os.path.join(store_dir, table, f"bucket-{bucket:05d}.{output_format}")
+
+
+def _write_bucket(store_dir: str, bucket: int, trxns: TransactionArrays, events: _Events,
+                  config: FeatureConfig) -> Dict[str, int]:
+    tables = {TRXN_TABLE: trxns.to_frame(np.unique(events.row)),
+              "accounts": account_features(trxns, config, events),
+              "counterparties": counterparty_features(trxns, config, events)}
+    for table, df in tables.items():
+        os.makedirs(os.path.join(store_dir, table), exist_ok=True)
+        write_chunk(df, _path(store_dir, table, bucket, config.output_format))
+    return {table: len(df) for table, df in tables.items()}
+
+
+def _write_manifest(store_dir: str, manifest: Dict[str, Any]):
+    with open(os.path.join(store_dir, FEATURE_MANIFEST), "w") as file:
+        json.dump(manifest, file, indent=2, default=str)
+
+
+def read_feature_manifest(store_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(store_dir, FEATURE_MANIFEST)) as file:
+        return json.load(file)
+
+
+def build_feature_store(source: Union[str, pd.DataFrame, Iterable[pd.DataFrame]], store_dir: str,
+                        config: Optional[FeatureConfig] = None) -> Dict[str, Any]:
+    """
+    Compute the account and counterparty features of all trxns and write them bucket by bucket.
+
+    Args:
+        source: Trxns, see simulator.windows.load_transactions.
+        store_dir (str): Folder of the feature store. Existing buckets are overwritten.
+        config (FeatureConfig, optional): Defaults to FeatureConfig().
+
+    Returns:
+        dict: The manifest, with the config and the number of rows of each table in each bucket.
+    """
+    config = config or FeatureConfig()
+    start = time.perf_counter()
+    trxns = load_transactions(source)
+    events = _events(trxns)
+    bucket = account_buckets(trxns.accounts.to_numpy(), config.n_buckets)[events.account]
+    order = np.argsort(bucket, kind="stable")
+    bounds = np.searchsorted(bucket[order], np.arange(config.n_buckets + 1))
+
+    manifest = {"format": config.output_format, "config": asdict(config), "buckets": {}}
+    for b in range(config.n_buckets):
+        if bounds[b] < bounds[b + 1]:
+            manifest["buckets"][str(b)] = _write_bucket(store_dir, b, trxns, events.take(order[bounds[b]:bounds[b + 1]]),
+                                                        config)
+    _write_manifest(store_dir, manifest)
+    logger.info(f"Built features of {len(trxns)} trxns in {len(manifest['buckets'])} buckets in "
+                f"{time.perf_counter() - start:.1f}s")
+    return manifest
+
+
+def update_feature_store(store_dir: str, new_trxns: pd.DataFrame, sar_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Add trxns (e.g. of newly processed SARs) to a feature store. Only the buckets of the accounts they touch are
+    recomputed, from the trxns already in those buckets plus the new ones. Adding the same trxns twice counts them
+    twice.
+
+    Args:
+        store_dir (str): Folder of the feature store.
+        new_trxns (pd.DataFrame): Trxns to add. Without an Is_SAR column they are SAR trxns, as produced by
+            run_agentic_workflow2, and labelled with sar_id.
+        sar_id (str, optional): SAR ID for trxns without a SAR_ID column.
+
+    Returns:
+        dict: The updated manifest.
+    """
+    manifest = read_feature_manifest(store_dir)
+    config = FeatureConfig(**manifest["config"])
+    if LABEL_COLUMN not in new_trxns:
+        ids = pd.Series(new_trxns["Transaction_ID"] if "Transaction_ID" in new_trxns
+                        else np.arange(1, len(new_trxns) + 1), index=new_trxns.index)
+        new_trxns = prepare_sar_trxns(new_trxns, sar_id)
+        new_trxns.insert(0, "Transaction_ID", ids.loc[new_trxns.index].to_numpy(dtype=np.int64))
+        new_trxns = new_trxns.reset_index(drop=True)
+    originator = account_buckets(new_trxns["Originator_Account_ID"].to_numpy(), config.n_buckets)
+    beneficiary = account_buckets(new_trxns["Beneficiary_Account_ID"].to_numpy(), config.n_buckets)
+
+    for b in np.union1d(originator, beneficiary):
+        path = _path(store_dir, TRXN_TABLE, b, config.output_format)
+        existing = [read_chunk(path)] if os.path.exists(path) else []
+        trxns = load_transactions(pd.concat(existing + [new_trxns[(originator == b) | (beneficiary == b)]],
+                                            ignore_index=True))
+        events = _events(trxns)
+        in_bucket = account_buckets(trxns.accounts.to_numpy(), config.n_buckets) == b
+        manifest["buckets"][str(b)] = _write_bucket(store_dir, b, trxns,
+                                                    events.take(np.flatnonzero(in_bucket[events.account])), config)
+        logger.info(f"Recomputed features of bucket {b} ({len(trxns)} trxns)")
+    _write_manifest(store_dir, manifest)
+    return manifest
+
+
+def read_features(store_dir: str, table: str = "accounts", account_ids: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Read a table of the feature store ("accounts", "counterparties" or "trxns"), only reading the buckets of
+    account_ids if given
+    """
+    manifest = read_feature_manifest(store_dir)
+    buckets = [int(b) for b in manifest["buckets"]]
+    if account_ids is not None:
+        buckets = sorted(set(buckets) & set(account_buckets(np.asarray(account_ids),
+                                                            manifest["config"]["n_buckets"]).tolist()))
+    frames = [read_chunk(_path(store_dir, table, b, manifest["format"])) for b in buckets]
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if account_ids is not None and len(df) and table != TRXN_TABLE:
+        df = df[df["Account_ID"].isin(account_ids)].reset_index(drop=True)
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or update the rolling window feature store.")
+    parser.add_argument("--config", default="configs/agents_config.yaml", help="Config file with a features section")
+    parser.add_argument("--trxns", required=True, help="Population folder, or CSV of trxns to add with --update")
+    parser.add_argument("--store", default="./data/features", help="Feature store folder")
+    parser.add_argument("--update", action="store_true", help="Add the trxns to an existing store")
+    parser.add_argument("--sar-id", default=None, help="SAR ID of the trxns added with --update")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.update:
+        update_feature_store(args.store, pd.read_csv(args.trxns), args.sar_id)
+    else:
+        source = pd.read_csv(args.trxns) if args.trxns.endswith(".csv") else args.trxns
+        build_feature_store(source, args.store, FeatureConfig.from_config(args.config))
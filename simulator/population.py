@@ -0,0 +1,263 @@
+import argparse
+import copy
+import logging
+import math
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from agents.tools import REALIZATION_COLUMN, TRXN_COLUMNS, derive_seed
+from simulator.chunks import ChunkWriter
+from utils import load_config
+
+logger = logging.getLogger(__name__)
+
+# Background population of benign accounts for backtesting transaction monitoring. Trxns use the columns emitted by
+# generate_transactions, so trxns generated from SARs can be injected as labelled rows.
+
+LABEL_COLUMN = "Is_SAR"
+SAR_ID_COLUMN = "SAR_ID"
+POPULATION_COLUMNS = ["Transaction_ID"] + TRXN_COLUMNS + [LABEL_COLUMN, SAR_ID_COLUMN]
+
+# Share of trxns, and median / log-normal sigma of the amount, per channel
+DEFAULT_CHANNELS = {
+    "Cash": {"p": 0.45, "median": 200.0, "sigma": 1.0},
+    "Check": {"p": 0.35, "median": 450.0, "sigma": 1.1},
+    "Wire": {"p": 0.20, "median": 2500.0, "sigma": 1.3},
+}
+DEFAULT_LOCATIONS = ["Main Street Branch", "Downtown ATM", "Airport ATM", "Mall Branch", "Highway ATM"]
+
+
+@dataclass
+class PopulationConfig:
+    """
+    Shape of the simulated background population. Read from the `simulator` section of the config file.
+
+    :param n_accounts: Number of benign accounts.
+    :param start_date: First date of the simulated period (yyyy-mm-dd).
+    :param end_date: Last date of the simulated period (yyyy-mm-dd).
+    :param trxns_per_account_per_month: Mean of the Poisson number of trxns each account originates per month.
+    :param channels: {channel: {"p": share of trxns, "median": median amount, "sigma": log-normal sigma}}.
+    :param incoming_share: Share of wires and checks an account receives rather than sends.
+    :param weekday_weights: Relative activity Monday to Sunday.
+    :param month_weights: Relative activity January to December.
+    :param locations: Branch or ATM locations of cash trxns.
+    :param accounts_per_chunk: Accounts simulated and written together. Bounds the memory used.
+    :param output_format: "parquet" or "npz", see simulator/chunks.py.
+    :param seed: Seed of the whole population. Each chunk draws from its own stream derived from it.
+    """
+    n_accounts: int = 100000
+    start_date: str = "2024-01-01"
+    end_date: str = "2024-12-31"
+    trxns_per_account_per_month: float = 6.0
+    channels: Dict[str, Dict[str, float]] = field(default_factory=lambda: copy.deepcopy(DEFAULT_CHANNELS))
+    incoming_share: float = 0.5
+    weekday_weights: List[float] = field(default_factory=lambda: [1.0, 1.0, 1.0, 1.0, 1.2, 0.7, 0.3])
+    month_weights: List[float] = field(default_factory=lambda: [0.9, 0.9, 1.0, 1.0, 1.0, 1.0,
+                                                                1.0, 1.0, 1.0, 1.0, 1.1, 1.3])
+    locations: List[str] = field(default_factory=lambda: list(DEFAULT_LOCATIONS))
+    accounts_per_chunk: int = 20000
+    output_format: str = "parquet"
+    seed: int = 0
+
+    @classmethod
+    def from_config(cls, config_file: str) -> "PopulationConfig":
+        config = load_config(config_file).get("simulator", {}) or {}
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in config.items() if k in known})
+
+    @property
+    def n_chunks(self) -> int:
+        return max(math.ceil(self.n_accounts / self.accounts_per_chunk), 1)
+
+
+def _digits(index: np.ndarray, width: int) -> np.ndarray:
+    digits = np.empty((len(index), width), dtype=np.uint8)
+    rest = index.astype(np.int64)
+    for position in range(width - 1, -1, -1):
+        rest, digit = np.divmod(rest, 10)
+        digits[:, position] = digit + ord("0")
+    return digits
+
+
+def format_ids(prefix: str, index: np.ndarray, width: int = 9) -> np.ndarray:
+    """
+    Vectorised f"{prefix}{index:0{width}d}" assembled from digit bytes, several times faster than string formatting
+    """
+    prefix_bytes = np.frombuffer(prefix.encode("ascii"), dtype=np.uint8)
+    buffer = np.empty((len(index), len(prefix_bytes) + width), dtype=np.uint8)
+    buffer[:, :len(prefix_bytes)] = prefix_bytes
+    buffer[:, len(prefix_bytes):] = _digits(index, width)
+    return buffer.view(f"S{buffer.shape[1]}").ravel().astype(f"U{buffer.shape[1]}")
+
+
+def account_ids(index: np.ndarray) -> np.ndarray:
+    return format_ids("BG", index)
+
+
+def _categorical(codes: np.ndarray, dtype: pd.CategoricalDtype) -> pd.Categorical:
+    # Strings are only built once per distinct value; columns hold integer codes (dictionary encoded in parquet)
+    return pd.Categorical.from_codes(codes, dtype=dtype)
+
+
+def _day_probabilities(config: PopulationConfig):
+    days = np.arange(np.datetime64(config.start_date, "D"), np.datetime64(config.end_date, "D") + 1)
+    weekday = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    month = days.astype("datetime64[M]").astype(np.int64) % 12
+    weights = np.asarray(config.weekday_weights)[weekday] * np.asarray(config.month_weights)[month]
+    return days, weights / weights.sum()
+
+
+def simulate_chunk(config: PopulationConfig, chunk_index: int, first_trxn_id: int = 1) -> pd.DataFrame:
+    """
+    Simulate every trxn originated or received by the accounts of one chunk, as POPULATION_COLUMNS.
+
+    Cash trxns have the account as both originator and beneficiary. Wires and checks go to, or with probability
+    incoming_share come from, a random account of the whole population.
+    """
+    rng = np.random.default_rng(derive_seed(config.seed, "population", chunk_index))
+    first = chunk_index * config.accounts_per_chunk
+    accounts = np.arange(first, min(first + config.accounts_per_chunk, config.n_accounts), dtype=np.int64)
+    days, day_p = _day_probabilities(config)
+
+    counts = rng.poisson(config.trxns_per_account_per_month * len(days) / 30.44, size=len(accounts))
+    n = int(counts.sum())
+    # Dates are drawn as counts per day so they come out sorted; the accounts are shuffled over them instead
+    dates = np.repeat(days, rng.multinomial(n, day_p))
+    account = rng.permutation(np.repeat(accounts, counts))
+
+    channel_names = np.asarray(list(config.channels))
+    channel_p = np.asarray([config.channels[c]["p"] for c in channel_names], dtype=float)
+    medians = np.asarray([config.channels[c]["median"] for c in channel_names], dtype=float)
+    sigmas = np.asarray([config.channels[c]["sigma"] for c in channel_names], dtype=float)
+    channel = rng.choice(len(channel_names), size=n, p=channel_p / channel_p.sum())
+    amounts = np.maximum(np.round(medians[channel] * np.exp(sigmas[channel] * rng.standard_normal(n)), 2), 1.0)
+
+    is_cash = channel_names[channel] == "Cash"
+    counterparty = np.where(is_cash, account, rng.integers(0, config.n_accounts, size=n))
+    incoming = ~is_cash & (rng.random(n) < config.incoming_share)
+    originator = np.where(incoming, counterparty, account)
+    beneficiary = np.where(incoming, account, counterparty)
+    location_names = np.asarray([""] + list(config.locations))
+    location_codes = np.where(is_cash, rng.integers(1, len(location_names), size=n), 0)
+
+    # Accounts, names and customer IDs are categoricals over the accounts this chunk touches
+    parties, codes = np.unique(np.concatenate([originator, beneficiary]), return_inverse=True)
+    names, ids, customer_ids = (pd.CategoricalDtype(pd.Index(values)) for values in
+                                (format_ids("Customer_", parties), account_ids(parties), format_ids("BGC", parties)))
+    return pd.DataFrame({
+        "Transaction_ID": np.arange(first_trxn_id, first_trxn_id + n, dtype=np.int64),
+        "Originator_Name": _categorical(codes[:n], names),
+        "Originator_Account_ID": _categorical(codes[:n], ids),
+        "Originator_Customer_ID": _categorical(codes[:n], customer_ids),
+        "Beneficiary_Name": _categorical(codes[n:], names),
+        "Beneficiary_Account_ID": _categorical(codes[n:], ids),
+        "Beneficiary_Customer_ID": _categorical(codes[n:], customer_ids),
+        "Trxn_Channel": _categorical(channel, pd.CategoricalDtype(channel_names)),
+        "Trxn_Date": dates,
+        "Trxn_Amount": amounts,
+        "Branch_or_ATM_Location": _categorical(location_codes, pd.CategoricalDtype(location_names)),
+        LABEL_COLUMN: np.zeros(n, dtype=bool),
+        SAR_ID_COLUMN: _categorical(np.zeros(n, dtype=np.int64), pd.CategoricalDtype([""])),
+    })
+
+
+def prepare_sar_trxns(sar_trxns: pd.DataFrame, sar_id: Optional[str] = None) -> pd.DataFrame:
+    """
+    Bring trxns from run_agentic_workflow2 (or resimulate) to POPULATION_COLUMNS, labelled as SAR trxns.
+    An existing SAR_ID column is kept, otherwise sar_id is used. Of trxns generated with n_realizations > 1 only the
+    first realisation of each SAR is kept, as the realisations are alternatives rather than more trxns of the SAR.
+    Trxns without a date or amount cannot be placed in the population and are dropped. The kept trxns keep their
+    index in sar_trxns.
+    """
+    if REALIZATION_COLUMN in sar_trxns:
+        realization = sar_trxns[REALIZATION_COLUMN]
+        first = (realization.groupby(sar_trxns[SAR_ID_COLUMN], dropna=False).transform("min")
+                 if SAR_ID_COLUMN in sar_trxns else realization.min())
+        sar_trxns = sar_trxns[realization.isna() | (realization == first)]
+    df = pd.DataFrame({name: sar_trxns[name].fillna("") if name in sar_trxns else "" for name in TRXN_COLUMNS},
+                      index=sar_trxns.index)
+    df["Trxn_Date"] = pd.to_datetime(df["Trxn_Date"]).to_numpy().astype("datetime64[D]")
+    df["Trxn_Amount"] = df["Trxn_Amount"].replace("", np.nan).astype(float)
+    incomplete = df["Trxn_Date"].isna() | df["Trxn_Amount"].isna()
+    if incomplete.any():
+        logger.warning(f"Dropped {int(incomplete.sum())} SAR trxns without a Trxn_Date or Trxn_Amount")
+        df, sar_trxns = df[~incomplete], sar_trxns[~incomplete]
+    for name in TRXN_COLUMNS:
+        if name not in ("Trxn_Date", "Trxn_Amount"):
+            df[name] = df[name].astype(str)
+    df[LABEL_COLUMN] = True
+    df[SAR_ID_COLUMN] = sar_trxns[SAR_ID_COLUMN].astype(str) if SAR_ID_COLUMN in sar_trxns else (sar_id or "SAR")
+    return df
+
+
+def _sar_chunks(sar_df: pd.DataFrame, n_chunks: int) -> np.ndarray:
+    # All trxns of a SAR account land in the same chunk so per-account aggregates stay within a chunk
+    accounts, inverse = np.unique(sar_df["Originator_Account_ID"].to_numpy(dtype=str), return_inverse=True)
+    chunk_of_account = np.asarray([derive_seed("population", account) % n_chunks for account in accounts])
+    return chunk_of_account[inverse]
+
+
+def _append_rows(chunk: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    # Keep categorical columns categorical by merging their categories
+    columns = {}
+    for name in chunk.columns:
+        if isinstance(chunk[name].dtype, pd.CategoricalDtype):
+            columns[name] = union_categoricals([chunk[name].array, pd.Categorical(rows[name].astype(str))])
+        else:
+            columns[name] = np.concatenate([chunk[name].to_numpy(), rows[name].to_numpy(dtype=chunk[name].dtype)])
+    return pd.DataFrame(columns)
+
+
+def simulate_population(config: PopulationConfig, output_dir: str,
+                        sar_trxns: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """
+    Simulate the background population chunk by chunk, inject the SAR trxns and write each chunk as it is built,
+    so memory use is bounded by accounts_per_chunk whatever the size of the population.
+
+    Args:
+        config (PopulationConfig): Shape of the population.
+        output_dir (str): Folder for the chunks and their manifest.
+        sar_trxns (pd.DataFrame, optional): Trxns to inject, see prepare_sar_trxns.
+
+    Returns:
+        dict: The manifest with the number of rows, benign and SAR rows, and the chunks written.
+    """
+    writer = ChunkWriter(output_dir, config.output_format,
+                         metadata={"population_config": asdict(config), "label_column": LABEL_COLUMN})
+    sar_df = prepare_sar_trxns(sar_trxns) if sar_trxns is not None and len(sar_trxns) else None
+    sar_chunk = _sar_chunks(sar_df, config.n_chunks) if sar_df is not None else None
+
+    next_trxn_id, n_sar = 1, 0
+    for chunk_index in range(config.n_chunks):
+        chunk = simulate_chunk(config, chunk_index, next_trxn_id)
+        next_trxn_id += len(chunk)
+        if sar_df is not None and (sar_chunk == chunk_index).any():
+            injected = sar_df[sar_chunk == chunk_index].copy()
+            injected.insert(0, "Transaction_ID", np.arange(next_trxn_id, next_trxn_id + len(injected)))
+            next_trxn_id += len(injected)
+            n_sar += len(injected)
+            chunk = _append_rows(chunk, injected)
+            chunk = chunk.iloc[np.argsort(chunk["Trxn_Date"].to_numpy(), kind="stable")].reset_index(drop=True)
+        writer.write(chunk)
+
+    writer.metadata.update({"sar_rows": n_sar, "benign_rows": next_trxn_id - 1 - n_sar})
+    manifest = writer.close()
+    logger.info(f"Simulated {manifest['benign_rows']} benign and {n_sar} SAR trxns in {len(manifest['chunks'])} chunks")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate a background population and inject SAR transactions.")
+    parser.add_argument("--config", default="configs/agents_config.yaml", help="Config file with a simulator section")
+    parser.add_argument("--sar-trxns", nargs="*", default=[], help="CSV files written by run_agentic_workflow2")
+    parser.add_argument("--output", default="./data/population", help="Output folder")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sar_frames = [pd.read_csv(path, dtype={"Originator_Account_ID": str, "Beneficiary_Account_ID": str})
+                  .assign(**{SAR_ID_COLUMN: path}) for path in args.sar_trxns]
+    simulate_population(PopulationConfig.from_config(args.config), args.output,
+                        pd.concat(sar_frames, ignore_index=True) if sar_frames else None)
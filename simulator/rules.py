@@ -0,0 +1,236 @@
+import argparse
+import logging
+import time
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from simulator.windows import TransactionArrays, load_transactions, window_keys, window_sums, distinct_in_window
+from utils import load_config
+
+logger = logging.getLogger(__name__)
+
+# Transaction monitoring rules backtested against a population with injected SAR trxns. Rolling windows use the
+# sort-once primitives of simulator/windows.py, so there are no per-account Python loops.
+
+RULE_KINDS = ["structuring", "rapid_movement", "fan_in", "fan_out", "round_amounts"]
+
+
+@dataclass
+class Rule:
+    """
+    A declarative monitoring rule. Read from the `backtesting.rules` list of the config file.
+
+    :param name: Name reported with the alerts.
+    :param kind: One of RULE_KINDS.
+        structuring: at least min_count trxns just below threshold (within band) into an account, summing to at
+            least min_amount, within window_days.
+        rapid_movement: cash in of at least min_amount followed by wires out of at least ratio times the cash in,
+            within window_days.
+        fan_in / fan_out: at least min_counterparties distinct senders to / receivers from an account within
+            window_days.
+        round_amounts: at least min_count trxns of at least min_amount that are multiples of unit within window_days.
+    :param window_days: Length of the rolling window in days, including the day of the alert.
+    :param channels: Channels the rule looks at. Defaults depend on the kind.
+    """
+    name: str
+    kind: str
+    window_days: int = 7
+    channels: Optional[List[str]] = None
+    min_count: int = 3
+    min_amount: float = 10000.0
+    threshold: float = 10000.0
+    band: float = 0.1
+    min_counterparties: int = 5
+    ratio: float = 0.8
+    unit: float = 1000.0
+
+    def __post_init__(self):
+        if self.kind not in RULE_KINDS:
+            raise ValueError(f"Rule '{self.name}' has unknown kind '{self.kind}'. Expected one of {RULE_KINDS}")
+        if self.channels is None:
+            self.channels = {"structuring": ["Cash"], "rapid_movement": ["Cash", "Wire"],
+                             "fan_in": ["Wire", "Check"], "fan_out": ["Wire", "Check"],
+                             "round_amounts": ["Cash", "Wire", "Check"]}[self.kind]
+
+    @property
+    def sides(self) -> List[str]:
+        """
+        Sides of a trxn ("originator", "beneficiary") whose account the alerts of this rule are raised on
+        """
+        return {"structuring": ["beneficiary"], "rapid_movement": ["originator", "beneficiary"],
+                "fan_in": ["beneficiary"], "fan_out": ["originator"], "round_amounts": ["originator"]}[self.kind]
+
+
+DEFAULT_RULES = [
+    Rule(name="Cash structuring", kind="structuring", window_days=7, min_count=3, min_amount=10000),
+    Rule(name="Rapid cash in, wire out", kind="rapid_movement", window_days=10, min_amount=20000, ratio=0.8),
+    Rule(name="Fan in", kind="fan_in", window_days=30, min_counterparties=8),
+    Rule(name="Fan out", kind="fan_out", window_days=30, min_counterparties=8),
+    Rule(name="Round amounts", kind="round_amounts", window_days=30, min_count=4, min_amount=5000, unit=1000),
+]
+
+
+def load_rules(config_file: str) -> List[Rule]:
+    """
+    Rules of the `backtesting.rules` section of the config file, or DEFAULT_RULES if there are none
+    """
+    configs = (load_config(config_file).get("backtesting", {}) or {}).get("rules") or []
+    known = {f.name for f in fields(Rule)}
+    return [Rule(**{k: v for k, v in config.items() if k in known}) for config in configs] or list(DEFAULT_RULES)
+
+
+def _alert_frame(rule: Rule, trxns: TransactionArrays, account: np.ndarray, day: np.ndarray,
+                 value: np.ndarray) -> pd.DataFrame:
+    alerts = pd.DataFrame({"account": account, "day": day, "value": value}).drop_duplicates(["account", "day"])
+    return pd.DataFrame({
+        "Rule": rule.name,
+        "Account_ID": trxns.accounts.to_numpy()[alerts["account"].to_numpy()],
+        "Window_Start": trxns.start_date + (alerts["day"].to_numpy() - rule.window_days + 1).astype("timedelta64[D]"),
+        "Alert_Date": trxns.start_date + alerts["day"].to_numpy().astype("timedelta64[D]"),
+        "Value": alerts["value"].to_numpy(),
+        "_account": alerts["account"].to_numpy(),
+        "_day": alerts["day"].to_numpy(),
+    })
+
+
+def evaluate_rule(rule: Rule, trxns: TransactionArrays) -> pd.DataFrame:
+    """
+    Run one rule over all trxns.
+
+    Returns:
+        pd.DataFrame: One alert per (account, day) the rule fires on, with the window it covers and the aggregate
+        that triggered it (count, sum or number of counterparties).
+    """
+    span = int(trxns.day.max()) + rule.window_days + 1 if len(trxns) else 1
+    in_channels = trxns.channel_mask(rule.channels)
+
+    if rule.kind in ("structuring", "round_amounts"):
+        if rule.kind == "structuring":
+            selected = in_channels & (trxns.amount >= rule.threshold * (1 - rule.band)) & (trxns.amount < rule.threshold)
+            account = trxns.beneficiary[selected]
+        else:
+            amount = trxns.amount
+            selected = in_channels & (amount >= rule.min_amount) & np.isclose(np.mod(amount, rule.unit), 0)
+            account = trxns.originator[selected]
+        day, amount = trxns.day[selected], trxns.amount[selected]
+        order = np.argsort(window_keys(account, day, span), kind="stable")
+        account, day, amount = account[order], day[order], amount[order]
+        keys = window_keys(account, day, span)
+        counts = window_sums(keys, np.ones(len(keys)), keys, rule.window_days)
+        fires = counts >= rule.min_count
+        if rule.kind == "structuring":
+            fires &= window_sums(keys, amount, keys, rule.window_days) >= rule.min_amount
+        return _alert_frame(rule, trxns, account[fires], day[fires], counts[fires])
+
+    if rule.kind in ("fan_in", "fan_out"):
+        selected = in_channels & (trxns.originator != trxns.beneficiary)
+        account, counterparty = ((trxns.beneficiary, trxns.originator) if rule.kind == "fan_in"
+                                 else (trxns.originator, trxns.beneficiary))
+        account, counterparty, day = account[selected], counterparty[selected], trxns.day[selected]
+        keys = window_keys(account, day, span)
+        distinct = distinct_in_window(account, counterparty, day, keys, rule.window_days, span)
+        fires = distinct >= rule.min_counterparties
+        return _alert_frame(rule, trxns, account[fires], day[fires], distinct[fires])
+
+    # rapid_movement: cash in to an account followed by wires out of it
+    cash_in = in_channels & trxns.channel_mask(["Cash"])
+    wire_out = in_channels & trxns.channel_mask(["Wire"])
+    account = np.concatenate([trxns.beneficiary[cash_in], trxns.originator[wire_out]])
+    day = np.concatenate([trxns.day[cash_in], trxns.day[wire_out]])
+    is_wire = np.concatenate([np.zeros(cash_in.sum(), dtype=bool), np.ones(wire_out.sum(), dtype=bool)])
+    amount = np.concatenate([trxns.amount[cash_in], trxns.amount[wire_out]])
+    keys = window_keys(account, day, span)
+    order = np.argsort(keys, kind="stable")
+    keys, account, day, is_wire, amount = keys[order], account[order], day[order], is_wire[order], amount[order]
+    wire_keys = keys[is_wire]
+    cash_in_sum = window_sums(keys, np.where(is_wire, 0.0, amount), wire_keys, rule.window_days)
+    wire_out_sum = window_sums(keys, np.where(is_wire, amount, 0.0), wire_keys, rule.window_days)
+    fires = (cash_in_sum >= rule.min_amount) & (wire_out_sum >= rule.ratio * cash_in_sum)
+    return _alert_frame(rule, trxns, account[is_wire][fires], day[is_wire][fires], wire_out_sum[fires])
+
+
+def _detected(rule: Rule, alerts: pd.DataFrame, trxns: TransactionArrays, rows: np.ndarray, span: int) -> np.ndarray:
+    # A trxn is detected if an alert on one of its accounts covers its day
+    alert_keys = np.sort(window_keys(alerts["_account"].to_numpy(), alerts["_day"].to_numpy(), span))
+    detected = np.zeros(len(rows), dtype=bool)
+    for side in rule.sides:
+        account = (trxns.originator if side == "originator" else trxns.beneficiary)[rows]
+        keys = window_keys(account, trxns.day[rows], span)
+        detected |= (np.searchsorted(alert_keys, keys + rule.window_days - 1, side="right") -
+                     np.searchsorted(alert_keys, keys, side="left")) > 0
+    return detected
+
+
+def detection_report(rules: List[Rule], alerts: pd.DataFrame, trxns: TransactionArrays) -> pd.DataFrame:
+    """
+    Per rule (and for all rules together): number of alerts, alerts on SAR accounts, and recall of the SAR trxns and
+    of the SARs (a SAR counts as detected if any of its trxns is).
+    """
+    sar_rows = np.flatnonzero(trxns.is_sar)
+    sar_accounts = np.union1d(trxns.originator[sar_rows], trxns.beneficiary[sar_rows])
+    span = int(trxns.day.max()) + max([rule.window_days for rule in rules] + [1]) + 1 if len(trxns) else 1
+    n_sars = len(np.unique(trxns.sar_id[sar_rows]))
+    report, detected_any = [], np.zeros(len(sar_rows), dtype=bool)
+    for rule in rules:
+        rule_alerts = alerts[alerts["Rule"] == rule.name]
+        detected = _detected(rule, rule_alerts, trxns, sar_rows, span)
+        detected_any |= detected
+        report.append(_report_row(rule.name, rule_alerts, sar_accounts, detected, trxns.sar_id[sar_rows], n_sars))
+    report.append(_report_row("All rules", alerts, sar_accounts, detected_any, trxns.sar_id[sar_rows], n_sars))
+    return pd.DataFrame(report)
+
+
+def _report_row(name: str, alerts: pd.DataFrame, sar_accounts: np.ndarray, detected: np.ndarray,
+                sar_ids: np.ndarray, n_sars: int) -> Dict[str, Any]:
+    n_sar_alerts = int(np.isin(alerts["_account"].to_numpy(), sar_accounts).sum())
+    detected_sars = len(np.unique(sar_ids[detected]))
+    return {"Rule": name, "Alerts": len(alerts), "Alerts_on_SAR_Accounts": n_sar_alerts,
+            "Alert_Precision": n_sar_alerts / len(alerts) if len(alerts) else 0.0,
+            "SAR_Trxns": len(detected), "Detected_SAR_Trxns": int(detected.sum()),
+            "Trxn_Recall": detected.mean() if len(detected) else 0.0,
+            "SARs": n_sars, "Detected_SARs": detected_sars,
+            "SAR_Recall": detected_sars / n_sars if n_sars else 0.0}
+
+
+def backtest(source: Union[str, pd.DataFrame, Iterable[pd.DataFrame]],
+             rules: Optional[List[Rule]] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Run the monitoring rules over a population (or any trxns with the generate_transactions columns) and measure
+    how many of the SAR trxns they catch.
+
+    Args:
+        source: See load_transactions.
+        rules (list of Rule, optional): Rules to run. Defaults to DEFAULT_RULES.
+
+    Returns:
+        tuple: (alerts, report). alerts has one row per rule, account and alert date; report is detection_report.
+    """
+    rules = rules if rules is not None else list(DEFAULT_RULES)
+    start = time.perf_counter()
+    trxns = load_transactions(source)
+    logger.info(f"Loaded {len(trxns)} trxns ({int(trxns.is_sar.sum())} SAR) in {time.perf_counter() - start:.1f}s")
+
+    frames = []
+    for rule in rules:
+        rule_start = time.perf_counter()
+        frames.append(evaluate_rule(rule, trxns))
+        logger.info(f"Rule '{rule.name}' raised {len(frames[-1])} alerts in {time.perf_counter() - rule_start:.1f}s")
+    alerts = pd.concat(frames, ignore_index=True)
+    report = detection_report(rules, alerts, trxns)
+    return alerts.drop(columns=["_account", "_day"]), report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest monitoring rules on a simulated population.")
+    parser.add_argument("--config", default="configs/agents_config.yaml", help="Config file with a backtesting section")
+    parser.add_argument("--population", default="./data/population", help="Folder written by simulator.population")
+    parser.add_argument("--alerts", default=None, help="Optional CSV file for the alerts")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    alerts, report = backtest(args.population, load_rules(args.config))
+    if args.alerts:
+        alerts.to_csv(args.alerts, index=False)
+    print(report.to_string(index=False))
@@ -0,0 +1,324 @@
+import unittest
+import asyncio
+import json
+import logging
+import httpx
+import openai
+import pandas as pd
+from types import SimpleNamespace
+from unittest.mock import patch
+from agents.agents import FunctionCallingAgent, RouterAgent
+from agents.agent_utils import aroute_and_execute, build_generation_context, route, route_batch, aroute_batch
+from agents.cache import LLMResponseCache
+from agents.tools import call_seed
+
+
+logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class _FakeAsyncCompletions:
+    '''
+    Stand-in for client.chat.completions that returns a canned function_call message
+    '''
+    def __init__(self, name, arguments):
+        self.name = name
+        self.arguments = arguments
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        msg = SimpleNamespace(function_call=SimpleNamespace(name=self.name, arguments=self.arguments), content=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=msg)])
+
+
+class _FakeToolCallCompletions:
+    '''
+    Stand-in for client.chat.completions that returns canned parallel tool calls
+    '''
+    def __init__(self, name, arguments_list):
+        self.name = name
+        self.arguments_list = arguments_list
+        self.calls = []
+
+    def _message(self):
+        tool_calls = [SimpleNamespace(id=f"call_{i}", type="function",
+                                      function=SimpleNamespace(name=self.name, arguments=arguments))
+                      for i, arguments in enumerate(self.arguments_list)]
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(tool_calls=tool_calls,
+                                                                                function_call=None, content=None))])
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return self._message()
+
+
+class _FakeAsyncToolCallCompletions(_FakeToolCallCompletions):
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return self._message()
+
+
+class _FakeRouterCompletions:
+    '''
+    Stand-in for client.chat.completions that answers choose_agents with one agent per narrative, a canned reply
+    or an error
+    '''
+    def __init__(self, agent, agents=None, arguments=None, error=None):
+        self.agent = agent
+        self.agents = agents
+        self.arguments = arguments
+        self.error = error
+        self.calls = []
+
+    def _message(self, kwargs):
+        if self.error is not None:
+            raise self.error
+        n = kwargs["functions"][0]["parameters"]["properties"]["agents"]["minItems"]
+        arguments = self.arguments if self.arguments is not None else \
+            json.dumps({"agents": self.agents if self.agents is not None else [self.agent] * n})
+        msg = SimpleNamespace(function_call=SimpleNamespace(name="choose_agents", arguments=arguments), content=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=msg)])
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return self._message(kwargs)
+
+
+class _FakeAsyncRouterCompletions(_FakeRouterCompletions):
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return self._message(kwargs)
+
+
+class _FakeAgent:
+    '''
+    Agent exposing only the async reply interface used by aroute_and_execute
+    '''
+    def __init__(self, reply):
+        self.reply = reply
+        self.messages = []
+
+    async def agenerate_reply(self, user_message):
+        self.messages.append(user_message)
+        await asyncio.sleep(0)
+        return self.reply
+
+
+class TestAsyncRouteAndExecute(unittest.IsolatedAsyncioTestCase):
+    '''
+    Tests for the asyncio-native workflow 2 helpers
+    '''
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+        self.narrative = {"Entities": {}, "Account_IDs": ["345723"], "Acct_to_FI": {}, "Acct_to_Cust": {},
+                          "FI_to_Acct_to_Cust": {},
+                          "Narratives": {"345723": {"Trxn_Set_1": "John deposited $5000 in Cash on Jan 1, 2025"}}}
+
+    async def test_routes_to_chosen_agent(self):
+        trxn = {"1": {"Trxn_Amount": 5000}}
+        agents = {"Router_Agent": _FakeAgent("Transaction_Generation_Agent"),
+                  "Transaction_Generation_Agent": _FakeAgent(trxn)}
+        result = await aroute_and_execute(agents, self.narrative)
+        self.assertEqual(result, trxn)
+        self.assertEqual(len(agents["Router_Agent"].messages), 1)
+
+    async def test_invalid_json_returns_empty_dict(self):
+        agents = {"Router_Agent": _FakeAgent("Transaction_Generation_Agent"),
+                  "Transaction_Generation_Agent": _FakeAgent("not json")}
+        result = await aroute_and_execute(agents, self.narrative)
+        self.assertEqual(result, {})
+
+    async def test_agenerate_reply_executes_function_call(self):
+        completions = _FakeAsyncCompletions("add", '{"a": 1, "b": 2}')
+        client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        agent = FunctionCallingAgent(name="Adder", system_message="add", llm_config={"model": "gpt-4.1-mini"},
+                                     function_schemas=[{"name": "add"}], function_map={"add": lambda a, b: a + b})
+        with patch("agents.agents.get_async_openai_client", return_value=client):
+            result = await agent.agenerate_reply([{"role": "user", "content": "1+2"}])
+        self.assertEqual(result, 3)
+        self.assertEqual(completions.calls[0]["function_call"], {"name": "add"})
+
+
+    async def test_seed_is_passed_to_tool(self):
+        completions = _FakeAsyncCompletions("echo_seed", '{"a": 1}')
+        client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        tool_agent = FunctionCallingAgent(name="Transaction_Generation_Agent_w_Tool", system_message="generate",
+                                          llm_config={"model": "gpt-4.1-mini"}, function_schemas=[{"name": "echo_seed"}],
+                                          function_map={"echo_seed": lambda a, seed=None: {"1": {"seed": seed}}})
+        agents = {"Router_Agent": _FakeAgent("Transaction_Generation_Agent_w_Tool"),
+                  "Transaction_Generation_Agent_w_Tool": tool_agent}
+        with patch("agents.agents.get_async_openai_client", return_value=client):
+            result = await aroute_and_execute(agents, self.narrative, seed=1234)
+        self.assertEqual(result, {"1": {"seed": 1234}})
+        self.assertNotIn("seed", completions.calls[0])
+
+    async def test_function_call_is_reported(self):
+        completions = _FakeAsyncCompletions("add", '{"a": 1, "b": 2}')
+        client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        tool_agent = FunctionCallingAgent(name="Transaction_Generation_Agent_w_Tool", system_message="add",
+                                          llm_config={"model": "gpt-4.1-mini"}, function_schemas=[{"name": "add"}],
+                                          function_map={"add": lambda a, b: {"1": {"sum": a + b}}})
+        agents = {"Router_Agent": _FakeAgent("Transaction_Generation_Agent_w_Tool"),
+                  "Transaction_Generation_Agent_w_Tool": tool_agent}
+        calls = []
+        with patch("agents.agents.get_async_openai_client", return_value=client):
+            await aroute_and_execute(agents, self.narrative,
+                                     on_function_call=lambda name, args: calls.append((name, args)))
+        self.assertEqual(calls, [("add", {"a": 1, "b": 2})])
+
+
+class TestParallelToolCalls(unittest.IsolatedAsyncioTestCase):
+    '''
+    Tests for several tool calls in one reply of a FunctionCallingAgent
+    '''
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+        arguments = ['{"Beneficiary_Account_ID": "111"}', '{"Beneficiary_Account_ID": "222"}',
+                     '{"Beneficiary_Account_ID": "333"}']
+        self.completions = _FakeToolCallCompletions("generate", arguments)
+        self.async_completions = _FakeAsyncToolCallCompletions("generate", arguments)
+
+        def generate(Beneficiary_Account_ID, seed=None):
+            return pd.DataFrame({"Beneficiary_Account_ID": [Beneficiary_Account_ID] * 2, "seed": [seed] * 2})
+
+        self.agent = FunctionCallingAgent(name="Transaction_Generation_Agent_w_Tool", system_message="generate",
+                                          llm_config={"model": "gpt-4.1-mini", "parallel_tool_calls": True},
+                                          function_schemas=[{"name": "generate"}],
+                                          function_map={"generate": generate})
+
+    def _check(self, result, request, calls):
+        self.assertEqual(request["tools"], [{"type": "function", "function": {"name": "generate"}}])
+        self.assertTrue(request["parallel_tool_calls"])
+        self.assertNotIn("functions", request)
+        self.assertEqual(list(result["Beneficiary_Account_ID"]), ["111", "111", "222", "222", "333", "333"])
+        # The first call keeps the seed, so single-call replies are unchanged
+        self.assertEqual(list(result["seed"].unique()), [call_seed(7, i) for i in range(3)])
+        self.assertEqual(result["seed"].iloc[0], 7)
+        self.assertEqual([args["Beneficiary_Account_ID"] for _, args in calls], ["111", "222", "333"])
+
+    def test_generate_reply_runs_every_call(self):
+        calls = []
+        with patch("agents.agents.get_openai_client",
+                   return_value=SimpleNamespace(chat=SimpleNamespace(completions=self.completions))):
+            result = self.agent.generate_reply([{"role": "user", "content": "fan out"}], tool_kwargs={"seed": 7},
+                                               on_function_call=lambda name, args: calls.append((name, args)))
+        self._check(result, self.completions.calls[0], calls)
+
+    async def test_agenerate_reply_runs_every_call(self):
+        calls = []
+        with patch("agents.agents.get_async_openai_client",
+                   return_value=SimpleNamespace(chat=SimpleNamespace(completions=self.async_completions))):
+            result = await self.agent.agenerate_reply([{"role": "user", "content": "fan out"}],
+                                                      tool_kwargs={"seed": 7},
+                                                      on_function_call=lambda name, args: calls.append((name, args)))
+        self._check(result, self.async_completions.calls[0], calls)
+
+
+class TestBatchRouting(unittest.IsolatedAsyncioTestCase):
+    '''
+    Tests for routing all sub-narratives with one Router_Agent call
+    '''
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+        generation_agents = {name: SimpleNamespace(name=name, description=f"{name} agent")
+                             for name in ["Transaction_Generation_Agent", "Transaction_Generation_Agent_w_Tool"]}
+        self.router = RouterAgent(agents=generation_agents, name="Router_Agent", llm_config={"model": "gpt-4.1-mini"},
+                                  human_input_mode="NEVER", code_execution_config=None, description="router",
+                                  cache=LLMResponseCache(directory=None))
+        self.agents = {"Router_Agent": self.router, **generation_agents}
+        self.narratives = [{"Narratives": {acct: {"Trxn_Set_1": text}}}
+                           for acct, text in [("111", "Cash deposits"), ("222", "Wires to 333"), ("111", "Cash deposits")]]
+
+    def test_one_request_and_cached_per_narrative(self):
+        completions = _FakeRouterCompletions("Transaction_Generation_Agent_w_Tool")
+        with patch("agents.agents.get_openai_client",
+                   return_value=SimpleNamespace(chat=SimpleNamespace(completions=completions))):
+            chosen = route_batch(self.agents, self.narratives)
+            self.assertEqual(chosen, ["Transaction_Generation_Agent_w_Tool"] * 3)
+            # The repeated narrative is sent once
+            self.assertEqual(len(completions.calls), 1)
+            request = completions.calls[0]
+            self.assertEqual(request["function_call"], {"name": "choose_agents"})
+            self.assertEqual(request["functions"][0]["parameters"]["properties"]["agents"]["items"]["enum"],
+                             ["Transaction_Generation_Agent", "Transaction_Generation_Agent_w_Tool"])
+            self.assertEqual(request["messages"][-1]["content"].count("Narrative "), 2)
+
+            # Only the narrative not routed before is sent, and single routing hits the same cache
+            new = {"Narratives": {"333": {"Trxn_Set_1": "Checks"}}}
+            route_batch(self.agents, [self.narratives[0], new])
+            self.assertEqual(completions.calls[1]["messages"][-1]["content"].count("Narrative "), 1)
+            self.assertEqual(route(self.agents, self.narratives[1]), "Transaction_Generation_Agent_w_Tool")
+            self.assertEqual(len(completions.calls), 2)
+
+    async def test_invalid_reply_falls_back_to_single_routing(self):
+        request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+        replies = [{"agents": ["Transaction_Generation_Agent"]},
+                   {"agents": ["Transaction_Generation_Agent", "Unknown_Agent"]},
+                   {"agents": [{"agent": "Transaction_Generation_Agent"}, "Transaction_Generation_Agent"]},
+                   {"arguments": "not json"}, {"arguments": '["Transaction_Generation_Agent"]'}, {"arguments": 1},
+                   {"error": openai.APIConnectionError(request=request)}]
+        for reply in replies:
+            completions = _FakeAsyncRouterCompletions(None, **reply)
+            with patch("agents.agents.get_async_openai_client",
+                       return_value=SimpleNamespace(chat=SimpleNamespace(completions=completions))):
+                self.assertEqual(await aroute_batch(self.agents, self.narratives), [None] * 3)
+        # Nothing was cached from the invalid replies
+        completions = _FakeAsyncRouterCompletions("Transaction_Generation_Agent")
+        with patch("agents.agents.get_async_openai_client",
+                   return_value=SimpleNamespace(chat=SimpleNamespace(completions=completions))):
+            self.assertEqual(await aroute_batch(self.agents, self.narratives), ["Transaction_Generation_Agent"] * 3)
+        self.assertEqual(completions.calls[0]["messages"][-1]["content"].count("Narrative "), 2)
+        # Agents without batch routing are routed one by one in route_and_execute
+        self.assertEqual(route_batch({"Router_Agent": _FakeAgent("Transaction_Generation_Agent")}, self.narratives),
+                         [None] * 3)
+
+
+class TestGenerationContext(unittest.TestCase):
+    '''
+    Tests for pruning the workflow 2 prompt to the entities a trxn set references
+    '''
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+        self.narrative = {
+            "Entities": {"Individuals": ["John", "Jill", "Paul"], "Organizations": ["Acme Inc."],
+                         "Financial_Institutions": ["Bank of America", "Chase Bank", "Artsy Bank"]},
+            "Account_IDs": ["345723", "98765", "55555", "77777"],
+            "Acct_to_FI": {"345723": "Bank of America", "98765": "Bank of America", "55555": "Chase Bank"},
+            "Acct_to_Cust": {"345723": "John", "98765": "Acme Inc.", "55555": "Jill", "77777": "Paul"},
+            "FI_to_Acct_to_Cust": {"Bank of America": {"345723": "CUST_001", "98765": "CUST_002"},
+                                   "Chase Bank": {"55555": "CUST_003"},
+                                   "Dummy_Bank_1": {"Dummy_Acct_1": "Dummy_Customer_1"}},
+            "Narratives": {"345723": {"Trxn_Set_1": "John sent 3 wires totaling $30,000 to acme inc, and checks to "
+                                                    "Dummy_Acct_1 at Artsy Bank"}}}
+
+    def test_keeps_referenced_and_adjacent_entities(self):
+        context = build_generation_context(self.narrative)
+        self.assertEqual(context["Account_IDs"], ["345723", "98765"])
+        self.assertEqual(context["Acct_to_FI"], {"345723": "Bank of America", "98765": "Bank of America"})
+        self.assertEqual(context["Acct_to_Cust"], {"345723": "John", "98765": "Acme Inc."})
+        self.assertEqual(context["FI_to_Acct_to_Cust"],
+                         {"Bank of America": {"345723": "CUST_001", "98765": "CUST_002"},
+                          "Dummy_Bank_1": {"Dummy_Acct_1": "Dummy_Customer_1"}})
+        self.assertEqual(context["Entities"], {"Individuals": ["John"], "Organizations": ["Acme Inc."],
+                                               "Financial_Institutions": ["Bank of America", "Artsy Bank"]})
+        self.assertEqual(context["Narratives"], self.narrative["Narratives"])
+
+    async def _generation_message(self):
+        agents = {"Router_Agent": _FakeAgent("Transaction_Generation_Agent"),
+                  "Transaction_Generation_Agent": _FakeAgent({})}
+        await aroute_and_execute(agents, self.narrative)
+        return agents["Transaction_Generation_Agent"].messages[0][0]["content"]
+
+    def test_generation_message_is_compact(self):
+        content = asyncio.run(self._generation_message())
+        self.assertEqual(json.loads(content), build_generation_context(self.narrative))
+        self.assertNotIn("\n", content)
+        self.assertNotIn("Jill", content)
+
+
+if __name__ == '__main__':
+    unittest.main()
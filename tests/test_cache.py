@@ -0,0 +1,85 @@
+import unittest
+import logging
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from agents.cache import LLMResponseCache, make_cache_key, message_from_cache_value, message_to_cache_value
+from agents.agents import FunctionCallingAgent
+
+
+logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class TestLLMResponseCache(unittest.TestCase):
+    '''
+    Tests for the two-tier LLM response cache
+    '''
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.api_kwargs = {"model": "gpt-4.1-mini", "temperature": 0,
+                           "messages": [{"role": "user", "content": "hello"}],
+                           "functions": [{"name": "choose_agent"}], "function_call": {"name": "choose_agent"}}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_key_depends_on_request_content(self):
+        changed = dict(self.api_kwargs, messages=[{"role": "user", "content": "bye"}])
+        self.assertEqual(make_cache_key(self.api_kwargs), make_cache_key(dict(self.api_kwargs)))
+        self.assertNotEqual(make_cache_key(self.api_kwargs), make_cache_key(changed))
+
+    def test_tool_calls(self):
+        tools = dict(self.api_kwargs, tools=[{"type": "function", "function": {"name": "choose_agent"}}],
+                     tool_choice="required", parallel_tool_calls=True)
+        self.assertNotEqual(make_cache_key(self.api_kwargs), make_cache_key(tools))
+        self.assertEqual(make_cache_key(self.api_kwargs), make_cache_key(dict(self.api_kwargs, tools=None)))
+        msg = SimpleNamespace(content=None, function_call=None, tool_calls=[
+            SimpleNamespace(id=f"call_{i}", function=SimpleNamespace(name="choose_agent", arguments=f'{{"agent": "{a}"}}'))
+            for i, a in enumerate("AB")])
+        replayed = message_from_cache_value(message_to_cache_value(msg))
+        self.assertEqual([(call.function.name, call.function.arguments) for call in replayed.tool_calls],
+                         [("choose_agent", '{"agent": "A"}'), ("choose_agent", '{"agent": "B"}')])
+
+    def test_lru_eviction_and_disk_promotion(self):
+        cache = LLMResponseCache(directory=self.tmp_dir.name, max_memory_entries=1)
+        cache.set("a", {"content": "A"})
+        cache.set("b", {"content": "B"})
+        self.assertEqual(cache.stats["evictions"], 1)
+        # "a" was evicted from memory but is still on disk
+        self.assertEqual(cache.get("a"), {"content": "A"})
+        self.assertEqual(cache.stats["disk_hits"], 1)
+        self.assertEqual(cache.get("a"), {"content": "A"})
+        self.assertEqual(cache.stats["memory_hits"], 1)
+        self.assertIsNone(cache.get("missing"))
+        self.assertEqual(cache.stats["misses"], 1)
+        cache.close()
+
+    def test_ttl_expiry(self):
+        cache = LLMResponseCache(directory=None, ttl=0.01)
+        cache.set("a", {"content": "A"})
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("a"))
+
+    def test_agent_reuses_cached_reply(self):
+        cache = LLMResponseCache(directory=self.tmp_dir.name)
+        msg = SimpleNamespace(function_call=SimpleNamespace(name="choose_agent", arguments='{"agent": "A"}'), content=None)
+        resp = SimpleNamespace(choices=[SimpleNamespace(message=msg)])
+        agent = FunctionCallingAgent(name="Router", system_message="route", llm_config={"model": "gpt-4.1-mini"},
+                                     function_schemas=[{"name": "choose_agent"}],
+                                     function_map={"choose_agent": lambda agent: agent}, cache=cache)
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=MagicMock(return_value=resp))))
+        create = client.chat.completions.create
+        with patch("agents.agents.get_openai_client", return_value=client):
+            first = agent.generate_reply([{"role": "user", "content": "narrative"}])
+            second = agent.generate_reply([{"role": "user", "content": "narrative"}])
+        self.assertEqual(first, "A")
+        self.assertEqual(second, "A")
+        self.assertEqual(create.call_count, 1)
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
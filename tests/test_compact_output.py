@@ -0,0 +1,66 @@
+import unittest
+import json
+import logging
+from agents.compact_output import expand_compact_trxns, to_compact_trxns
+from agents.agent_utils import _parse_trxns
+from utils import convert_dict_to_df
+
+
+logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class TestCompactOutput(unittest.TestCase):
+    '''
+    Tests for the compact output protocol of the Transaction_Generation_Agent
+    '''
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+        self.compact = {"Shared": {"Originator_Name": "John", "Originator_Account_ID": "345723",
+                                   "Originator_Customer_ID": "CUST_001", "Beneficiary_Name": "Acme Inc",
+                                   "Beneficiary_Account_ID": "98765", "Beneficiary_Customer_ID": "CUST_002",
+                                   "Branch_or_ATM_Location": ""},
+                        "Header": "Trxn_Channel|Trxn_Date|Trxn_Amount",
+                        "Rows": ["Wire|2024-01-01|3000", "Wire|2024-01-08|7000.50", "Check|2024-01-05|4000"]}
+
+    def test_expand(self):
+        trxns = expand_compact_trxns(self.compact)
+        self.assertEqual(list(trxns), ["1", "2", "3"])
+        self.assertEqual(trxns["2"]["Trxn_Amount"], 7000.5)
+        self.assertEqual(trxns["3"]["Trxn_Channel"], "Check")
+        self.assertEqual(trxns["3"]["Beneficiary_Name"], "Acme Inc")
+        df = convert_dict_to_df(1, trxns)
+        self.assertEqual(list(df.columns)[:3], ["Originator_Name", "Originator_Account_ID", "Originator_Customer_ID"])
+        self.assertEqual(len(df), 3)
+        self.assertEqual(expand_compact_trxns(to_compact_trxns(trxns)), trxns)
+        # The agent reply is expanded, and replies in the older one-object-per-trxn format still pass through
+        self.assertEqual(_parse_trxns(json.dumps(self.compact)), trxns)
+        self.assertEqual(_parse_trxns(json.dumps(trxns)), trxns)
+
+    def test_missing_dates_and_amounts(self):
+        undated = {**self.compact, "Shared": {**self.compact["Shared"], "Trxn_Date": ""},
+                   "Header": "Trxn_Channel|Trxn_Amount", "Rows": ["Wire|3000", "Check|"]}
+        trxns = expand_compact_trxns(undated)
+        self.assertEqual([trxn["Trxn_Date"] for trxn in trxns.values()], ["", ""])
+        self.assertEqual([trxn["Trxn_Amount"] for trxn in trxns.values()], [3000.0, ""])
+        self.assertEqual(_parse_trxns(json.dumps(undated)), trxns)
+        self.assertEqual(len(convert_dict_to_df(1, trxns)), 2)
+
+    def test_strict_validation(self):
+        invalid = [
+            {**self.compact, "Rows": ["Wire|2024-01-01"]},
+            {**self.compact, "Rows": ["Wire|01/01/2024|3000"]},
+            {**self.compact, "Rows": ["Wire|2024-01-01|$3,000"]},
+            {**self.compact, "Header": "Trxn_Channel|Trxn_Date|Trxn_Amount|Branch_or_ATM_Location"},
+            {**self.compact, "Header": "Trxn_Date|Trxn_Amount"},
+            {**self.compact, "Header": "Trxn_Channel|Trxn_Date|Amount"},
+            {**self.compact, "Extra": 1},
+        ]
+        for payload in invalid:
+            with self.assertRaises(ValueError):
+                expand_compact_trxns(payload)
+            self.assertEqual(_parse_trxns(json.dumps(payload)), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
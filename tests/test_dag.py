@@ -0,0 +1,51 @@
+import unittest
+import logging
+import time
+from agents.dag import Stage, run_stages
+
+
+logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class TestRunStages(unittest.TestCase):
+    '''
+    Tests for the DAG stage runner used by workflow 1
+    '''
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+
+    def test_outputs_flow_between_stages(self):
+        stages = [Stage("double", lambda x: 2 * x, ["x"]),
+                  Stage("add", lambda x, double: x + double, ["x", "double"])]
+        outputs, timings = run_stages(stages, {"x": 3})
+        self.assertEqual(outputs, {"double": 6, "add": 9})
+        self.assertEqual(set(timings), {"double", "add", "total"})
+        self.assertGreaterEqual(timings["add"]["start"], timings["double"]["end"])
+
+    def test_independent_stages_run_concurrently(self):
+        def slow(x):
+            time.sleep(0.2)
+            return x
+        stages = [Stage("root", lambda x: x, ["x"]),
+                  Stage("left", lambda root: slow(root), ["root"]),
+                  Stage("right", lambda root: slow(root), ["root"])]
+        _, timings = run_stages(stages, {"x": 1})
+        self.assertLess(timings["total"]["seconds"], 0.35)
+        self.assertLess(timings["right"]["start"], timings["left"]["end"])
+
+    def test_invalid_graphs_are_rejected(self):
+        with self.assertRaises(ValueError):
+            run_stages([Stage("a", lambda missing: missing, ["missing"])], {})
+        with self.assertRaises(ValueError):
+            run_stages([Stage("a", lambda b: b, ["b"]), Stage("b", lambda a: a, ["a"])], {})
+
+    def test_stage_errors_propagate(self):
+        def fail(x):
+            raise RuntimeError("stage failed")
+        with self.assertRaises(RuntimeError):
+            run_stages([Stage("fail", fail, ["x"]), Stage("after", lambda fail: fail, ["fail"])], {"x": 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
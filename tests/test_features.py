@@ -0,0 +1,108 @@
+import unittest
+import logging
+import tempfile
+import numpy as np
+import pandas as pd
+from simulator.features import (FeatureConfig, account_features, counterparty_features, build_feature_store,
+                                update_feature_store, read_features)
+from simulator.windows import load_transactions
+
+
+logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class TestFeatures(unittest.TestCase):
+    '''
+    Tests for the rolling window feature pipeline and feature store
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = np.random.default_rng(11)
+        n = 1500
+        accounts = [f"A{i}" for i in range(25)]
+        cls.trxns = pd.DataFrame({
+            "Transaction_ID": np.arange(1, n + 1),
+            "Originator_Account_ID": rng.choice(accounts, n),
+            "Beneficiary_Account_ID": rng.choice(accounts, n),
+            "Trxn_Channel": rng.choice(["Cash", "Check", "Wire"], n),
+            "Trxn_Date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 100, n), unit="D"),
+            "Trxn_Amount": rng.choice([500.0, 9500.0, 9900.0, 12000.0], n),
+            "Branch_or_ATM_Location": rng.choice(["", "Main Street", "Airport"], n)})
+        cls.config = FeatureConfig(windows=[1, 7, 30], n_buckets=4, output_format="npz")
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+
+    def _expected(self, account, date, window):
+        df = self.trxns
+        in_window = (df["Trxn_Date"] <= date) & (df["Trxn_Date"] > date - pd.Timedelta(days=window))
+        mine = df[in_window & ((df["Originator_Account_ID"] == account) | (df["Beneficiary_Account_ID"] == account))]
+        # A trxn between two other accounts counts once for each of them
+        out = mine[(mine["Originator_Account_ID"] == account) & (mine["Beneficiary_Account_ID"] != account)]
+        incoming = mine[(mine["Beneficiary_Account_ID"] == account) & (mine["Originator_Account_ID"] != account)]
+        own = mine[(mine["Originator_Account_ID"] == account) & (mine["Beneficiary_Account_ID"] == account)]
+        events = pd.concat([out, incoming, own])
+        counts = events.loc[events["Branch_or_ATM_Location"] != "", "Branch_or_ATM_Location"].value_counts()
+        p = counts / counts.sum()
+        counterparties = set(out["Beneficiary_Account_ID"]) | set(incoming["Originator_Account_ID"])
+        return {"n_trxns": len(events), "amount": events["Trxn_Amount"].sum(),
+                "in_amount": incoming["Trxn_Amount"].sum(), "out_amount": out["Trxn_Amount"].sum(),
+                "share_cash": (events["Trxn_Channel"] == "Cash").mean(),
+                "location_entropy": float(-(p * np.log(p)).sum()) if len(p) else 0.0,
+                "near_threshold_ratio": events["Trxn_Amount"].between(9000, 9999.99).mean(),
+                "n_counterparties": len(counterparties)}
+
+    def test_account_features_match_brute_force(self):
+        features = account_features(load_transactions(self.trxns), self.config)
+        self.assertEqual(len(features), len(features[["Account_ID", "Date"]].drop_duplicates()))
+        for row in features.sample(40, random_state=0).itertuples(index=False):
+            row = row._asdict()
+            for window in self.config.windows:
+                expected = self._expected(row["Account_ID"], pd.Timestamp(row["Date"]), window)
+                for name, value in expected.items():
+                    self.assertAlmostEqual(row[f"{name}_{window}d"], value, places=2, msg=f"{name}_{window}d")
+
+    def test_counterparty_share(self):
+        features = counterparty_features(load_transactions(self.trxns), self.config)
+        self.assertFalse((features["Account_ID"] == features["Counterparty_ID"]).any())
+        self.assertTrue(features["share_of_amount_30d"].between(0, 1.0001).all())
+        totals = features.groupby(["Account_ID", "Counterparty_ID"])["n_trxns_1d"].sum().sum()
+        own = (self.trxns["Originator_Account_ID"] == self.trxns["Beneficiary_Account_ID"]).sum()
+        self.assertEqual(totals, 2 * (len(self.trxns) - own))
+
+    def test_update_matches_rebuild(self):
+        first, new = self.trxns.iloc[:1400], self.trxns.iloc[1400:].drop(columns="Branch_or_ATM_Location")
+        new = new.assign(Originator_Account_ID="A3")
+        with tempfile.TemporaryDirectory() as updated, tempfile.TemporaryDirectory() as rebuilt:
+            build_feature_store(first, updated, self.config)
+            update_feature_store(updated, new, sar_id="sar_1")
+            build_feature_store(pd.concat([first, new.assign(Is_SAR=True, SAR_ID="sar_1")], ignore_index=True),
+                                rebuilt, self.config)
+            for table in ["accounts", "counterparties"]:
+                expected = read_features(rebuilt, table).sort_values(["Account_ID", "Date"], kind="stable")
+                actual = read_features(updated, table).sort_values(["Account_ID", "Date"], kind="stable")
+                if table == "counterparties":
+                    expected = expected.sort_values(["Account_ID", "Counterparty_ID", "Date"])
+                    actual = actual.sort_values(["Account_ID", "Counterparty_ID", "Date"])
+                pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True),
+                                              check_dtype=False)
+            self.assertEqual(read_features(updated, "trxns", ["A3"])["Is_SAR"].sum(), 100)
+            self.assertEqual(set(read_features(updated, "accounts", ["A3"])["Account_ID"]), {"A3"})
+
+    def test_undated_trxns_dropped(self):
+        new = self.trxns.iloc[1400:].assign(Originator_Account_ID="A3")
+        undated = pd.concat([new, new.iloc[:2].assign(Trxn_Date=pd.NaT)], ignore_index=True)
+        self.assertEqual(len(load_transactions(undated).day), len(new))
+        with tempfile.TemporaryDirectory() as updated, tempfile.TemporaryDirectory() as expected:
+            build_feature_store(self.trxns.iloc[:1400], updated, self.config)
+            build_feature_store(self.trxns.iloc[:1400], expected, self.config)
+            update_feature_store(updated, undated, sar_id="sar_1")
+            update_feature_store(expected, new, sar_id="sar_1")
+            pd.testing.assert_frame_equal(read_features(updated, "accounts", ["A3"]),
+                                          read_features(expected, "accounts", ["A3"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
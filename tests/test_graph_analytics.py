@@ -0,0 +1,123 @@
+import unittest
+import logging
+import numpy as np
+import pandas as pd
+from knowledge_graph.analytics import (build_graph, find_hubs, find_cycles, find_layering_chains,
+                                       connected_components)
+
+
+logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def _trxns(rows):
+    return pd.DataFrame(rows, columns=["Originator_Account_ID", "Beneficiary_Account_ID", "Trxn_Date",
+                                       "Trxn_Amount"]).assign(Trxn_Channel="Wire")
+
+
+class TestGraphAnalytics(unittest.TestCase):
+    '''
+    Tests for the CSR trxn graph analytics
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rows = [[f"S{i}", "HUB", f"2024-01-{i + 1:02d}", 100.0] for i in range(12)]
+        rows += [[f"S{i}", "HUB", "2024-03-01", 100.0] for i in range(12, 15)]
+        # Round trip through three accounts and straight back between two
+        rows += [["A", "B", "2024-02-01", 1000.0], ["B", "C", "2024-02-02", 950.0], ["C", "A", "2024-02-03", 900.0],
+                 ["D", "E", "2024-02-01", 500.0], ["E", "D", "2024-02-01", 500.0]]
+        # A cycle of accounts that is not a cycle in time
+        rows += [["F", "G", "2024-02-05", 10.0], ["G", "H", "2024-02-01", 10.0], ["H", "F", "2024-02-06", 10.0]]
+        # Layering chain of four hops
+        rows += [["P1", "P2", "2024-04-01", 10000.0], ["P2", "P3", "2024-04-02", 9800.0],
+                 ["P3", "P4", "2024-04-03", 9600.0], ["P4", "P5", "2024-04-08", 9500.0],
+                 ["P5", "P6", "2024-04-20", 9400.0], ["P1", "P1", "2024-04-01", 10000.0]]
+        # Undated trxn, left out
+        rows += [["Q1", "Q2", "", 50.0]]
+        cls.graph = build_graph(_trxns(rows))
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+
+    def test_build_graph(self):
+        self.assertEqual(self.graph.n_edges, 28)
+        self.assertEqual(self.graph.out_degree().sum(), 28)
+        self.assertNotIn("Q1", list(self.graph.accounts))
+        self.assertEqual(self.graph.start_date, np.datetime64("2024-01-01", "D"))
+        src = self.graph.src
+        self.assertTrue((np.diff(src) >= 0).all())
+        index = list(self.graph.accounts).index("HUB")
+        self.assertEqual(self.graph.in_degree()[index], 15)
+        in_edges = self.graph.in_edges[self.graph.in_indptr[index]:self.graph.in_indptr[index + 1]]
+        self.assertTrue((self.graph.dst[in_edges] == index).all())
+
+    def test_hubs(self):
+        hubs = find_hubs(self.graph, min_counterparties=12, direction="in")
+        self.assertEqual(list(hubs["Account_ID"]), ["HUB"])
+        self.assertEqual(hubs["N_Counterparties"].iloc[0], 15)
+        windowed = find_hubs(self.graph, min_counterparties=10, window_days=10, direction="in")
+        self.assertEqual(windowed["N_Counterparties"].iloc[0], 10)
+        self.assertEqual(windowed["Window_End"].iloc[0], np.datetime64("2024-01-10"))
+        self.assertEqual(len(find_hubs(self.graph, min_counterparties=11, window_days=10)), 0)
+        self.assertEqual(len(find_hubs(self.graph, min_counterparties=2, direction="out")), 0)
+
+    def test_cycles(self):
+        cycles = find_cycles(self.graph, max_length=4, max_days=30)
+        self.assertEqual(sorted(tuple(path) for path in cycles["Path"]),
+                         [("A", "B", "C", "A"), ("D", "E", "D")])
+        self.assertEqual(len(find_cycles(self.graph, max_days=1)), 1)
+        self.assertEqual(len(find_cycles(self.graph, max_length=2)), 1)
+
+    def test_cycles_match_brute_force(self):
+        rng = np.random.default_rng(5)
+        n = 400
+        trxns = _trxns({"Originator_Account_ID": rng.integers(0, 40, n).astype(str),
+                        "Beneficiary_Account_ID": rng.integers(0, 40, n).astype(str),
+                        "Trxn_Date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 60, n), unit="D"),
+                        "Trxn_Amount": 1.0})
+        graph = build_graph(trxns)
+        found = {frozenset(map(tuple, zip(path[:-1], path[1:]))) for path in find_cycles(graph, 3, 10)["Path"]}
+
+        edges = trxns[trxns["Originator_Account_ID"] != trxns["Beneficiary_Account_ID"]]
+        edges = list(edges.itertuples(index=False))
+        expected = set()
+        for i, first in enumerate(edges):
+            stack = [([i], first)]
+            while stack:
+                path, last = stack.pop()
+                for j, edge in enumerate(edges):
+                    if j in path or edge.Originator_Account_ID != last.Beneficiary_Account_ID or \
+                            edge.Trxn_Date < last.Trxn_Date or (edge.Trxn_Date - first.Trxn_Date).days > 10:
+                        continue
+                    nodes = [edges[k].Originator_Account_ID for k in path]
+                    if edge.Beneficiary_Account_ID == first.Originator_Account_ID:
+                        expected.add(frozenset((edges[k].Originator_Account_ID, edges[k].Beneficiary_Account_ID)
+                                               for k in path + [j]))
+                    elif len(path) < 2 and edge.Beneficiary_Account_ID not in nodes:
+                        stack.append((path + [j], edge))
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(found, expected)
+
+    def test_layering_chains(self):
+        chains = find_layering_chains(self.graph, min_hops=3, max_gap_days=5)
+        self.assertEqual([list(path) for path in chains["Path"]], [["P1", "P2", "P3", "P4", "P5"]])
+        self.assertEqual(chains["Hops"].iloc[0], 4)
+        self.assertEqual(chains["Last_Amount"].iloc[0], 9500.0)
+        chains = find_layering_chains(self.graph, min_hops=3, max_gap_days=2)
+        self.assertEqual([list(path) for path in chains["Path"]], [["P1", "P2", "P3", "P4"]])
+
+    def test_components(self):
+        components = connected_components(self.graph).set_index("Account_ID")
+        self.assertEqual(components.loc["HUB", "Component_Size"], 16)
+        self.assertEqual(components.loc["A", "Component"], components.loc["C", "Component"])
+        self.assertNotEqual(components.loc["A", "Component"], components.loc["D", "Component"])
+        self.assertEqual(components.loc["P6", "Component_Size"], 6)
+        self.assertEqual(components["Component"].nunique(), 5)
+        windowed = connected_components(build_graph(_trxns([["A", "B", "2024-01-01", 1.0],
+                                                            ["B", "C", "2024-02-01", 1.0]]), end_date="2024-01-31"))
+        self.assertEqual(list(windowed["Component_Size"]), [2, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
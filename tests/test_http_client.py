@@ -0,0 +1,114 @@
+import unittest
+import asyncio
+import copy
+import logging
+import os
+import tempfile
+import openai
+import yaml
+from agents.agents import FunctionCallingAgent
+from agents.http_client import HttpClientSettings, OpenAIClientFactory, get_client_factory
+from agents.scheduler import RequestScheduler
+from agents.stand_in_server import StandInSettings, start_stand_in_server
+
+
+logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class TestOpenAIClientFactory(unittest.TestCase):
+    '''
+    Tests for the shared pooled HTTP client factory
+    '''
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+        self.factory = OpenAIClientFactory(HttpClientSettings(max_connections=7, max_keepalive_connections=3))
+
+    def tearDown(self):
+        self.factory.close()
+
+    def test_settings_read_from_config(self):
+        settings = HttpClientSettings.from_config("configs/agents_config.yaml")
+        self.assertEqual(settings.max_connections, 100)
+        self.assertEqual(settings.read_timeout, 120)
+
+    def test_llm_config_shares_one_client(self):
+        llm_config = self.factory.llm_config_with_client({"model": "gpt-4.1", "temperature": 0})
+        # autogen deep-copies llm_config; the pooled client must survive the copy
+        copied = copy.deepcopy(llm_config)
+        self.assertIs(copied["http_client"], self.factory.http_client)
+        self.assertEqual(copied["model"], "gpt-4.1")
+
+    def test_stats_report_pool_limits(self):
+        _ = self.factory.http_client
+        stats = self.factory.stats()
+        self.assertEqual(stats["max_connections"], 7)
+        self.assertEqual(stats["sync_pool"]["connections"], 0)
+        self.assertEqual(stats["requests_total"], 0)
+
+    def test_close_closes_both_pools(self):
+        http_client, async_http_client = self.factory.http_client, self.factory.async_http_client
+        self.factory.close()
+        self.assertTrue(http_client.is_closed)
+        self.assertTrue(async_http_client.is_closed)
+        # Pools are recreated on next use
+        self.assertFalse(self.factory.async_http_client.is_closed)
+        asyncio.run(self.factory.aclose())
+        self.assertEqual(self.factory.stats()["async_pool"]["connections"], 0)
+
+    def test_async_client_across_event_loops(self):
+        server = start_stand_in_server(StandInSettings(port=0))
+        factory = OpenAIClientFactory(base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", api_key="stand-in")
+
+        async def complete():
+            client = factory.async_openai_client()
+            resp = await client.chat.completions.create(model="gpt-4.1-mini",
+                                                        messages=[{"role": "user", "content": "hello"}])
+            return client, resp.choices[0].message.content
+
+        try:
+            # Keep-alive connections of the first loop must not be reused by the second
+            first, _ = asyncio.run(complete())
+            second, content = asyncio.run(complete())
+            self.assertIsNot(first, second)
+            self.assertTrue(content)
+        finally:
+            factory.close()
+            server.shutdown()
+
+    def test_scheduled_calls_are_not_retried_by_the_sdk(self):
+        server = start_stand_in_server(StandInSettings(port=0, rate_limit_error_rate=1.0))
+        factory = OpenAIClientFactory(base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", api_key="stand-in")
+        agent = FunctionCallingAgent(name="Agent", system_message="", llm_config={"model": "gpt-4.1-mini"},
+                                     scheduler=RequestScheduler(max_retries=0), client_factory=factory)
+        try:
+            self.assertEqual(factory.openai_client(0).max_retries, 0)
+            self.assertIs(factory.openai_client(0)._client, factory.openai_client()._client)
+            # The 429 goes straight to the scheduler, which gives up after max_retries=0
+            with self.assertRaises(openai.RateLimitError):
+                agent._create(agent._build_api_kwargs([{"role": "user", "content": "hello"}]))
+            self.assertEqual(factory.stats()["requests_total"], 1)
+        finally:
+            factory.close()
+            server.shutdown()
+
+    def test_factory_per_config(self):
+        with open("configs/agents_config.yaml") as file:
+            config = yaml.safe_load(file)
+        config["http_client"]["max_connections"] = 3
+        config["llm_backend"]["provider"] = "stand_in"
+        with tempfile.TemporaryDirectory() as temp_dir:
+            config_file = os.path.join(temp_dir, "agents_config.yaml")
+            with open(config_file, "w") as file:
+                yaml.safe_dump(config, file)
+            factory = get_client_factory(config_file)
+            # Whichever is called first, each config gets a factory with its own settings
+            self.assertIsNot(factory, get_client_factory())
+            self.assertIs(factory, get_client_factory(config_file))
+            self.assertEqual(factory.settings.max_connections, 3)
+            self.assertEqual(factory.api_key, "stand-in")
+            self.assertEqual(get_client_factory().settings.max_connections, 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
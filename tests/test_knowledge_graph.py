@@ -0,0 +1,100 @@
+import unittest
+import logging
+import os
+import tempfile
+import pandas as pd
+from knowledge_graph.store import KnowledgeGraph, TRXN_RELATION
+
+
+logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class TestKnowledgeGraph(unittest.TestCase):
+    '''
+    Tests for the persistent cross-SAR knowledge graph
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.entities_1 = {"Entities": {"Individuals": ["John"], "Organizations": ["Acme Inc"],
+                                       "Financial_Institutions": ["Bank of America"]},
+                          "Account_IDs": ["345723", "98765"],
+                          "Acct_to_FI": {"345723": "Bank of America", "98765": "Bank of America"},
+                          "Acct_to_Cust": {"345723": "John", "98765": "Acme Inc"},
+                          "FI_to_Acct_to_Cust": {"Bank of America": {"345723": "CUST_001", "98765": "CUST_002"}}}
+        cls.trxns_1 = pd.DataFrame({"Originator_Name": ["John", "John", "John"],
+                                    "Originator_Account_ID": ["345723"] * 3,
+                                    "Originator_Customer_ID": ["CUST_001"] * 3,
+                                    "Beneficiary_Name": ["Acme Inc"] * 3,
+                                    "Beneficiary_Account_ID": ["98765"] * 3,
+                                    "Beneficiary_Customer_ID": ["CUST_002"] * 3,
+                                    "Trxn_Channel": ["Wire", "Wire", "Check"],
+                                    "Trxn_Date": ["2024-01-05", "2024-02-01", "2024-01-10"],
+                                    "Trxn_Amount": [1000.0, 2000.0, 500.0]})
+        cls.entities_2 = {"Entities": {"Individuals": ["Jill"], "Organizations": ["ACME INC"],
+                                       "Financial_Institutions": ["Chase Bank"]},
+                          "Account_IDs": ["98765", "55555"],
+                          "Acct_to_FI": {"55555": "Chase Bank"},
+                          "Acct_to_Cust": {"55555": "Jill", "98765": "ACME INC"}}
+        cls.trxns_2 = pd.DataFrame({"Originator_Account_ID": ["98765"], "Beneficiary_Account_ID": ["55555"],
+                                    "Trxn_Channel": ["Wire"], "Trxn_Date": ["2024-03-01"], "Trxn_Amount": [2500.0],
+                                    "Branch_or_ATM_Location": [""]})
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "graph", "knowledge_graph.sqlite")
+        self.graph = KnowledgeGraph(self.path)
+        self.graph.ingest("sar_1", self.entities_1, self.trxns_1)
+        self.graph.ingest("sar_2", self.entities_2, self.trxns_2)
+
+    def tearDown(self):
+        self.graph.close()
+        self.tmp_dir.cleanup()
+
+    def test_entities_are_shared_across_sars(self):
+        self.assertEqual(self.graph.sars_of("98765"), ["sar_1", "sar_2"])
+        self.assertEqual(self.graph.sars_of("acme inc", "organization"), ["sar_1", "sar_2"])
+        shared = {(node["type"], node["key"]) for node in self.graph.shared_nodes(min_sars=2)}
+        self.assertEqual(shared, {("account", "98765"), ("organization", "acme inc")})
+
+    def test_neighbours(self):
+        neighbours = self.graph.neighbours("345723", relation=TRXN_RELATION)
+        by_channel = {edge["channel"]: edge for edge in neighbours}
+        self.assertEqual(set(by_channel), {"Wire", "Check"})
+        self.assertEqual(by_channel["Wire"]["n_trxns"], 2)
+        self.assertEqual(by_channel["Wire"]["total_amount"], 3000.0)
+        self.assertEqual((by_channel["Wire"]["first_date"], by_channel["Wire"]["last_date"]),
+                         ("2024-01-05", "2024-02-01"))
+        self.assertEqual(by_channel["Wire"]["direction"], "out")
+        self.assertEqual(by_channel["Wire"]["neighbour"]["label"], "98765")
+        relations = {(edge["relation"], edge["neighbour"]["type"]) for edge in self.graph.neighbours("345723")}
+        self.assertIn(("held_at", "financial_institution"), relations)
+        self.assertIn(("owned_by", "individual"), relations)
+        self.assertIn(("identified_by", "customer_id"), relations)
+
+    def test_paths_and_neighbourhood_span_sars(self):
+        path = self.graph.shortest_path("John", "Chase Bank")
+        self.assertEqual([node["label"] for node in path], ["John", "345723", "98765", "55555", "Chase Bank"])
+        self.assertEqual(self.graph.shortest_path("John", "Chase Bank", max_hops=3), [])
+        accounts = {node["label"] for node in self.graph.neighbourhood("345723", hops=2, relation=TRXN_RELATION)
+                    ["nodes"]}
+        self.assertEqual(accounts, {"345723", "98765", "55555"})
+
+    def test_reingest_replaces_and_persists(self):
+        before = self.graph.stats()
+        self.graph.ingest("sar_1", self.entities_1, self.trxns_1)
+        self.assertEqual(self.graph.stats(), before)
+        self.graph.close()
+
+        self.graph = KnowledgeGraph(self.path)
+        self.assertEqual(self.graph.sar_ids(), ["sar_1", "sar_2"])
+        self.graph.remove("sar_2")
+        self.assertEqual(self.graph.sars_of("98765"), ["sar_1"])
+        self.assertEqual(self.graph.neighbours("55555"), [])
+        self.assertEqual(self.graph.to_networkx("sar_1").number_of_edges(), before["edges"] - 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
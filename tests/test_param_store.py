@@ -0,0 +1,91 @@
+import unittest
+import logging
+import os
+import tempfile
+import pandas as pd
+from agents.param_store import ParameterStore, apply_overrides
+from agents.tools import generate_transactions, derive_seed
+from agents.workflows import resimulate, _make_recorder, _resolve_sar_id
+
+
+logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class TestParameterStore(unittest.TestCase):
+    '''
+    Tests for recording generate_transactions arguments and regenerating trxns from them
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.args = {"Originator_Name": "John", "Originator_Account_ID": "345723", "Originator_Customer_ID": "CUST_001",
+                    "Beneficiary_Name": "Jill", "Beneficiary_Account_ID": "Dummy_001",
+                    "Beneficiary_Customer_ID": "CUST_003", "Trxn_Channel": ["Wire", "Check"],
+                    "Start_Date": "2024-01-01", "End_Date": "2024-07-04", "Min_Ind_Trxn_Amt": "",
+                    "Max_Ind_Trxn_Amt": "", "Total_Amount": 100000, "Branch_or_ATM_Location": [""],
+                    "N_transactions": 10}
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "params", "generate_transactions.jsonl")
+        self.store = ParameterStore(self.path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_latest_record_wins(self):
+        self.store.record("345723", "Trxn_Set_1", self.args, sar_id="sar_1", seed=1)
+        self.store.record("345723", "Trxn_Set_1", {**self.args, "N_transactions": 5}, sar_id="sar_1", seed=2)
+        self.store.record("98765", "Trxn_Set_1", self.args, sar_id="sar_2", seed=3)
+        records = self.store.records()
+        self.assertEqual(len(records), 2)
+        self.assertEqual(self.store.records("sar_1")[0]["args"]["N_transactions"], 5)
+        self.assertEqual(self.store.sar_ids(), ["sar_1", "sar_2"])
+
+    def test_sars_without_id_kept_apart(self):
+        # Two SARs reusing the default trxn set label of the same account, run without a sar_id
+        inputs = [{"Narratives": {"345723": {"Trxn_Set_1": text}}} for text in ["Wires to Jill", "Cash deposits"]]
+        sar_ids = [_resolve_sar_id(input, None) for input in inputs]
+        self.assertNotEqual(sar_ids[0], sar_ids[1])
+        self.assertEqual(sar_ids[0], _resolve_sar_id(inputs[0], None))
+        self.assertEqual(_resolve_sar_id(inputs[0], "sar_1"), "sar_1")
+        for input, sar_id in zip(inputs, sar_ids):
+            _make_recorder(self.store, input, sar_id, seed=1)("generate_transactions", self.args)
+        self.assertEqual(self.store.sar_ids(), sar_ids)
+        self.assertEqual(len(self.store.records(sar_ids[1])), 1)
+
+    def test_apply_overrides(self):
+        args = apply_overrides(self.args, amount_scale=2, count_scale=1.5, date_shift_days=31)
+        self.assertEqual(args["Total_Amount"], 200000)
+        self.assertEqual(args["N_transactions"], 15)
+        self.assertEqual(args["Min_Ind_Trxn_Amt"], "")
+        self.assertEqual((args["Start_Date"], args["End_Date"]), ("2024-02-01", "2024-08-04"))
+        self.assertEqual(self.args["Total_Amount"], 100000)
+
+    def test_resimulate_reproduces_recorded_trxns(self):
+        seed = derive_seed("sar_1", "345723", "Trxn_Set_1")
+        original = generate_transactions(**self.args, seed=seed, output_format="dataframe")
+        self.store.record("345723", "Trxn_Set_1", self.args, sar_id="sar_1", seed=seed)
+
+        replayed = resimulate(self.path, sar_id="sar_1")
+        pd.testing.assert_frame_equal(replayed.drop(columns="Transaction_ID").sort_values("Trxn_Amount")
+                                      .reset_index(drop=True),
+                                      original.sort_values("Trxn_Amount").reset_index(drop=True))
+
+        resampled = resimulate(self.path, sar_id="sar_1", seed=7, amount_scale=0.5)
+        self.assertEqual(len(resampled), 10)
+        self.assertAlmostEqual(resampled["Trxn_Amount"].sum(), 50000, places=2)
+
+    def test_resimulate_realizations(self):
+        self.store.record("345723", "Trxn_Set_1", self.args, sar_id="sar_1", seed=1)
+        self.store.record("98765", "Trxn_Set_1", {**self.args, "Originator_Account_ID": "98765"}, sar_id="sar_1", seed=2)
+        realizations = resimulate(self.path, sar_id="sar_1", n_realizations=25)
+        self.assertEqual(len(realizations), 2 * 10 * 25)
+        totals = realizations.groupby(["Realization", "Originator_Account_ID"])["Trxn_Amount"].sum()
+        self.assertTrue((totals.round(2) == 100000).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
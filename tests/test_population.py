@@ -0,0 +1,93 @@
+import unittest
+import logging
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from simulator.population import PopulationConfig, simulate_population, simulate_chunk, format_ids, POPULATION_COLUMNS, \
+    prepare_sar_trxns
+from simulator.chunks import iter_chunks, read_manifest
+
+
+logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class TestPopulationSimulator(unittest.TestCase):
+    '''
+    Tests for the background population simulator
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.config = PopulationConfig(n_accounts=5000, accounts_per_chunk=2000, start_date="2024-01-01",
+                                      end_date="2024-03-31", output_format="npz",
+                                      weekday_weights=[1, 1, 1, 1, 1, 1, 0])
+        cls.sar_trxns = pd.DataFrame({"Originator_Name": ["John"] * 3, "Originator_Account_ID": ["345723"] * 3,
+                                      "Beneficiary_Name": ["John"] * 3, "Beneficiary_Account_ID": ["345723"] * 3,
+                                      "Trxn_Channel": ["Cash"] * 3,
+                                      "Trxn_Date": ["2024-02-01", "2024-02-02", "2024-02-04"],
+                                      "Trxn_Amount": [9900, 9800, 9700.5], "Transaction_ID": [1, 2, 3]})
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_format_ids(self):
+        self.assertEqual(list(format_ids("BG", np.array([0, 42, 123456789]))),
+                         ["BG000000000", "BG000000042", "BG123456789"])
+
+    def test_chunk_is_reproducible(self):
+        first, second = simulate_chunk(self.config, 1), simulate_chunk(self.config, 1)
+        pd.testing.assert_frame_equal(first, second)
+        self.assertEqual(list(first.columns), POPULATION_COLUMNS)
+        self.assertTrue(first["Trxn_Date"].is_monotonic_increasing)
+        # Sunday has no weight
+        self.assertFalse((first["Trxn_Date"].dt.dayofweek == 6).any())
+        cash = first[first["Trxn_Channel"] == "Cash"]
+        self.assertTrue((cash["Originator_Account_ID"] == cash["Beneficiary_Account_ID"]).all())
+        self.assertTrue((cash["Branch_or_ATM_Location"] != "").all())
+
+    def test_population_with_sar_rows(self):
+        manifest = simulate_population(self.config, self.tmp_dir.name, self.sar_trxns)
+        self.assertEqual(len(manifest["chunks"]), 3)
+        self.assertEqual(manifest["sar_rows"], 3)
+        self.assertEqual(read_manifest(self.tmp_dir.name)["rows"], manifest["rows"])
+
+        chunks = list(iter_chunks(self.tmp_dir.name))
+        population = pd.concat(chunks, ignore_index=True)
+        self.assertEqual(len(population), manifest["rows"])
+        self.assertTrue(population["Transaction_ID"].is_unique)
+        sar_rows = population[population["Is_SAR"]]
+        self.assertEqual(sorted(sar_rows["Trxn_Amount"]), [9700.5, 9800, 9900])
+        self.assertEqual(set(sar_rows["SAR_ID"]), {"SAR"})
+        self.assertEqual(set(population.loc[~population["Is_SAR"], "SAR_ID"]), {""})
+        # SAR rows of an account are written to a single chunk
+        self.assertEqual(sum(chunk["Is_SAR"].any() for chunk in chunks), 1)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir.name, "part-00000.npz")))
+
+    def test_first_realization_injected(self):
+        # Two SARs generated with n_realizations=2; each realisation is a full alternative set of the SAR's trxns
+        realizations = pd.concat([self.sar_trxns.assign(Realization=r, Trxn_Amount=self.sar_trxns["Trxn_Amount"] + r)
+                                  for r in range(2)], ignore_index=True)
+        sar_trxns = pd.concat([realizations.assign(SAR_ID="sar_1"), realizations.assign(SAR_ID="sar_2")],
+                              ignore_index=True)
+        sar_df = prepare_sar_trxns(sar_trxns)
+        self.assertEqual(len(sar_df), 6)
+        self.assertEqual(sorted(sar_df.loc[sar_df["SAR_ID"] == "sar_2", "Trxn_Amount"]), [9700.5, 9800, 9900])
+        self.assertEqual(len(prepare_sar_trxns(realizations)), 3)
+
+    def test_incomplete_sar_trxns_dropped(self):
+        sar_trxns = self.sar_trxns.astype({"Trxn_Amount": object}).copy()
+        sar_trxns.loc[0, "Trxn_Date"] = ""
+        sar_trxns.loc[1, "Trxn_Amount"] = ""
+        sar_df = prepare_sar_trxns(sar_trxns)
+        self.assertEqual(list(sar_df["Trxn_Amount"]), [9700.5])
+        self.assertEqual(list(sar_df["Trxn_Date"]), [pd.Timestamp("2024-02-04")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import yaml
+from types import SimpleNamespace
+from unittest.mock import patch
+from autogen import ConversableAgent
+from agents.registry import AgentRegistry, WORKFLOW1, TRXN_GENERATION
+from agents.workflows import _run_workflow1_stages
+
+
+logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class TestAgentRegistry(unittest.TestCase):
+    '''
+    Tests for the process-wide cache of parsed config and pre-built agents
+    '''
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+        self.temp_dir = tempfile.mkdtemp()
+        self.config_file = os.path.join(self.temp_dir, "agents_config.yaml")
+        with open('configs/agents_config.yaml', 'r') as file:
+            config = yaml.safe_load(file)
+        # Point the agents at the stand-in so they can be built without an API key
+        config["llm_backend"]["provider"] = "stand_in"
+        with open(self.config_file, 'w') as file:
+            yaml.safe_dump(config, file)
+        self.registry = AgentRegistry(self.config_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_config_is_parsed_once(self):
+        self.registry.config()
+        os.utime(self.config_file)  # mtime changes but the content does not
+        self.registry.agent_configs()
+        self.assertEqual(self.registry.stats["config_loads"], 1)
+
+    def test_checkout_reuses_returned_agents(self):
+        with self.registry.checkout(WORKFLOW1, structured_output=True) as first:
+            with self.registry.checkout(WORKFLOW1, structured_output=True) as concurrent:
+                self.assertIsNot(first, concurrent)
+        with self.registry.checkout(WORKFLOW1, structured_output=True) as again:
+            self.assertIn(again, (first, concurrent))
+        self.assertEqual(self.registry.stats["agent_sets_built"], 2)
+        self.assertIn("Entity_Extraction_Agent", first)
+
+    def test_concurrent_stages_do_not_share_the_sender(self):
+        senders, lock = [], threading.Lock()
+
+        def initiate_chat(sender, recipient, **kwargs):
+            with lock:
+                senders.append((recipient.name, sender))
+            return SimpleNamespace(summary=repr({recipient.name: {}}))
+
+        with self.registry.checkout(WORKFLOW1, structured_output=False) as agents, \
+                patch.object(ConversableAgent, "initiate_chat", initiate_chat):
+            results, _ = _run_workflow1_stages(agents, self.registry.agent_configs(), "SAR text", False, False)
+        self.assertEqual(set(results), {"Entity_Extraction_Agent", "Entity_Resolution_Agent",
+                                        "Narrative_Extraction_Agent"})
+        senders = dict(senders)
+        self.assertIs(senders["Entity_Extraction_Agent"], agents["SAR_Agent"])
+        # Entity resolution and narrative extraction run concurrently, each with its own SAR_Agent
+        self.assertEqual(len({id(sender) for sender in senders.values()}), 3)
+        self.assertEqual(senders["Narrative_Extraction_Agent"].name, "SAR_Agent")
+
+    def test_shared_agents_are_built_once(self):
+        agents = self.registry.shared_agents(TRXN_GENERATION, use_cache=False)
+        self.assertIs(self.registry.shared_agents(TRXN_GENERATION, use_cache=False), agents)
+        self.assertEqual(set(agents), {"Transaction_Generation_Agent", "Transaction_Generation_Agent_w_Tool",
+                                       "Router_Agent"})
+
+    def test_changed_config_invalidates_agents(self):
+        agents = self.registry.shared_agents(TRXN_GENERATION, use_cache=False)
+        with open(self.config_file, 'a') as file:
+            file.write("\n# changed\n")
+        self.assertIsNot(self.registry.shared_agents(TRXN_GENERATION, use_cache=False), agents)
+        self.assertEqual(self.registry.stats["config_loads"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import logging
+from agents.resolver import resolve_entities
+from evals.eval_functions import evaluate_nested_mapping
+from evals.golden_data import sars
+
+
+logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class TestResolver(unittest.TestCase):
+    '''
+    Tests for the deterministic local replacement of the Entity_Resolution_Agent
+    '''
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+
+    def test_worked_example_from_agent_prompt(self):
+        entity_results = {
+            "Account_IDs": ["345723", "98765", "12345", "99999", "Dummy_Acct_1"],
+            "Acct_to_Cust": {"345723": "John", "99999": "John", "12345": "Jill", "Dummy_Acct_1": "Jill",
+                             "98765": "Acme Inc"},
+            "Acct_to_FI": {"345723": "Bank of America", "99999": "Bank of America", "12345": "Bank of America",
+                           "Dummy_Acct_1": "Chase Bank", "98765": "Dummy_Bank_1"}}
+        expected = {"Bank of America": {"345723": "CUST_001", "99999": "CUST_001", "12345": "CUST_002"},
+                    "Chase Bank": {"Dummy_Acct_1": "CUST_003"},
+                    "Dummy_Bank_1": {"98765": "CUST_004"}}
+        self.assertEqual(resolve_entities(entity_results), {"FI_to_Acct_to_Cust": expected})
+
+    def test_same_owner_at_different_fis_gets_new_id(self):
+        entity_results = {"Account_IDs": ["345723", "99999", "Dummy_Acct_1"],
+                          "Acct_to_FI": {"345723": "Bank of America", "99999": "Bank of America",
+                                         "Dummy_Acct_1": "Chase Bank"},
+                          "Acct_to_Cust": {"345723": "John", "99999": "Jill", "Dummy_Acct_1": "Jill"}}
+        expected = {"Bank of America": {"345723": "CUST_001", "99999": "CUST_002"},
+                    "Chase Bank": {"Dummy_Acct_1": "CUST_003"}}
+        self.assertEqual(resolve_entities(entity_results)["FI_to_Acct_to_Cust"], expected)
+
+    def test_missing_fi_and_unknown_owners(self):
+        entity_results = {"Account_IDs": ["111", "222", "333"],
+                          "Acct_to_FI": {"111": "Dummy_Bank_1"},
+                          "Acct_to_Cust": {"111": "Unknown", "222": "Unknown"}}
+        result = resolve_entities(entity_results)["FI_to_Acct_to_Cust"]
+        self.assertEqual(result["Dummy_Bank_1"], {"111": "CUST_001"})
+        self.assertEqual(result["Dummy_Bank_2"], {"222": "CUST_002", "333": "CUST_003"})
+
+    def test_matches_golden_mappings(self):
+        # The gold FI_to_Acct_to_Cust of these SARs disagrees with their own gold Account_IDs and Acct_to_Cust, so no
+        # resolution of those inputs can match it:
+        #   sar_train1 writes the Dummy_Bank_1 accounts as 12345-6789 and 23456-7891 (Account_IDs 123456789 and
+        #   234567891), so only 3489728 matches.
+        #   sar_train4 maps accounts to customer names instead of CUST_ ids, and has Dummy_Acct_1 where Account_IDs
+        #   has 456781234.
+        known_mismatches = {"sar_train1": 1 / 3, "sar_train4": 0.0}
+        for sar in sars:
+            resolved = resolve_entities({"Account_IDs": sar.gold_account_ids, "Acct_to_FI": sar.gold_acct_to_fi,
+                                         "Acct_to_Cust": sar.gold_acct_to_cust})
+            metrics = evaluate_nested_mapping(resolved["FI_to_Acct_to_Cust"], sar.gold_fi_to_acct_to_cust)
+            self.assertAlmostEqual(metrics["f1"], known_mismatches.get(sar.sar_name, 1.0),
+                                   msg=f"Local resolution does not match gold for {sar.sar_name}")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+import logging
+import tempfile
+import numpy as np
+import pandas as pd
+from simulator.population import PopulationConfig, simulate_population
+from simulator.rules import Rule, load_transactions, evaluate_rule, backtest
+
+
+logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def _trxns(rows):
+    return pd.DataFrame(rows, columns=["Originator_Account_ID", "Beneficiary_Account_ID", "Trxn_Channel",
+                                       "Trxn_Date", "Trxn_Amount"])
+
+
+class TestRules(unittest.TestCase):
+    '''
+    Tests for the vectorised monitoring rule engine
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.structuring = Rule(name="Structuring", kind="structuring", window_days=7, min_count=3, min_amount=25000)
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+
+    def test_structuring(self):
+        trxns = load_transactions(_trxns([
+            ["A", "A", "Cash", "2024-01-01", 9500], ["A", "A", "Cash", "2024-01-03", 9600],
+            ["A", "A", "Cash", "2024-01-07", 9700], ["A", "A", "Cash", "2024-01-20", 9800],
+            # Spread over more than 7 days
+            ["B", "B", "Cash", "2024-01-01", 9500], ["B", "B", "Cash", "2024-01-05", 9600],
+            ["B", "B", "Cash", "2024-01-09", 9700],
+            # Not just below the threshold
+            ["C", "C", "Cash", "2024-01-01", 9500], ["C", "C", "Cash", "2024-01-02", 12000],
+            ["C", "C", "Cash", "2024-01-03", 9700]]))
+        alerts = evaluate_rule(self.structuring, trxns)
+        self.assertEqual(list(alerts["Account_ID"]), ["A"])
+        self.assertEqual(alerts["Alert_Date"].iloc[0], np.datetime64("2024-01-07"))
+        self.assertEqual(alerts["Window_Start"].iloc[0], np.datetime64("2024-01-01"))
+        self.assertEqual(alerts["Value"].iloc[0], 3)
+
+    def test_rapid_movement(self):
+        rule = Rule(name="Rapid", kind="rapid_movement", window_days=5, min_amount=20000, ratio=0.8)
+        trxns = load_transactions(_trxns([
+            ["A", "A", "Cash", "2024-01-01", 15000], ["A", "A", "Cash", "2024-01-02", 10000],
+            ["A", "X", "Wire", "2024-01-04", 12000], ["A", "Y", "Wire", "2024-01-05", 10000],
+            # Wire out too late
+            ["B", "B", "Cash", "2024-01-01", 25000], ["B", "X", "Wire", "2024-01-08", 25000]]))
+        alerts = evaluate_rule(rule, trxns)
+        self.assertEqual(list(alerts["Account_ID"]), ["A"])
+        self.assertEqual(alerts["Alert_Date"].iloc[0], np.datetime64("2024-01-05"))
+
+    def test_fan_in_matches_brute_force(self):
+        rng = np.random.default_rng(3)
+        n = 3000
+        df = _trxns({"Originator_Account_ID": rng.choice([f"S{i}" for i in range(40)], n),
+                     "Beneficiary_Account_ID": rng.choice([f"R{i}" for i in range(30)], n),
+                     "Trxn_Channel": rng.choice(["Wire", "Check", "Cash"], n),
+                     "Trxn_Date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 120, n), unit="D"),
+                     "Trxn_Amount": rng.uniform(10, 1000, n)})
+        rule = Rule(name="Fan in", kind="fan_in", window_days=10, min_counterparties=6)
+        alerts = evaluate_rule(rule, load_transactions(df))
+
+        df = df[df["Trxn_Channel"].isin(["Wire", "Check"])]
+        expected = set()
+        for (account, date) in df[["Beneficiary_Account_ID", "Trxn_Date"]].drop_duplicates().itertuples(index=False):
+            window = df[(df["Beneficiary_Account_ID"] == account) & (df["Trxn_Date"] <= date) &
+                        (df["Trxn_Date"] > date - pd.Timedelta(days=10))]
+            if window["Originator_Account_ID"].nunique() >= 6:
+                expected.add((account, pd.Timestamp(date)))
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(set(zip(alerts["Account_ID"], pd.to_datetime(alerts["Alert_Date"]))), expected)
+
+    def test_backtest_recall_on_population(self):
+        config = PopulationConfig(n_accounts=3000, accounts_per_chunk=1000, start_date="2024-01-01",
+                                  end_date="2024-03-31", output_format="npz")
+        sar_trxns = _trxns([["345723", "345723", "Cash", f"2024-02-0{day}", 9600] for day in range(1, 5)])
+        sar_trxns["Originator_Name"] = sar_trxns["Beneficiary_Name"] = "John"
+        with tempfile.TemporaryDirectory() as directory:
+            simulate_population(config, directory, sar_trxns)
+            alerts, report = backtest(directory, [self.structuring, Rule(name="Fan out", kind="fan_out")])
+
+        report = report.set_index("Rule")
+        self.assertIn("345723", set(alerts["Account_ID"]))
+        self.assertEqual(report.loc["Structuring", "SAR_Trxns"], 4)
+        self.assertEqual(report.loc["Structuring", "Trxn_Recall"], 1.0)
+        self.assertEqual(report.loc["Structuring", "SAR_Recall"], 1.0)
+        self.assertEqual(report.loc["All rules", "Detected_SAR_Trxns"], 4)
+        self.assertEqual(report.loc["Fan out", "Detected_SAR_Trxns"], 0)
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            Rule(name="Bad", kind="velocity")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import logging
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+import openai
+from agents.scheduler import RequestScheduler, ModelLimits, TokenBucket, parse_reset_duration
+
+
+logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class _RawResponse:
+    '''
+    Minimal stand-in for an OpenAI raw response carrying rate-limit headers
+    '''
+    def __init__(self, headers, parsed):
+        self.headers = headers
+        self._parsed = parsed
+
+    def parse(self):
+        return self._parsed
+
+
+class TestRequestScheduler(unittest.TestCase):
+    '''
+    Tests for the rate-limit-aware request scheduler
+    '''
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+        self.api_kwargs = {"model": "gpt-4.1-mini", "messages": [{"role": "user", "content": "hello world"}]}
+
+    def test_token_bucket_reports_wait(self):
+        bucket = TokenBucket(capacity=60)
+        self.assertEqual(bucket.try_acquire(60), 0.0)
+        # Empty bucket refills at 1 token per second
+        self.assertAlmostEqual(bucket.try_acquire(1), 1.0, places=1)
+
+    def test_parse_reset_duration(self):
+        self.assertEqual(parse_reset_duration("6m0s"), 360)
+        self.assertAlmostEqual(parse_reset_duration("250ms"), 0.25)
+        self.assertIsNone(parse_reset_duration(""))
+
+    def test_config_is_loaded(self):
+        scheduler = RequestScheduler.from_config("configs/agents_config.yaml")
+        self.assertEqual(scheduler.limits["gpt-4.1"].tpm, 30000)
+        self.assertGreater(scheduler.max_concurrency, 0)
+
+    def test_call_parses_raw_response_and_clamps_buckets(self):
+        scheduler = RequestScheduler(limits={"gpt-4.1-mini": ModelLimits(rpm=100, tpm=10000)})
+        raw = _RawResponse({"x-ratelimit-remaining-requests": "3", "x-ratelimit-remaining-tokens": "500"}, "parsed")
+        result = scheduler.call(lambda **kwargs: raw, self.api_kwargs)
+        self.assertEqual(result, "parsed")
+        self.assertEqual(scheduler.in_flight, 0)
+        self.assertLessEqual(scheduler._buckets["gpt-4.1-mini"]["tokens"].level, 500)
+
+    def test_rate_limit_halves_concurrency_and_retries(self):
+        scheduler = RequestScheduler(max_concurrency=8)
+        response = MagicMock(status_code=429, headers={"retry-after": "0"})
+        error = openai.RateLimitError("rate limited", response=response, body=None)
+        func = MagicMock(side_effect=[error, SimpleNamespace(content="ok")])
+        result = scheduler.call(func, self.api_kwargs)
+        self.assertEqual(result.content, "ok")
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(scheduler.concurrency_limit, 4)
+        self.assertEqual(scheduler.stats["rate_limited"], 1)
+
+    def test_estimate_tokens_counts_completion_budget(self):
+        scheduler = RequestScheduler()
+        base = scheduler.estimate_tokens(self.api_kwargs)
+        self.assertGreater(base, 0)
+        self.assertEqual(scheduler.estimate_tokens(dict(self.api_kwargs, max_tokens=100)), base + 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
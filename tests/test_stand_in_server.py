@@ -0,0 +1,78 @@
+import unittest
+import json
+import logging
+import urllib.request
+import urllib.error
+from agents.stand_in_server import StandInSettings, StandInBackend, start_stand_in_server
+from agents.agent_utils import make_router_schema
+from agents.tools import generate_transactions, generate_transactions_schema
+
+
+logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class TestStandInServer(unittest.TestCase):
+    '''
+    Tests for the local deterministic stand-in of the Chat Completions API
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.settings = StandInSettings(port=0)
+        cls.server = start_stand_in_server(cls.settings)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/v1/chat/completions"
+        cls.narrative = {"Entities": {}, "Account_IDs": ["345723"], "Acct_to_FI": {"345723": "Bank of America"},
+                         "Acct_to_Cust": {"345723": "John"},
+                         "FI_to_Acct_to_Cust": {"Bank of America": {"345723": "CUST_001"}},
+                         "Narratives": {"345723": {"Trxn_Set_1": "John made 20 cash deposits in 2024"}}}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        super().tearDownClass()
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+
+    def _post(self, body):
+        request = urllib.request.Request(self.url, data=json.dumps(body).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+
+    def test_router_choice_is_valid_and_deterministic(self):
+        schema = make_router_schema({"Transaction_Generation_Agent": None, "Transaction_Generation_Agent_w_Tool": None})
+        body = {"model": "gpt-4.1-mini", "messages": [{"role": "user", "content": "narrative"}],
+                "functions": [schema], "function_call": {"name": "choose_agent"}}
+        first = self._post(body)
+        second = self._post(body)
+        args = json.loads(first["choices"][0]["message"]["function_call"]["arguments"])
+        self.assertIn(args["agent"], schema["parameters"]["properties"]["agent"]["enum"])
+        self.assertEqual(first["choices"][0]["message"], second["choices"][0]["message"])
+
+    def test_generate_transactions_arguments_are_usable(self):
+        body = {"model": "gpt-4.1-mini", "messages": [{"role": "user", "content": json.dumps(self.narrative)}],
+                "functions": [generate_transactions_schema], "function_call": {"name": "generate_transactions"}}
+        message = self._post(body)["choices"][0]["message"]
+        args = json.loads(message["function_call"]["arguments"])
+        self.assertEqual(args["Originator_Account_ID"], "345723")
+        self.assertEqual(args["Originator_Customer_ID"], "CUST_001")
+        trxns = generate_transactions(**args)
+        self.assertEqual(len(trxns), args["N_transactions"])
+
+    def test_rate_limit_injection(self):
+        backend = StandInBackend(StandInSettings(rate_limit_error_rate=1.0, rpm=10))
+        status, payload, headers, _ = backend.handle({"model": "gpt-4.1-mini", "messages": []})
+        self.assertEqual(status, 429)
+        self.assertIn("retry-after", headers)
+        self.assertEqual(headers["x-ratelimit-limit-requests"], "10")
+
+    def test_latency_includes_output_token_time(self):
+        backend = StandInBackend(StandInSettings(latency={"distribution": "constant", "ms": 100},
+                                                 output_tokens_per_second=100))
+        self.assertAlmostEqual(backend.sample_latency(completion_tokens=50), 0.6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import json
+import logging
+from agents.structured_outputs import WORKFLOW1_RESPONSE_FORMATS, parse_structured_output, to_structured_records
+from agents.stand_in_server import synthesize_message
+
+
+logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class TestStructuredOutputs(unittest.TestCase):
+    '''
+    Tests for the JSON-schema response formats of the workflow 1 agents
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.artefacts = {
+            "Entity_Extraction_Agent": {
+                "Entities": {"Individuals": ["John", "Jill"], "Organizations": [],
+                             "Financial_Institutions": ["Bank of America", "Chase Bank"], "Locations": []},
+                "Account_IDs": ["345723", "99999", "Dummy_Acct_1"],
+                "Acct_to_FI": {"345723": "Bank of America", "99999": "Bank of America", "Dummy_Acct_1": "Chase Bank"},
+                "Acct_to_Cust": {"345723": "John", "99999": "Jill", "Dummy_Acct_1": "Jill"}},
+            "Entity_Resolution_Agent": {
+                "FI_to_Acct_to_Cust": {"Bank of America": {"345723": "CUST_001", "99999": "CUST_002"},
+                                       "Chase Bank": {"Dummy_Acct_1": "CUST_003"}}},
+            "Narrative_Extraction_Agent": {
+                "Narratives": {"345723": {"Trxn_Set_1": "John deposited $5000 in Cash into Acct #345723",
+                                          "Trxn_Set_2": "John sends $4000 from Acct #345723 to Jill"},
+                               "99999": {"Trxn_Set_1": "Jill deposited $4000 in Cash into Acct #99999"}}},
+        }
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+
+    def _assert_strict(self, schema, path):
+        if schema.get("type") == "object":
+            self.assertFalse(schema["additionalProperties"], msg=f"{path} allows additional properties")
+            self.assertEqual(sorted(schema["required"]), sorted(schema["properties"]), msg=f"{path} has optional fields")
+            for key, value in schema["properties"].items():
+                self._assert_strict(value, f"{path}.{key}")
+        elif schema.get("type") == "array":
+            self._assert_strict(schema["items"], f"{path}[]")
+
+    def test_schemas_satisfy_strict_mode(self):
+        for name, response_format in WORKFLOW1_RESPONSE_FORMATS.items():
+            self.assertEqual(response_format["type"], "json_schema")
+            self.assertTrue(response_format["json_schema"]["strict"])
+            self._assert_strict(response_format["json_schema"]["schema"], name)
+
+    def test_records_round_trip(self):
+        for name, artefacts in self.artefacts.items():
+            content = json.dumps(to_structured_records(artefacts))
+            self.assertEqual(parse_structured_output(name, content), artefacts)
+
+    def test_stand_in_reply_is_parseable(self):
+        for name, response_format in WORKFLOW1_RESPONSE_FORMATS.items():
+            body = {"model": "gpt-4.1", "response_format": response_format,
+                    "messages": [{"role": "system", "content": "Example Acct #111111"},
+                                 {"role": "user", "content": "John deposited $5000 into Acct #345723."}]}
+            parsed = parse_structured_output(name, synthesize_message(body, key=name)["content"])
+            self.assertEqual(set(parsed), set(response_format["json_schema"]["schema"]["properties"]))
+            self.assertNotIn("111111", json.dumps(parsed))
+
+    def test_unknown_agent_raises(self):
+        with self.assertRaises(ValueError):
+            parse_structured_output("Router_Agent", "{}")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import logging
+from utils import split_dictionary_into_subnarratives, group_subnarratives
+
+
+logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class TestGroupSubnarratives(unittest.TestCase):
+    '''
+    Tests for collapsing duplicate sub-narratives before routing
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        wire = "Between January 1, 2024 and March 31, 2024, John sent 12 wires totaling $120,000 from account " \
+               "345723 to Acme Inc's account 98765."
+        deposits = "Made 10 cash deposits of $9,000 each in January 2024."
+        cls.data = {"Entities": {}, "Account_IDs": ["345723", "98765", "55555", "5555"], "Acct_to_FI": {},
+                    "Acct_to_Cust": {}, "FI_to_Acct_to_Cust": {},
+                    "Narratives": {"345723": {"Trxn_Set_1": wire, "Trxn_Set_2": deposits},
+                                   # Same trxns described from the beneficiary's side, modulo case and spacing
+                                   "98765": {"Trxn_Set_3": wire.upper().replace(" ", "  "),
+                                             "Trxn_Set_4": deposits},
+                                   "55555": {"Trxn_Set_5": "Received a wire from 5555."},
+                                   "5555": {"Trxn_Set_6": "Received a wire from 5555."},
+                                   "Dummy_Acct_1": {"Trxn_Set_7": wire}}}
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+
+    def test_duplicates_collapsed_across_owners(self):
+        sub_narratives = split_dictionary_into_subnarratives(self.data)
+        self.assertEqual(len(sub_narratives), 6)
+        groups = group_subnarratives(sub_narratives)
+        owners = [owners for _, owners in groups]
+        self.assertEqual(owners[0], [("345723", "Trxn_Set_1"), ("98765", "Trxn_Set_3")])
+        # The first sub-narrative of a group is the one routed
+        self.assertIs(groups[0][0], sub_narratives[0])
+        self.assertEqual(len(groups), 5)
+
+    def test_same_text_of_unrelated_accounts_kept_apart(self):
+        groups = group_subnarratives(split_dictionary_into_subnarratives(self.data))
+        owners = [owners for _, owners in groups]
+        # Each account made its own deposits
+        self.assertIn([("345723", "Trxn_Set_2")], owners)
+        self.assertIn([("98765", "Trxn_Set_4")], owners)
+        # 5555 is mentioned in the text, but not the owner 55555 which only contains it
+        self.assertIn([("55555", "Trxn_Set_5")], owners)
+        self.assertIn([("5555", "Trxn_Set_6")], owners)
+
+
+if __name__ == '__main__':
+    unittest.main()
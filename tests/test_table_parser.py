@@ -0,0 +1,75 @@
+import unittest
+import logging
+from agents.table_parser import (split_tabular_sar, tables_to_trxns, map_columns, normalise_amount,
+                                 normalise_date, normalise_channel)
+from utils import read_file
+
+
+logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class TestTableParser(unittest.TestCase):
+    '''
+    Tests for the deterministic parser of transaction tables in SARs
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.sar_text = read_file("sar1_test_table_09.txt")
+        cls.entity_results = {
+            "Acct_to_Cust": {"987654321": "Greenfield Solutions LLC", "123456789": "Bright Future Enterprises Inc."},
+            "FI_to_Acct_to_Cust": {"Desert Bank": {"987654321": "CUST_001", "123456789": "CUST_002"}}}
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+
+    def test_normalisation(self):
+        self.assertEqual(normalise_amount("$9,900"), 9900.0)
+        self.assertEqual(normalise_amount("USD 1,234.50"), 1234.5)
+        self.assertIsNone(normalise_amount("n/a"))
+        self.assertEqual(normalise_date("03/10/23"), "2023-03-10")
+        self.assertEqual(normalise_date("Jan 4, 2024"), "2024-01-04")
+        self.assertIsNone(normalise_date("sometime in 2023"))
+        self.assertEqual(normalise_channel("Check Cashing"), "Check")
+        self.assertEqual(normalise_channel("Cash Deposit"), "Cash")
+
+    def test_column_synonyms(self):
+        columns = map_columns(["Date", "Account Number", "Transaction Type", "Amount", "Payee", "Location"])
+        self.assertEqual(columns, ["Trxn_Date", "Account_ID", "Trxn_Type", "Trxn_Amount", "Counterparty_Name",
+                                   "Location"])
+
+    def test_table_is_removed_from_free_text(self):
+        remainder, tables = split_tabular_sar(self.sar_text)
+        self.assertEqual(len(tables), 1)
+        self.assertEqual(len(tables[0].rows), 20)
+        self.assertNotIn("03/10/23", remainder)
+        self.assertIn("Continental Trading Ltd.", remainder)
+        self.assertIn("The total number and dollar value of cash deposits", remainder)
+
+    def test_rows_map_to_trxn_schema(self):
+        _, tables = split_tabular_sar(self.sar_text)
+        trxns = tables_to_trxns(tables, self.entity_results)
+        self.assertEqual(len(trxns), 20)
+        deposit, wire = trxns[1], trxns[4]
+        self.assertEqual((deposit["Originator_Customer_ID"], deposit["Beneficiary_Customer_ID"]), ("CUST_001", "CUST_001"))
+        self.assertEqual(deposit["Branch_or_ATM_Location"], "East Las Vegas Branch")
+        self.assertEqual(wire["Trxn_Channel"], "Wire")
+        self.assertEqual(wire["Beneficiary_Name"], "Continental Trading Ltd.")
+        # The beneficiary account is also a subject account held by a different customer
+        self.assertEqual(wire["Beneficiary_Customer_ID"], "")
+        self.assertEqual(sum(t["Trxn_Amount"] for t in trxns.values()), 11 * 9900.0 + 9 * 9800.0)
+
+    def test_unparseable_rows_stay_in_free_text(self):
+        sar_text = "Activity:\nDate\tAmount\tType\n01/02/24\t$500\tCash Deposit\nearly Jan\t$700\tCash Deposit\nEnd."
+        remainder, tables = split_tabular_sar(sar_text)
+        self.assertEqual(len(tables[0].rows), 1)
+        self.assertIn("early Jan\t$700", remainder)
+
+    def test_text_without_tables_is_unchanged(self):
+        sar_text = read_file("sar_test_01.txt")
+        self.assertEqual(split_tabular_sar(sar_text), (sar_text, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import unittest
+import logging
+import numpy as np
+import pandas as pd
+from agents.tools import (generate_transactions, derive_seed, sample_amounts_with_total, TransactionBatch, TRXN_COLUMNS,
+                          REALIZATION_COLUMN, EVEN_DOLLAR_UNIT, choose_n_transactions)
+
+
+logging.basicConfig(level=logging.INFO,format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class TestGenerateTransactions(unittest.TestCase):
+    '''
+    Tests for the columnar engine of the generate_transactions tool
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.args = dict(Originator_Name="John", Originator_Account_ID="345723", Originator_Customer_ID="CUST_001",
+                        Beneficiary_Name="John", Beneficiary_Account_ID="345723", Beneficiary_Customer_ID="CUST_001",
+                        Trxn_Channel=["Cash"], Start_Date="2024-01-01", End_Date="2024-03-31",
+                        Min_Ind_Trxn_Amt=9000, Max_Ind_Trxn_Amt=9900,
+                        Branch_or_ATM_Location=["Main Road, NY", "Broadway, NY"], N_transactions=500)
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+
+    def test_columns_output(self):
+        batch = generate_transactions(**self.args, output_format="columns")
+        self.assertIsInstance(batch, TransactionBatch)
+        self.assertEqual(len(batch), 500)
+        self.assertEqual(batch.arrays["Trxn_Date"].dtype, np.dtype("datetime64[D]"))
+        self.assertTrue((batch.arrays["Trxn_Date"] >= np.datetime64("2024-01-01")).all())
+        self.assertTrue((batch.arrays["Trxn_Date"] <= np.datetime64("2024-03-31")).all())
+        self.assertTrue(((batch.arrays["Trxn_Amount"] >= 9000) & (batch.arrays["Trxn_Amount"] <= 9900)).all())
+        self.assertEqual(batch.constants["Originator_Customer_ID"], "CUST_001")
+
+    def test_output_formats_agree(self):
+        batch = generate_transactions(**self.args, output_format="columns")
+        df = batch.to_frame(date_strings=True)
+        trxns = batch.to_dict()
+        self.assertEqual(list(df.columns), TRXN_COLUMNS)
+        self.assertEqual(len(trxns), 500)
+        self.assertEqual(trxns[1], df.iloc[0].to_dict())
+        self.assertRegex(trxns[1]["Trxn_Date"], r"^\d{4}-\d{2}-\d{2}$")
+
+    def test_dict_is_default(self):
+        trxns = generate_transactions(**{**self.args, "Branch_or_ATM_Location": "Main Road, NY"})
+        self.assertEqual(set(trxns), set(range(1, 501)))
+        self.assertEqual({t["Branch_or_ATM_Location"] for t in trxns.values()}, {"Main Road, NY"})
+
+    def test_seeded_calls_are_reproducible(self):
+        seed = derive_seed("sar_train1", "345723", "Trxn_Set_1")
+        self.assertEqual(seed, derive_seed("sar_train1", "345723", "Trxn_Set_1"))
+        first = generate_transactions(**self.args, seed=seed, output_format="dataframe")
+        second = generate_transactions(**self.args, seed=seed, output_format="dataframe")
+        other = generate_transactions(**self.args, seed=derive_seed("sar_train1", "345723", "Trxn_Set_2"),
+                                      output_format="dataframe")
+        pd.testing.assert_frame_equal(first, second)
+        self.assertFalse(first.equals(other))
+
+    def test_invalid_inputs_give_empty_output(self):
+        args = {**self.args, "N_transactions": None}
+        self.assertEqual(generate_transactions(**args), {})
+        df = generate_transactions(**args, output_format="dataframe")
+        self.assertIsInstance(df, pd.DataFrame)
+        self.assertTrue(df.empty)
+
+
+class TestAmountSamplers(unittest.TestCase):
+    '''
+    Tests for the constrained amount samplers used by generate_transactions
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.args = dict(Originator_Name="John", Originator_Account_ID="345723", Originator_Customer_ID="CUST_001",
+                        Beneficiary_Name="John", Beneficiary_Account_ID="345723", Beneficiary_Customer_ID="CUST_001",
+                        Trxn_Channel=["Cash"], Start_Date="2024-01-01", End_Date="2024-03-31",
+                        Branch_or_ATM_Location="Main Road, NY")
+
+    def setUp(self):
+        logging.info(f"Running {self.__class__.__name__}.{self._testMethodName}")
+
+    def test_exact_total_within_bounds(self):
+        amounts = sample_amounts_with_total(np.random.default_rng(0), 100000, 950_000_000.37, 9000, 9999.99)
+        self.assertEqual(len(amounts), 100000)
+        self.assertAlmostEqual(amounts.sum(), 950_000_000.37, places=2)
+        self.assertTrue(((amounts >= 9000) & (amounts <= 9999.99)).all())
+
+    def test_total_and_bounds_case(self):
+        batch = generate_transactions(**self.args, Min_Ind_Trxn_Amt=9000, Max_Ind_Trxn_Amt=9900,
+                                      Total_Amount=1_234_567.89, output_format="columns")
+        amounts = batch.arrays["Trxn_Amount"]
+        self.assertAlmostEqual(amounts.sum(), 1_234_567.89, places=2)
+        self.assertTrue(((amounts >= 9000) & (amounts <= 9900)).all())
+
+    def test_even_dollar_shape(self):
+        batch = generate_transactions(**self.args, Min_Ind_Trxn_Amt=1000, Max_Ind_Trxn_Amt=20000,
+                                      Total_Amount=250000, Amount_Shape="even_dollar", output_format="columns")
+        amounts = batch.arrays["Trxn_Amount"]
+        self.assertAlmostEqual(amounts.sum(), 250000, places=2)
+        self.assertTrue((amounts % 100 == 0).all())
+
+    def test_even_dollar_amounts_stay_in_bounds(self):
+        rng = np.random.default_rng(12)
+        for _ in range(2000):
+            low = round(rng.uniform(100, 9000), 2)
+            high = round(low * rng.uniform(1.01, 1.5), 2)
+            n = int(rng.integers(1, 40))
+            total = round(rng.uniform(low, high, n).sum(), 2)
+            n = choose_n_transactions(total, low, high, n)
+            amounts = sample_amounts_with_total(rng, n, total, low, high, EVEN_DOLLAR_UNIT)
+            self.assertAlmostEqual(amounts.sum(), total, places=2, msg=(low, high, total, n))
+            self.assertTrue(((amounts >= low) & (amounts <= high)).all(), msg=(low, high, total, n, amounts))
+        amounts = sample_amounts_with_total(rng, 22, 108599.82, 4923.45, 5124.04, EVEN_DOLLAR_UNIT)
+        self.assertAlmostEqual(amounts.sum(), 108599.82, places=2)
+        self.assertTrue(((amounts >= 4923.45) & (amounts <= 5124.04)).all())
+
+    def test_below_threshold_shape(self):
+        batch = generate_transactions(**self.args, Min_Ind_Trxn_Amt=None, Max_Ind_Trxn_Amt=None,
+                                      Total_Amount=475000, N_transactions=50, Amount_Shape="below_threshold",
+                                      output_format="columns")
+        amounts = batch.arrays["Trxn_Amount"]
+        self.assertEqual(len(amounts), 50)
+        self.assertAlmostEqual(amounts.sum(), 475000, places=2)
+        self.assertTrue(((amounts >= 9000) & (amounts < 10000)).all())
+
+    def test_realizations_sum_to_total(self):
+        df = generate_transactions(**self.args, Min_Ind_Trxn_Amt=9000, Max_Ind_Trxn_Amt=9900, Total_Amount=475000,
+                                   N_transactions=50, seed=1, n_realizations=200, output_format="dataframe")
+        self.assertEqual(list(df.columns), TRXN_COLUMNS + [REALIZATION_COLUMN])
+        self.assertEqual(len(df), 50 * 200)
+        totals = df.groupby(REALIZATION_COLUMN)["Trxn_Amount"].sum()
+        self.assertEqual(list(totals.index), list(range(200)))
+        self.assertTrue(np.allclose(totals, 475000))
+        self.assertTrue(((df["Trxn_Amount"] >= 9000) & (df["Trxn_Amount"] <= 9900)).all())
+        # Realisations are independent draws
+        first, second = (df[df[REALIZATION_COLUMN] == r]["Trxn_Amount"].to_numpy() for r in (0, 1))
+        self.assertFalse(np.array_equal(first, second))
+
+    def test_infeasible_bounds_do_not_raise(self):
+        trxns = generate_transactions(**self.args, Min_Ind_Trxn_Amt=100, Max_Ind_Trxn_Amt=200, Total_Amount=50)
+        self.assertAlmostEqual(sum(t["Trxn_Amount"] for t in trxns.values()), 50, places=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -366,6 +366,40 @@ def split_dictionary_into_subnarratives(data: dict) -> list:
     return results
 
 
+def mentioned_accounts(text: str, account_ids) -> frozenset:
+    """
+    Account IDs that appear in the text as whole IDs, so "1234" is not found inside "56789-1234". Case-insensitive.
+    """
+    return frozenset(acct_id for acct_id in account_ids
+                     if re.search(rf"(?<![\w-]){re.escape(str(acct_id))}(?![\w-])", text, flags=re.IGNORECASE))
+
+
+def group_subnarratives(sub_narratives: list) -> list:
+    """
+    Collapse sub-narratives describing the same trxns, so each trxn set is routed and generated once.
+    The Narrative_Extraction_Agent often attributes one trxn set to both the originator and the beneficiary account.
+
+    Sub-narratives are grouped by their normalised text and counterparty pair: the owning account together with the
+    accounts the text mentions. The same text under accounts it does not mention (e.g. "10 cash deposits of $9,000")
+    is kept apart, as each of those accounts made the trxns.
+
+    :param sub_narratives: Sub-narratives from split_dictionary_into_subnarratives.
+    :return: A list of (sub_narrative, owners) tuples in order of first appearance. sub_narrative is the first of its
+             group and owners lists the (AccountID, Trxn_Set) pair of every sub-narrative in the group.
+    """
+    groups = {}
+    for sub_narrative in sub_narratives:
+        (acct_id, trxn_sets), = sub_narrative["Narratives"].items()
+        (trxn_set, narration_text), = trxn_sets.items()
+        text = normalize_entity(str(narration_text)).casefold().rstrip(". ")
+        counterparties = mentioned_accounts(text, [str(acct).casefold() for acct in sub_narrative["Account_IDs"]])
+        key = (text, counterparties | {str(acct_id).casefold()})
+        if key not in groups:
+            groups[key] = (sub_narrative, [])
+        groups[key][1].append((acct_id, trxn_set))
+    return list(groups.values())
+
+
 
 def assert_dict_structure(testcase, expected, actual):
     """